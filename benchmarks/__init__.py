@@ -0,0 +1,4 @@
+"""性能基准测试, 在项目根目录下以 python -m benchmarks.<模块名> 运行"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,72 @@
+"""
+INTERACT_WORD_V2解码对比: 完整protobuf解码 与 选择性解码
+用法: python -m benchmarks.interact_word [--count 20000]
+"""
+import argparse
+import base64
+import time
+
+import utils.InteractWordV2 as InteractWordV2
+from live_streams.models import InteractWordV2Message
+from live_streams.wire import InteractWordV2Decoder
+from .samples import SAMPLE_MESSAGES
+
+
+def protobuf_decode(pb: str):
+    """此前InteractWordV2Message.from_command的解码方式"""
+    message = InteractWordV2.INTERACT_WORD_V2()
+    message.ParseFromString(base64.b64decode(pb))
+    return message.uid, message.uname, message.msg_type
+
+
+def protobuf_decode_face(pb: str):
+    message = InteractWordV2.INTERACT_WORD_V2()
+    message.ParseFromString(base64.b64decode(pb))
+    return message.uid, message.uname, message.msg_type, message.user_info.base.face
+
+
+def per_op(func, items: list, repeat: int = 3) -> float:
+    """多次运行取最小值, 返回每条消息的微秒数"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="消息条数")
+    args = parser.parse_args()
+
+    message = SAMPLE_MESSAGES["INTERACT_WORD_V2"]
+    pb = message["data"]["pb"]
+    pbs = [pb] * args.count
+    messages = [message] * args.count
+    basic = InteractWordV2Decoder()
+    with_face = InteractWordV2Decoder(("uid", "uname", "msg_type", "face"))
+    reused = InteractWordV2.INTERACT_WORD_V2()
+
+    def model_access(items):
+        for item in items:
+            model = InteractWordV2Message.from_command(item)
+            model.uid, model.uname, model.msg_type
+
+    cases = [
+        ("protobuf uid/uname/msg_type", lambda items: [protobuf_decode(item) for item in items], pbs),
+        ("选择性 uid/uname/msg_type", lambda items: [basic.decode(item) for item in items], pbs),
+        ("protobuf +face", lambda items: [protobuf_decode_face(item) for item in items], pbs),
+        ("选择性 +face", lambda items: [with_face.decode(item) for item in items], pbs),
+        ("完整解码(复用消息对象)", lambda items: [InteractWordV2Decoder.decode_full(item, reused) for item in items], pbs),
+        ("模型 仅构造(不访问字段)", lambda items: [InteractWordV2Message.from_command(item) for item in items], messages),
+        ("模型 构造并访问3个字段", model_access, messages),
+    ]
+    print(f"{'方式':<28}{'us/条':>10}{'条/秒':>12}")
+    for name, func, items in cases:
+        cost = per_op(func, items)
+        print(f"{name:<28}{cost:>10.2f}{1e6 / cost:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
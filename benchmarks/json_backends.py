@@ -0,0 +1,54 @@
+"""
+JSON后端对比: 每条消息的解码(loads, 输入为memoryview, 与接收路径一致)和编码(dumps, 与历史记录一致)耗时
+用法: python -m benchmarks.json_backends [--history 历史记录分段或目录] [--count 20000]
+"""
+import argparse
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from live_streams.json_backend import BACKENDS
+from .samples import synthetic_traffic, load_history
+
+
+def per_message(func, items: list, repeat: int) -> float:
+    """多次运行取最小CPU耗时, 返回每条消息的微秒数"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        for item in items:
+            func(item)
+        best = min(best, time.process_time() - start)
+    return best / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=Path, help="HistoryWriter写入的分段文件或目录, 不提供则使用合成流量")
+    parser.add_argument("--count", type=int, default=20000, help="消息条数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数, 取最小耗时")
+    args = parser.parse_args()
+
+    source = load_history(args.history) if args.history else synthetic_traffic(args.count)
+    messages = list(islice(source, args.count))
+    payloads = [memoryview(json.dumps(message, ensure_ascii=False).encode()) for message in messages]
+    print(f"消息数: {len(messages)} | 平均 {sum(map(len, payloads)) / len(payloads):.1f} B/条")
+    print(f"{'后端':<10}{'loads µs/条':>14}{'dumps µs/条':>14}")
+    baseline = per_message(lambda payload: json.loads(bytes(payload)), payloads, args.repeat)
+    print(f"{'json.loads':<10}{baseline:>14.2f}{'-':>14}")
+    for name, backend_type in BACKENDS.items():
+        if not backend_type.available():
+            print(f"{name:<10}{'未安装':>14}{'未安装':>14}")
+            continue
+        backend = backend_type()
+        if [backend.loads(payload) for payload in payloads[:100]] != messages[:100]:
+            print(f"{name:<10}{'解码结果不一致':>14}")
+            continue
+        loads = per_message(backend.loads, payloads, args.repeat)
+        dumps = per_message(backend.dumps, messages, args.repeat)
+        print(f"{name:<10}{loads:>14.2f}{dumps:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
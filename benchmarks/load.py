@@ -0,0 +1,183 @@
+"""
+端到端压测: 在子进程中启动本地模拟服务器(benchmarks.mock_server), 用RoomPool连接大量直播间,
+报告持续消息吞吐量、端到端延迟分位数(服务器发送弹幕到回调完成)、客户端进程的CPU占用和RSS
+用法: python -m benchmarks.load [--rooms 1000] [--traffic poisson] [--rate 20] [--duration 60]
+      [--server http://127.0.0.1:18080 使用已启动的模拟服务器]
+"""
+import argparse
+import asyncio
+import dataclasses
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+
+import utils.tools
+from live_streams import BLiveClient, Handler, RoomPool
+from live_streams.models import DanmakuMessage
+from utils import BiliApi, Signedparams
+from .mock_server import add_traffic_arguments
+
+
+@dataclasses.dataclass
+class Sample:
+    wall: float
+    """time.monotonic()"""
+    cpu: float
+    """进程累计CPU时间(秒)"""
+    messages: int
+    """累计处理的消息数"""
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_bytes() -> int:
+    """当前RSS, 无法读取/proc时使用峰值RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0
+
+
+class LoadDriver:
+    """连接模拟服务器并统计客户端处理情况"""
+
+    def __init__(self, server_url: str, rooms: int, protover: Optional[int], admission_rate: float):
+        self.server_url = server_url
+        self.rooms = rooms
+        self.protover = protover
+        self.admission_rate = admission_rate
+        self.messages: int = 0
+        """回调收到的消息数"""
+        self.latencies_ms: list[float] = []
+        """弹幕端到端延迟(毫秒)"""
+        self.handler = Handler()
+        self.handler.append_func(*{t for t in Handler._CMD_MODEL_DICT.values() if t is not None})(self._on_message)
+        self.pool: Optional[RoomPool] = None
+
+    def _on_message(self, model):
+        self.messages += 1
+        if isinstance(model, DanmakuMessage):
+            self.latencies_ms.append(time.time_ns() / 1e6 - model.timestamp)
+
+    async def start(self):
+        BiliApi.api_url = BiliApi.live_api_url = self.server_url
+        # 模拟服务器不做风控, 放开限速以测量客户端本身的吞吐
+        for name, endpoint in BiliApi.endpoints.items():
+            BiliApi.endpoints[name] = dataclasses.replace(endpoint, rate=1e6, burst=10 ** 6)
+        BLiveClient.danmaku_scheme = "ws"
+        # 签名密钥缓存写入临时目录, 避免模拟服务器的密钥覆盖真实缓存
+        utils.tools.WBI_TEMP_FILE = Path(tempfile.mkdtemp()) / "WbiSignature.pkl"
+        Signedparams.Data = utils.tools.SignedKeyData()
+        Signedparams._loaded = True
+        self.pool = RoomPool(self.handler, admission_rate=self.admission_rate,
+                             max_concurrent_starts=max(20, int(self.admission_rate)), protover=self.protover)
+        started = await self.pool.add_rooms(range(1, self.rooms + 1))
+        print(f"已连接 {len(started)}/{self.rooms} 个直播间")
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+        await Signedparams.close()
+
+    def sample(self) -> Sample:
+        return Sample(time.monotonic(), _cpu_seconds(), self.messages)
+
+    def dropped_frames(self) -> int:
+        return sum(client.queue_stats.dropped_count for client in self.pool.rooms.values())
+
+    def reconnects(self) -> int:
+        return sum(client.reconnect_stats.reconnect_count for client in self.pool.rooms.values())
+
+
+async def _server_sent(session: aiohttp.ClientSession, server_url: str) -> int:
+    async with session.get(f"{server_url}/_mock/stats") as response:
+        return (await response.json())["sent_messages"]
+
+
+async def run(args: argparse.Namespace, server_url: str):
+    driver = LoadDriver(server_url, args.rooms, args.protover, args.admission_rate)
+    async with aiohttp.ClientSession() as session:
+        try:
+            await driver.start()
+            await asyncio.sleep(args.warmup)
+            driver.latencies_ms.clear()
+            first, sent_before = driver.sample(), await _server_sent(session, server_url)
+            previous, peak_rss = first, _rss_bytes()
+            print(f"{'时间(s)':>8}{'msg/s':>12}{'CPU':>8}{'RSS(MB)':>10}")
+            deadline = first.wall + args.duration
+            while (now := time.monotonic()) < deadline:
+                await asyncio.sleep(min(args.report_interval, deadline - now))
+                current, rss = driver.sample(), _rss_bytes()
+                peak_rss = max(peak_rss, rss)
+                elapsed = current.wall - previous.wall
+                print(f"{current.wall - first.wall:>8.0f}{(current.messages - previous.messages) / elapsed:>12,.0f}"
+                      f"{(current.cpu - previous.cpu) / elapsed:>8.0%}{rss / 2 ** 20:>10.1f}")
+                previous = current
+            sent = await _server_sent(session, server_url) - sent_before
+            rooms, dropped, reconnects = len(driver.pool.rooms), driver.dropped_frames(), driver.reconnects()
+        finally:
+            await driver.close()
+
+    elapsed = previous.wall - first.wall
+    received = previous.messages - first.messages
+    latencies = sorted(driver.latencies_ms)
+    print(f"\n直播间: {rooms} | 用时: {elapsed:.1f}秒 | 服务器发送: {sent} | 客户端处理: {received}")
+    print(f"持续吞吐量: {received / elapsed:,.0f} msg/s | CPU: {(previous.cpu - first.cpu) / elapsed:.0%}"
+          f" | 峰值RSS: {peak_rss / 2 ** 20:.1f}MB | 丢弃帧: {dropped} | 重连: {reconnects}")
+    if latencies:
+        print(f"弹幕端到端延迟(ms, {len(latencies)}条): p50={_percentile(latencies, 0.5):.1f}"
+              f" p90={_percentile(latencies, 0.9):.1f} p99={_percentile(latencies, 0.99):.1f}"
+              f" p99.9={_percentile(latencies, 0.999):.1f} max={latencies[-1]:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=100, help="直播间数")
+    parser.add_argument("--duration", type=float, default=60, help="统计时长(秒), 不含预热")
+    parser.add_argument("--warmup", type=float, default=5, help="全部直播间连接后的预热时间(秒)")
+    parser.add_argument("--report-interval", type=float, default=5, help="输出间隔(秒)")
+    parser.add_argument("--protover", type=int, choices=(2, 3), help="协议版本, 不提供则使用配置项protover")
+    parser.add_argument("--admission-rate", type=float, default=200, help="每秒启动的直播间数")
+    parser.add_argument("--server", help="已启动的模拟服务器地址, 不提供则在子进程中启动")
+    parser.add_argument("--port", type=int, default=18080, help="子进程模拟服务器的端口")
+    add_traffic_arguments(parser)
+    args = parser.parse_args()
+
+    if args.server:
+        asyncio.run(run(args, args.server.rstrip("/")))
+        return
+
+    command = [sys.executable, "-m", "benchmarks.mock_server", "--port", str(args.port),
+               "--traffic", args.traffic, "--rate", str(args.rate), "--batch-interval", str(args.batch_interval),
+               "--burst-factor", str(args.burst_factor), "--burst-interval", str(args.burst_interval),
+               "--burst-duration", str(args.burst_duration)]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        # 等待服务器输出启动信息
+        print(server.stdout.readline().strip())
+        asyncio.run(run(args, f"http://127.0.0.1:{args.port}"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
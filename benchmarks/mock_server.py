@@ -0,0 +1,278 @@
+"""
+本地模拟B站服务器, 用于压测BLiveClient而不触发风控.
+实现 getDanmuInfo、nav、myinfo、acc/info、getRoomBaseInfo、get_status_info_by_uids 接口和 /sub 弹幕WebSocket协议
+(认证回应、心跳回应、按协商的protover用brotli/zlib压缩的批量通知帧), 按流量模型向每个连接推送消息.
+弹幕消息的 info[0][4] 为发送时间(Unix毫秒), 用于计算端到端延迟; /_mock/stats 返回已发送的消息数
+用法: python -m benchmarks.mock_server [--port 18080] [--traffic steady] [--rate 20]
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import math
+import random
+import struct
+import time
+import zlib
+from enum import StrEnum
+from itertools import islice
+from typing import Optional
+
+import brotli
+from aiohttp import web, WSMsgType
+
+from live_streams.codec import pack_packet, iter_packets
+from live_streams.enum import Operation, ProtoVer
+from .samples import synthetic_traffic
+
+_COMPRESS = {
+    ProtoVer.DEFLATE: lambda data: zlib.compress(data, 6),
+    ProtoVer.BROTLI: lambda data: brotli.compress(data, quality=5),
+}
+_IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+_SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+
+
+class Traffic(StrEnum):
+    STEADY = "steady"
+    """每个直播间按固定速率发送"""
+    POISSON = "poisson"
+    """泊松到达, 随机出现持续数秒、速率为burst_factor倍的高峰"""
+    GIFT_STORM = "gift_storm"
+    """固定速率的常规流量, 随机出现以礼物消息为主的礼物风暴"""
+
+
+@dataclasses.dataclass
+class TrafficModel:
+    kind: Traffic = Traffic.STEADY
+    rate: float = 20
+    """每个直播间平均每秒消息数"""
+    batch_interval: float = 0.1
+    """每个连接推送通知帧的间隔(秒), 期间的消息合并为一帧"""
+    burst_factor: float = 10
+    """高峰或礼物风暴期间的速率倍数"""
+    burst_interval: float = 30
+    """高峰之间的平均间隔(秒)"""
+    burst_duration: float = 3
+    """高峰持续时间(秒)"""
+    seed: Optional[int] = None
+    """随机种子"""
+
+
+class RoomStream:
+    """一个连接按流量模型产生的消息"""
+
+    def __init__(self, room_id: int, model: TrafficModel, templates: list[dict]):
+        self.room_id = room_id
+        self.model = model
+        self._rng = random.Random(None if model.seed is None else model.seed + room_id)
+        self._templates = templates
+        self._gifts = [message for message in templates if message["cmd"] == "SEND_GIFT"]
+        self._pending: float = 0
+        self._burst_until: float = 0
+        self._next_burst: float = time.monotonic() + self._rng.expovariate(1 / model.burst_interval)
+
+    def _poisson(self, lam: float) -> int:
+        """泊松分布采样, 期望较大时用正态近似"""
+        if lam > 30:
+            return max(0, round(self._rng.gauss(lam, math.sqrt(lam))))
+        limit, k, p = math.exp(-lam), 0, self._rng.random()
+        while p > limit:
+            k += 1
+            p *= self._rng.random()
+        return k
+
+    def _in_burst(self, now: float) -> bool:
+        if now >= self._next_burst:
+            self._burst_until = now + self.model.burst_duration
+            self._next_burst = now + self._rng.expovariate(1 / self.model.burst_interval)
+        return now < self._burst_until
+
+    def next_batch(self, elapsed: float) -> list[bytes]:
+        """
+        产生elapsed秒内的消息
+        :return: 编码后的消息
+        """
+        model = self.model
+        now = time.monotonic()
+        burst = model.kind != Traffic.STEADY and self._in_burst(now)
+        rate = model.rate * (model.burst_factor if burst and model.kind == Traffic.POISSON else 1)
+        if model.kind == Traffic.STEADY:
+            self._pending += rate * elapsed
+            count = int(self._pending)
+            self._pending -= count
+        else:
+            count = self._poisson(rate * elapsed)
+        gifts = self._poisson(model.rate * model.burst_factor * elapsed) \
+            if burst and model.kind == Traffic.GIFT_STORM else 0
+
+        ts = time.time_ns() // 1_000_000
+        messages = []
+        for _ in range(count):
+            message = self._rng.choice(self._templates)
+            if message["cmd"] == "DANMU_MSG":
+                message = {**message, "info": [[*message["info"][0][:4], ts, *message["info"][0][5:]],
+                                               *message["info"][1:]]}
+            messages.append(json.dumps(message, ensure_ascii=False).encode())
+        for _ in range(gifts):
+            messages.append(json.dumps(self._rng.choice(self._gifts), ensure_ascii=False).encode())
+        return messages
+
+
+class MockServer:
+    """模拟B站REST接口和弹幕服务器"""
+
+    def __init__(self, model: TrafficModel, host: str = "127.0.0.1", port: int = 18080):
+        self.model = model
+        self.host = host
+        self.port = port
+        self.sent_messages: int = 0
+        """已发送的消息数"""
+        self.sent_frames: int = 0
+        """已发送的通知帧数"""
+        self.connections: int = 0
+        """当前连接数"""
+        self._templates = list(islice(synthetic_traffic(1000, 0 if model.seed is None else model.seed), 1000))
+        self._runner: Optional[web.AppRunner] = None
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/xlive/web-room/v1/index/getDanmuInfo", self._danmu_info)
+        app.router.add_get("/x/web-interface/nav", self._nav)
+        app.router.add_get("/x/space/myinfo", self._myinfo)
+        app.router.add_get("/x/space/wbi/acc/info", self._acc_info)
+        app.router.add_get("/xlive/web-room/v1/index/getRoomBaseInfo", self._room_base_info)
+        app.router.add_get("/room/v1/Room/get_status_info_by_uids", self._status_by_uids)
+        app.router.add_get("/sub", self._sub)
+        app.router.add_get("/_mock/stats", self._stats)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _danmu_info(self, request: web.Request) -> web.Response:
+        host = {"host": self.host, "port": self.port, "wss_port": self.port, "ws_port": self.port}
+        return web.json_response({"code": 0, "data": {"token": "mock-token", "host_list": [host]}})
+
+    async def _nav(self, request: web.Request) -> web.Response:
+        return web.json_response({"code": 0, "data": {"wbi_img": {
+            "img_url": f"https://i0.hdslb.com/bfs/wbi/{_IMG_KEY}.png",
+            "sub_url": f"https://i0.hdslb.com/bfs/wbi/{_SUB_KEY}.png",
+        }}})
+
+    async def _myinfo(self, request: web.Request) -> web.Response:
+        return web.json_response({"code": 0, "data": {"mid": 0}})
+
+    async def _acc_info(self, request: web.Request) -> web.Response:
+        mid = int(request.query.get("mid", 0))
+        return web.json_response({"code": 0, "data": {"name": f"主播{mid}", "live_room": {
+            "roomStatus": 1, "liveStatus": 1, "roundStatus": 0, "roomid": mid, "url": "",
+            "watched_show": {"num": 0},
+        }}})
+
+    async def _room_base_info(self, request: web.Request) -> web.Response:
+        rooms = {room_id: {"room_id": int(room_id), "uid": int(room_id), "uname": f"主播{room_id}",
+                           "title": "", "live_status": 1} for room_id in request.query.getall("room_ids", [])}
+        return web.json_response({"code": 0, "data": {"by_room_ids": rooms, "by_uids": {}}})
+
+    async def _status_by_uids(self, request: web.Request) -> web.Response:
+        users = {uid: {"room_id": int(uid), "uid": int(uid), "uname": f"主播{uid}", "title": "", "live_status": 1}
+                 for uid in request.query.getall("uids[]", [])}
+        return web.json_response({"code": 0, "data": users})
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"sent_messages": self.sent_messages, "sent_frames": self.sent_frames,
+                                  "connections": self.connections})
+
+    async def _sub(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(compress=False)
+        await ws.prepare(request)
+        self.connections += 1
+        pusher: Optional[asyncio.Task] = None
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.BINARY:
+                    continue
+                for operation, _, body in iter_packets(msg.data):
+                    if operation == Operation.AUTH and pusher is None:
+                        auth = json.loads(bytes(body))
+                        await ws.send_bytes(pack_packet(Operation.AUTH_REPLY, b'{"code":0}'))
+                        pusher = asyncio.create_task(self._push(ws, auth["roomid"], auth["protover"]))
+                    elif operation == Operation.HEARTBEAT:
+                        await ws.send_bytes(pack_packet(Operation.HEARTBEAT_REPLY, struct.pack(">I", 1)))
+        finally:
+            self.connections -= 1
+            if pusher is not None:
+                pusher.cancel()
+        return ws
+
+    async def _push(self, ws: web.WebSocketResponse, room_id: int, protover: int):
+        """按流量模型持续推送批量通知帧"""
+        stream = RoomStream(room_id, self.model, self._templates)
+        compress = _COMPRESS[ProtoVer(protover)]
+        interval = self.model.batch_interval
+        # 各连接错开推送时间, 避免所有连接在同一时刻发送
+        await asyncio.sleep(random.random() * interval)
+        last = time.monotonic()
+        while not ws.closed:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            messages = stream.next_batch(now - last)
+            last = now
+            if not messages:
+                continue
+            inner = b"".join(pack_packet(Operation.SEND_MSG_REPLY, m, ProtoVer.NORMAL) for m in messages)
+            try:
+                await ws.send_bytes(pack_packet(Operation.SEND_MSG_REPLY, compress(inner), protover))
+            except ConnectionError:
+                return
+            self.sent_messages += len(messages)
+            self.sent_frames += 1
+
+
+def add_traffic_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--traffic", choices=[t.value for t in Traffic], default=Traffic.STEADY, help="流量模型")
+    parser.add_argument("--rate", type=float, default=20, help="每个直播间平均每秒消息数")
+    parser.add_argument("--batch-interval", type=float, default=0.1, help="推送通知帧的间隔(秒)")
+    parser.add_argument("--burst-factor", type=float, default=10, help="高峰或礼物风暴期间的速率倍数")
+    parser.add_argument("--burst-interval", type=float, default=30, help="高峰之间的平均间隔(秒)")
+    parser.add_argument("--burst-duration", type=float, default=3, help="高峰持续时间(秒)")
+    parser.add_argument("--seed", type=int, help="随机种子")
+
+
+def traffic_from_args(args: argparse.Namespace) -> TrafficModel:
+    return TrafficModel(Traffic(args.traffic), args.rate, args.batch_interval, args.burst_factor,
+                        args.burst_interval, args.burst_duration, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=18080, help="监听端口")
+    add_traffic_arguments(parser)
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockServer(traffic_from_args(args), args.host, args.port)
+        await server.start()
+        print(f"模拟服务器已启动: http://{args.host}:{args.port}", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+消息模型开销: Handler._CMD_MODEL_DICT 中每个模型与逐字段复制的基线模型对比,
+包括构造耗时、构造并访问全部字段的耗时和每条消息保留的内存.
+基线模型是字段相同的slots dataclass, 构造时读取全部字段, 与改为惰性模型之前的行为一致.
+保留内存按每条消息重新解析原始消息测量, 惰性模型引用的原始消息计入其中
+用法: python -m benchmarks.models [--count 20000]
+"""
+import argparse
+import dataclasses
+import inspect
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from live_streams import Handler
+from live_streams.models import PbField, RawField
+from .samples import SAMPLE_MESSAGES
+
+
+def field_names(model_type: type) -> tuple[str, ...]:
+    if dataclasses.is_dataclass(model_type):
+        return tuple(field.name for field in dataclasses.fields(model_type))
+    return model_type.field_names
+
+
+def _eager_reader(field: RawField) -> Callable[[dict], Any]:
+    getter, default = field._getter, field.default
+
+    def read(raw: dict):
+        try:
+            return getter(raw)
+        except (KeyError, IndexError, TypeError):
+            return default
+
+    return read
+
+
+def eager_type(model_type: type) -> type:
+    """
+    与模型字段相同的基线模型, from_command时读取全部字段
+    :param model_type: 惰性消息模型
+    :return: slots dataclass
+    """
+    names = field_names(model_type)
+    fields = [inspect.getattr_static(model_type, name) for name in names]
+    eager = dataclasses.make_dataclass(f"Eager{model_type.__name__}", names, slots=True)
+
+    if any(isinstance(field, PbField) for field in fields):
+        # protobuf字段只能整体解码, 基线构造时解码一次
+        def from_command(raw_msg: dict):
+            return eager(**model_type.from_command(raw_msg).to_dict())
+    else:
+        readers = [_eager_reader(field) if field.path else (lambda raw, d=field.default: d) for field in fields]
+
+        def from_command(raw_msg: dict):
+            return eager(*[read(raw_msg) for read in readers])
+
+    eager.from_command = staticmethod(from_command)
+    return eager
+
+
+def access_all(model_type: type) -> Callable[[dict], None]:
+    """构造模型并访问全部字段"""
+    names = field_names(model_type)
+    from_command = model_type.from_command
+
+    def op(message: dict):
+        model = from_command(message)
+        for name in names:
+            getattr(model, name)
+
+    return op
+
+
+def _per_op_us(op: Callable[[dict], Any], message: dict, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        op(message)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def retained_bytes(model_type: type, message: dict, count: int) -> float:
+    """
+    每个模型保留的字节数, 每次构造前重新解析原始消息, 解析结果只由模型引用
+    """
+    text = json.dumps(message)
+    loads, from_command = json.loads, model_type.from_command
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    models = [from_command(loads(text)) for _ in range(count)]
+    retained = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del models
+    return retained
+
+
+def measure(model_type: type, message: dict, count: int) -> tuple[float, float, float]:
+    """
+    :return: (构造耗时微秒, 构造并访问全部字段耗时微秒, 每个模型保留的字节数)
+    """
+    build = _per_op_us(model_type.from_command, message, count)
+    access = _per_op_us(access_all(model_type), message, count)
+    return build, access, retained_bytes(model_type, message, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="每个模型的构造次数")
+    args = parser.parse_args()
+
+    print(f"{'模型':<24}{'字段数':>6}{'构造(us) 基线/惰性':>22}{'全部访问(us) 基线/惰性':>26}{'保留(B/条) 基线/惰性':>24}")
+    for cmd, model_type in Handler._CMD_MODEL_DICT.items():
+        if model_type is None or cmd not in SAMPLE_MESSAGES:
+            continue
+        message = SAMPLE_MESSAGES[cmd]
+        eager = measure(eager_type(model_type), message, args.count)
+        lazy = measure(model_type, message, args.count)
+        print(f"{model_type.__name__:<24}{len(field_names(model_type)):>6}"
+              f"{eager[0]:>13.2f} /{lazy[0]:>6.2f}{eager[1]:>17.2f} /{lazy[1]:>6.2f}"
+              f"{eager[2]:>15.0f} /{lazy[2]:>6.0f}")
+
+
+if __name__ == "__main__":
+    main()
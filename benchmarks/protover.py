@@ -0,0 +1,69 @@
+"""
+协议版本对比: protover=2(zlib) 与 protover=3(brotli)
+将录制或合成的消息按服务器的方式打包成批量通知帧, 比较每条消息的传输字节数和解码CPU耗时
+用法: python -m benchmarks.protover [--history 历史记录分段或目录] [--count 20000] [--batch 20]
+"""
+import argparse
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from live_streams.codec import pack_packet, iter_packets
+from live_streams.decompress import _DECOMPRESS_FUNC
+from live_streams.enum import Operation, ProtoVer
+from .samples import COMPRESS, synthetic_traffic, load_history
+
+
+def build_frames(messages: list[dict], batch: int, ver: int) -> list[bytes]:
+    """将消息按batch条一组打包并压缩成通知帧"""
+    frames = []
+    for i in range(0, len(messages), batch):
+        inner = b"".join(
+            pack_packet(Operation.SEND_MSG_REPLY, json.dumps(message, ensure_ascii=False).encode(), ProtoVer.NORMAL)
+            for message in messages[i:i + batch]
+        )
+        frames.append(pack_packet(Operation.SEND_MSG_REPLY, COMPRESS[ver](inner), ver))
+    return frames
+
+
+def decode_frames(frames: list[bytes], ver: int, parse: bool) -> tuple[float, int]:
+    """
+    解码全部帧
+    :return: (CPU耗时秒数, 解出的消息数)
+    """
+    decompress = _DECOMPRESS_FUNC[ver]
+    count = 0
+    start = time.process_time()
+    for frame in frames:
+        for _, _, body in iter_packets(frame, lambda _, data: decompress(data)):
+            if parse:
+                json.loads(bytes(body))
+            count += 1
+    return time.process_time() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=Path, help="HistoryWriter写入的分段文件或目录, 不提供则使用合成流量")
+    parser.add_argument("--count", type=int, default=20000, help="消息条数")
+    parser.add_argument("--batch", type=int, default=20, help="每帧包含的消息条数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数, 取最小耗时")
+    args = parser.parse_args()
+
+    source = load_history(args.history) if args.history else synthetic_traffic(args.count)
+    messages = list(islice(source, args.count))
+    raw_bytes = sum(len(json.dumps(m, ensure_ascii=False).encode()) + 16 for m in messages)
+    print(f"消息数: {len(messages)} | 每帧消息数: {args.batch} | 未压缩: {raw_bytes / len(messages):.1f} B/条")
+    print(f"{'protover':<10}{'传输 B/条':>12}{'解压 µs/条':>14}{'解压+JSON µs/条':>18}")
+    for protover, ver in ((2, ProtoVer.DEFLATE), (3, ProtoVer.BROTLI)):
+        frames = build_frames(messages, args.batch, ver)
+        wire = sum(len(frame) for frame in frames)
+        decompress_cpu = min(decode_frames(frames, ver, False)[0] for _ in range(args.repeat))
+        total_cpu = min(decode_frames(frames, ver, True)[0] for _ in range(args.repeat))
+        print(f"{protover:<10}{wire / len(messages):>12.1f}"
+              f"{decompress_cpu / len(messages) * 1e6:>14.2f}{total_cpu / len(messages) * 1e6:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+录制回放吞吐量: 将FrameRecorder录制的原始帧送入BLiveClient的接收队列和解码分发流程, 统计处理速度
+用法: python -m benchmarks.replay 录制分段或目录 [--room-id 直播间ID] [--speed 0]
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from live_streams import BLiveClient, FrameReplay
+from live_streams.replay import recorded_room_id
+
+
+async def run(paths: Path, room_id: int, speed: float):
+    async with BLiveClient(room_id=room_id) as client:
+        stats = await client.replay(FrameReplay(paths, speed))
+    print(f"帧数: {stats.frames} | 字节数: {stats.bytes} | 用时: {stats.elapsed_seconds:.3f}秒")
+    print(f"吞吐量: {stats.frames_per_second:.0f}帧/秒 | 最大积压: {stats.max_behind_seconds:.3f}秒")
+    print(f"接收队列: {client.queue_stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", type=Path, help="FrameRecorder写入的分段文件或目录")
+    parser.add_argument("--room-id", type=int, help="回放时使用的直播间ID, 不提供则使用录制时的直播间ID")
+    parser.add_argument("--speed", type=float, default=0, help="回放倍速, 1为实时, 0为最快速度")
+    args = parser.parse_args()
+    room_id = args.room_id or recorded_room_id(args.paths)
+    if room_id is None:
+        parser.error(f"没有找到录制文件: {args.paths}")
+    asyncio.run(run(args.paths, room_id, args.speed))
+
+
+if __name__ == "__main__":
+    main()
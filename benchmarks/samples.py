@@ -0,0 +1,191 @@
+"""基准测试用的消息样本"""
+import json
+import random
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, Callable
+
+import brotli
+
+from live_streams.enum import ProtoVer
+from live_streams.history import HistoryWriter
+from live_streams.replay import read_frames
+
+__all__ = (
+    "COMPRESS",
+    "SAMPLE_MESSAGES",
+    "synthetic_traffic",
+    "load_history",
+    "load_frames",
+)
+
+COMPRESS: dict[int, Callable[[bytes], bytes]] = {
+    ProtoVer.DEFLATE: zlib.compress,
+    ProtoVer.BROTLI: brotli.compress,
+}
+"""协议版本 -> 压缩函数, 与live_streams.decompress中的解压函数对应"""
+
+_INTERACT_WORD_V2_PB = (
+    "CMCxxs0EEhLljYPljYPlrrbjga7nqbrkuIMiAwYDASgBMLS5ieEGOJryssMGQI6VifC4NEouCMXl1wwQGBoJ5aW96L+Q5Y2DIMuoaSjLqGkwkrvK"
+    "AjjLqGlAAWCR10loiaDsF2IAeLrnpJXhzoyoGIABA5oBALIB+QEIwLHGzQQSaQoS5Y2D5Y2D5a6244Gu56m65LiDEkpodHRwczovL2kwLmhkc2xi"
+    "LmNvbS9iZnMvZmFjZS9mNjBmOTNjYjhiNGNkZmRjYjhjY2FiMzlmYWQ4NDZhNTQxZWNmOGNkLmpwZ0IHIzAwRDFGMRppCgnlpb3ov5DljYMQGBjL"
+    "qGkgkrvKAijLqGkwy6hpOPXqEkgBUMXl1wxgiaDsF3oJIzQzQjNFM0NDggEJIzQzQjNFM0NDigEJIzVGQzdGNEZGkgEJI0ZGRkZGRkZGmgEJIzAw"
+    "MzA4Qzk5IgIIHDIXCAMSEzIwMjUtMDctMjMgMjM6NTk6NTm6AQA="
+)
+
+
+def _danmaku(uid: int, msg: str, ts: int) -> dict:
+    return {
+        "cmd": "DANMU_MSG",
+        "dm_v2": "",
+        "info": [
+            [0, 1, 25, 16777215, ts, random.randint(1, 1 << 31), 0, "a1b2c3d4", 0, 0, 0, "", 0, "{}", "{}",
+             {"mode": 0, "show_player_type": 0, "extra": json.dumps({"send_from_me": False, "content": msg})},
+             {"activity_identity": "", "activity_source": 0, "not_show": 0}, 0],
+            msg,
+            [uid, f"用户{uid}", 0, 0, 0, 10000, 1, ""],
+            [21, "粉丝牌", "主播", 21452505, 1725515, "", 0, 1725515, 1725515, 5414290, 0, 1, 12345678],
+            [25, 0, 5805790, ">50000", 0],
+            ["", ""],
+            0,
+            3,
+            None,
+            {"ts": ts // 1000, "ct": "ABCDEF12"},
+            0,
+            0,
+            None,
+            None,
+            0,
+            105,
+            [13],
+            None,
+        ],
+    }
+
+
+def _gift(uid: int, ts: int) -> dict:
+    return {
+        "cmd": "SEND_GIFT",
+        "data": {
+            "giftName": "小心心", "num": 1, "uname": f"用户{uid}", "face": "https://i0.hdslb.com/bfs/face/member/noface.jpg",
+            "guard_level": 0, "uid": uid, "timestamp": ts // 1000, "giftId": 30607, "giftType": 5, "action": "投喂",
+            "price": 0, "rnd": str(ts), "coin_type": "silver", "total_coin": 0, "tid": str(ts),
+            "medal_info": {"medal_name": "粉丝牌", "medal_level": 21, "target_id": 1, "medal_color": 1725515},
+            "batch_combo_id": "", "blind_gift": None, "combo_send": None,
+        },
+    }
+
+
+SAMPLE_MESSAGES: dict[str, dict] = {
+    "DANMU_MSG": _danmaku(12345678, "主播晚上好", 1721750399000),
+    "SEND_GIFT": _gift(12345678, 1721750399000),
+    "GUARD_BUY": {
+        "cmd": "GUARD_BUY",
+        "data": {"uid": 12345678, "username": "用户12345678", "guard_level": 3, "num": 1, "price": 198000,
+                 "gift_id": 10003, "gift_name": "舰长", "start_time": 1721750399, "end_time": 1721750399},
+    },
+    "SUPER_CHAT_MESSAGE": {
+        "cmd": "SUPER_CHAT_MESSAGE",
+        "data": {
+            "price": 30, "message": "醒目留言内容", "message_trans": "", "start_time": 1721750399,
+            "end_time": 1721750459, "time": 60, "id": 10001, "gift": {"gift_id": 12000, "gift_name": "醒目留言"},
+            "uid": 12345678, "user_info": {"uname": "用户12345678", "face": "https://i0.hdslb.com/face.jpg",
+                                           "guard_level": 3, "user_level": 25},
+            "background_bottom_color": "#2A60B2", "background_color": "#EDF5FF", "background_icon": "",
+            "background_image": "https://i0.hdslb.com/bg.png", "background_price_color": "#7497CD",
+        },
+    },
+    "SUPER_CHAT_MESSAGE_DELETE": {"cmd": "SUPER_CHAT_MESSAGE_DELETE", "data": {"ids": [10001]}},
+    "INTERACT_WORD": {
+        "cmd": "INTERACT_WORD",
+        "data": {"uname": "用户12345678", "uid": 12345678, "msg_type": 1, "roomid": 21452505,
+                 "uinfo": {"uid": 12345678, "base": {"name": "用户12345678", "face": "https://i0.hdslb.com/face.jpg"}}},
+    },
+    "INTERACT_WORD_V2": {"cmd": "INTERACT_WORD_V2", "data": {"dmscore": 12, "pb": _INTERACT_WORD_V2_PB}},
+    "LOG_IN_NOTICE": {"cmd": "LOG_IN_NOTICE", "data": {"notice_msg": "为保护用户隐私，未登录无法查看他人昵称"}},
+    "WATCHED_CHANGE": {"cmd": "WATCHED_CHANGE", "data": {"num": 12345, "text_small": "1.2万", "text_large": "1.2万人看过"}},
+    "LIKE_INFO_V3_CLICK": {
+        "cmd": "LIKE_INFO_V3_CLICK",
+        "data": {"uname": "用户12345678", "like_text": "为主播点赞了",
+                 "uinfo": {"uid": 12345678, "base": {"name": "用户12345678", "face": "https://i0.hdslb.com/face.jpg"}}},
+    },
+    "LIKE_INFO_V3_UPDATE": {"cmd": "LIKE_INFO_V3_UPDATE", "data": {"click_count": 54321}},
+    "USER_TOAST_MSG": {
+        "cmd": "USER_TOAST_MSG",
+        "data": {"anchor_show": True, "color": "#00D1F1", "gift_id": 10003, "guard_level": 3, "num": 1,
+                 "price": 198000, "role_name": "舰长", "toast_msg": "<%用户12345678%> 开通了舰长，今天是TA陪伴主播的第1天",
+                 "uid": 12345678, "unit": "月", "username": "用户12345678"},
+    },
+    "ONLINE_RANK_COUNT": {"cmd": "ONLINE_RANK_COUNT", "data": {"count": 512, "count_text": "512", "online_count": 2048}},
+    "ENTRY_EFFECT": {
+        "cmd": "ENTRY_EFFECT",
+        "data": {"id": 4, "uid": 12345678, "target_id": 1, "mock_effect": 0, "face": "https://i0.hdslb.com/face.jpg",
+                 "privilege_type": 3, "copy_writing": "欢迎舰长 <%用户12345678%> 进入直播间", "copy_color": "#ffffff",
+                 "highlight_color": "#E6FF00", "priority": 70, "basemap_url": "", "show_avatar": 1,
+                 "effective_time": 2, "web_basemap_url": "", "web_effective_time": 2, "web_effect_close": 0},
+    },
+}
+"""cmd -> 示例消息"""
+
+_TRAFFIC_WEIGHTS = {
+    "DANMU_MSG": 30,
+    "INTERACT_WORD_V2": 25,
+    "ONLINE_RANK_COUNT": 10,
+    "ENTRY_EFFECT": 10,
+    "LIKE_INFO_V3_CLICK": 10,
+    "SEND_GIFT": 8,
+    "WATCHED_CHANGE": 4,
+    "LIKE_INFO_V3_UPDATE": 2,
+    "SUPER_CHAT_MESSAGE": 1,
+}
+"""合成流量中各cmd的占比"""
+
+
+def synthetic_traffic(count: int, seed: int = 0) -> Iterator[dict]:
+    """
+    按常见直播间的cmd占比生成合成消息
+    :param count: 消息条数
+    :param seed: 随机种子
+    :return: 消息迭代器
+    """
+    rng = random.Random(seed)
+    cmds = list(_TRAFFIC_WEIGHTS)
+    weights = list(_TRAFFIC_WEIGHTS.values())
+    ts = int(time.time() * 1000)
+    for _ in range(count):
+        cmd = rng.choices(cmds, weights)[0]
+        uid = rng.randint(1, 1 << 30)
+        ts += rng.randint(0, 50)
+        if cmd == "DANMU_MSG":
+            yield _danmaku(uid, "弹幕" * rng.randint(1, 10), ts)
+        elif cmd == "SEND_GIFT":
+            yield _gift(uid, ts)
+        else:
+            yield SAMPLE_MESSAGES[cmd]
+
+
+def load_history(path: Path) -> Iterator[dict]:
+    """
+    读取HistoryWriter写入的历史记录分段, 作为录制的真实流量
+    :param path: 分段文件或分段所在目录
+    :return: 消息迭代器
+    """
+    files = sorted(path.glob("*.jsonl"), key=HistoryWriter.segment_key) if path.is_dir() else [path]
+    for file in files:
+        with open(file, "rb") as f:
+            for line in f:
+                if line.strip():
+                    message = json.loads(line)
+                    message.pop("add_time", None)
+                    yield message
+
+
+def load_frames(path: Path) -> Iterator[bytes]:
+    """
+    读取FrameRecorder录制的原始帧, 作为录制的真实流量
+    :param path: 分段文件或分段所在目录
+    :return: 原始帧迭代器
+    """
+    for _, frame in read_frames(path):
+        yield frame
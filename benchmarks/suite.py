@@ -0,0 +1,278 @@
+"""
+微基准测试套件: 帧拆包、解压、消息模型构造及访问全部字段(与逐字段复制的基线模型对比)、Handler.handle分发和WBI签名,
+报告每秒操作数、p50/p99延迟和每次操作的峰值内存分配, 可保存结果并与其他提交的结果对比
+用法: python -m benchmarks.suite [--frames 录制分段或目录 | --history 历史记录分段或目录] [--filter 名称]
+      [--save 结果.json] [--compare 基线.json] [--threshold 0.1]
+对比两个提交: 在基线提交上运行 --save base.json, 切换到新提交后用相同的输入运行 --compare base.json,
+有退化时退出码为1
+"""
+import argparse
+import asyncio
+import collections
+import dataclasses
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Any
+
+from live_streams import Handler
+from live_streams.codec import pack_packet, iter_packets
+from live_streams.decompress import _DECOMPRESS_FUNC
+from live_streams.enum import Operation, ProtoVer
+from live_streams.models import DanmakuMessage
+from utils import Signedparams
+from .models import access_all, eager_type
+from .samples import COMPRESS, SAMPLE_MESSAGES, synthetic_traffic, load_history, load_frames
+
+_IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+_SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+
+
+@dataclasses.dataclass
+class Case:
+    name: str
+    """用例名"""
+    op: Callable[[], Any]
+    """单次操作, 异步用例返回协程"""
+    is_async: bool = False
+
+
+@dataclasses.dataclass
+class Result:
+    ops_per_sec: float
+    """每秒操作数"""
+    p50_us: float
+    """延迟中位数(微秒)"""
+    p99_us: float
+    """p99延迟(微秒)"""
+    alloc_bytes: float
+    """每次操作的峰值内存分配(字节)"""
+
+
+def _cycle(func: Callable[[Any], Any], items: list) -> Callable[[], Any]:
+    """依次以items中的元素调用func"""
+    it = itertools.cycle(items)
+    return lambda: func(next(it))
+
+
+@dataclasses.dataclass
+class Payloads:
+    """基准测试的输入"""
+    messages: list[dict]
+    """解码后的消息"""
+    plain: list[bytes]
+    """解压后的批量数据包, 用于拆包"""
+    compressed: dict[int, list[bytes]]
+    """协议版本 -> 压缩数据"""
+
+    @classmethod
+    def packed(cls, messages: list[dict], batch: int) -> "Payloads":
+        """按服务器的方式将消息每batch条打包压缩"""
+        plain = [
+            b"".join(
+                pack_packet(Operation.SEND_MSG_REPLY, json.dumps(message, ensure_ascii=False).encode(), ProtoVer.NORMAL)
+                for message in messages[i:i + batch]
+            )
+            for i in range(0, len(messages), batch)
+        ]
+        compressed = {ver: [compress(data) for data in plain] for ver, compress in COMPRESS.items()}
+        return cls(messages, plain, compressed)
+
+    @classmethod
+    def recorded(cls, path: Path, count: int) -> "Payloads":
+        """从录制的原始帧中取出压缩数据, 解压后得到批量数据包和消息"""
+        messages, plain = [], []
+        compressed: dict[int, list[bytes]] = {ver: [] for ver in COMPRESS}
+        for frame in islice(load_frames(path), count):
+            for operation, ver, body in iter_packets(frame):
+                if operation != Operation.SEND_MSG_REPLY:
+                    continue
+                if ver in _DECOMPRESS_FUNC:
+                    compressed[ver].append(bytes(body))
+                    data = _DECOMPRESS_FUNC[ver](body)
+                    plain.append(data)
+                    messages.extend(json.loads(bytes(inner)) for _, _, inner in iter_packets(data))
+                elif ver == ProtoVer.NORMAL:
+                    messages.append(json.loads(bytes(body)))
+        return cls(messages, plain, compressed)
+
+    def by_cmd(self, cmd: str) -> list[dict]:
+        """某个cmd的消息, 输入中没有时使用示例消息"""
+        messages = [message for message in self.messages if message.get("cmd", "").split(":", 1)[0] == cmd]
+        if not messages and cmd in SAMPLE_MESSAGES:
+            messages = [SAMPLE_MESSAGES[cmd]]
+        return messages
+
+
+def build_cases(payloads: Payloads) -> list[Case]:
+    cases = []
+    if payloads.plain:
+        cases.append(Case("codec.iter_packets", _cycle(lambda data: collections.deque(iter_packets(data), 0),
+                                                       payloads.plain)))
+    for ver, data in payloads.compressed.items():
+        if data:
+            cases.append(Case(f"decompress.{ProtoVer(ver).name.lower()}", _cycle(_DECOMPRESS_FUNC[ver], data)))
+
+    for cmd, model_type in Handler._CMD_MODEL_DICT.items():
+        if model_type is not None and (messages := payloads.by_cmd(cmd)):
+            eager = eager_type(model_type)
+            cases.append(Case(f"models.{model_type.__name__}.from_command", _cycle(model_type.from_command, messages)))
+            cases.append(Case(f"models.{model_type.__name__}.access_all", _cycle(access_all(model_type), messages)))
+            cases.append(Case(f"models.{eager.__name__}.from_command", _cycle(eager.from_command, messages)))
+            cases.append(Case(f"models.{eager.__name__}.access_all", _cycle(access_all(eager), messages)))
+
+    danmaku = payloads.by_cmd("DANMU_MSG")
+    for count in (1, 10, 100):
+        handler = Handler()
+        for _ in range(count):
+            handler.append_func(DanmakuMessage)(lambda model: None)
+        cases.append(Case(f"Handler.handle[{count}]", _cycle(lambda message, h=handler: h.handle(0, message), danmaku),
+                          is_async=True))
+
+    params = {"type": 0, "id": 21452505, "web_location": "444.8"}
+    cases.append(Case("Signedparams._encWbi", lambda: Signedparams._encWbi(dict(params), _IMG_KEY, _SUB_KEY),
+                      is_async=True))
+    return cases
+
+
+async def measure(case: Case, min_time: float, min_ops: int, alloc_ops: int) -> Result:
+    """
+    逐次计时直到同时满足最短时间和最少次数, 再用tracemalloc测量每次操作的峰值内存分配
+    """
+    op = case.op
+    perf = time.perf_counter_ns
+    for _ in range(min(min_ops, 1000)):
+        if case.is_async:
+            await op()
+        else:
+            op()
+
+    samples = []
+    deadline = perf() + int(min_time * 1e9)
+    if case.is_async:
+        while len(samples) < min_ops or perf() < deadline:
+            start = perf()
+            await op()
+            samples.append(perf() - start)
+    else:
+        while len(samples) < min_ops or perf() < deadline:
+            start = perf()
+            op()
+            samples.append(perf() - start)
+    samples.sort()
+
+    alloc = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_ops):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            if case.is_async:
+                await op()
+            else:
+                op()
+            alloc += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        ops_per_sec=len(samples) / sum(samples) * 1e9,
+        p50_us=samples[len(samples) // 2] / 1e3,
+        p99_us=samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3,
+        alloc_bytes=alloc / alloc_ops,
+    )
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(baseline: dict, results: dict[str, Result], threshold: float) -> list[str]:
+    """
+    打印与基线的对比
+    :param baseline: --save保存的结果
+    :param results: 本次结果
+    :param threshold: 每秒操作数下降或峰值内存分配增加超过该比例时判定为退化
+    :return: 退化的用例名
+    """
+    regressions = []
+    print(f"\n与基线对比 ({baseline.get('commit') or '未知提交'} -> {_commit() or '未知提交'})")
+    print(f"{'用例':<44}{'ops/s':>14}{'变化':>9}{'p99(us)':>16}{'分配(B/op)':>18}")
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<44}{'(新增)':>14}")
+            continue
+        change = result.ops_per_sec / base["ops_per_sec"] - 1
+        alloc_change = result.alloc_bytes - base["alloc_bytes"]
+        regressed = change < -threshold or alloc_change > max(64.0, base["alloc_bytes"] * threshold)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44}{result.ops_per_sec:>14,.0f}{change:>+9.1%}"
+              f"{base['p99_us']:>7.2f}->{result.p99_us:<7.2f}"
+              f"{base['alloc_bytes']:>8.0f}->{result.alloc_bytes:<8.0f}{'  退化' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    inputs = parser.add_mutually_exclusive_group()
+    inputs.add_argument("--frames", type=Path, help="FrameRecorder录制的分段文件或目录")
+    inputs.add_argument("--history", type=Path, help="HistoryWriter写入的分段文件或目录")
+    parser.add_argument("--count", type=int, default=20000, help="读取或合成的消息条数(录制时为帧数)")
+    parser.add_argument("--batch", type=int, default=20, help="打包时每帧包含的消息条数, 录制的帧不重新打包")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--min-time", type=float, default=1.0, help="每个用例的最短计时时间(秒)")
+    parser.add_argument("--min-ops", type=int, default=1000, help="每个用例的最少计时次数")
+    parser.add_argument("--alloc-ops", type=int, default=200, help="测量内存分配的次数")
+    parser.add_argument("--save", type=Path, help="将结果保存为JSON")
+    parser.add_argument("--compare", type=Path, help="与--save保存的基线结果对比")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定退化的变化比例")
+    args = parser.parse_args()
+
+    if args.frames:
+        payloads = Payloads.recorded(args.frames, args.count)
+    else:
+        source = load_history(args.history) if args.history else synthetic_traffic(args.count)
+        payloads = Payloads.packed(list(islice(source, args.count)), args.batch)
+    cases = [case for case in build_cases(payloads) if not args.filter or args.filter in case.name]
+
+    async def run() -> dict[str, Result]:
+        results = {}
+        print(f"{'用例':<44}{'ops/s':>14}{'p50(us)':>10}{'p99(us)':>10}{'分配(B/op)':>12}")
+        for case in cases:
+            results[case.name] = result = await measure(case, args.min_time, args.min_ops, args.alloc_ops)
+            print(f"{case.name:<44}{result.ops_per_sec:>14,.0f}{result.p50_us:>10.2f}"
+                  f"{result.p99_us:>10.2f}{result.alloc_bytes:>12.0f}")
+        return results
+
+    results = asyncio.run(run())
+
+    exit_code = 0
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if regressions := compare(baseline, results, args.threshold):
+            print(f"\n{len(regressions)}个用例退化: {', '.join(regressions)}")
+            exit_code = 1
+    if args.save:
+        args.save.write_text(json.dumps({
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "source": str(args.frames or args.history or "synthetic"),
+            "results": {name: dataclasses.asdict(result) for name, result in results.items()},
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,66 +2,56 @@
 import asyncio
 import json
 import os
+import ssl
 import struct
 import time
-from datetime import datetime
-from typing import Optional, Any, NamedTuple
+from typing import Optional, Any
 
-import aiofiles
 import aiohttp
-import brotli
 import websockets
+from websockets.exceptions import ConnectionClosedOK, WebSocketException
 from loguru import logger
 
-from utils import Signedparams, TEMP_PATH, ConfigManage
-from . import models
+from utils import BiliApi, Signedparams, TEMP_PATH, ConfigManage
+from . import codec, filters, models, metrics
+from .codec import iter_packets, pack_packet
 from .config import Config
-from .enum import Operation, ProtoVer, AuthReplyCode
-from .exception import AuthError
-from .handler import Handler
+from .connection import Backoff, ReconnectStats
+from .decompress import Decompressor, DecompressStats
+from .enum import Operation, ProtoVer, AuthReplyCode, OverflowPolicy
+from .exception import AuthError, FrameError
+from .handler import Handler, peek_cmd
+from .heartbeat import HEARTBEAT_PACKET, HeartbeatScheduler
+from .history import HistoryWriter
+from .json_backend import get_backend
+from .lag import LagTracker
+from .pipeline import FrameQueue, QueueStats
+from .pool import RoomPool
+from .probe import HostRanker
+from .profiler import LoopProfiler
+from .replay import FrameRecorder, FrameReplay, ReplayStats
+from .status import LiveStatusEvent, LiveStatusPoller
 
 __all__ = (
     "Handler",
     "BLiveClient",
+    "RoomPool",
+    "FrameRecorder",
+    "FrameReplay",
+    "LiveStatusPoller",
+    "codec",
+    "filters",
+    "metrics",
     "models",
 )
 
-HEADER_STRUCT = struct.Struct('>I2H2I')
-GetRoomStatus = "https://api.live.bilibili.com/room/v1/Room/get_info?room_id={}"
-
-
-class HeaderTuple(NamedTuple):
-    pack_len: int
-    """整个消息的长度"""
-
-    raw_header_size: int
-    """原始消息头的长度"""
-
-    ver: int
-    """
-    ========协议版本========
-    数据包协议版本        含义
-    0                  数据包有效负载为未压缩的JSON格式数据
-    1                  客户端心跳包，或服务器心跳回应(带有人气值)
-    3                  数据包有效负载为通过br压缩后的JSON格式数据(之前是zlib)
-    """
-
-    operation: int
-    """
-    ==================操作类型==================
-    数据包类型    发送方      名称             含义
-    2           Client     心跳             不发送心跳包，50-60秒后服务器会强制断开连接
-    3           Server     心跳回应          有效负载为直播间人气值
-    5           Server     通知             有效负载为礼物、弹幕、公告等内容数据
-    7           Client     认证(加入房间)     客户端成功建立连接后发送的第一个数据包
-    8           Server     认证成功回应       服务器接受认证包后回应的第一个数据包
-    """
-
-    seq_id: int
-    """序列ID"""
+_HEARTBEAT_REPLY_OP = struct.pack(">I", Operation.HEARTBEAT_REPLY)
+"""心跳回应帧头部的操作码字段, 接收循环据此识别心跳回应而不解码整帧"""
 
 
 class BLiveClient:
+    danmaku_scheme: str = "wss"
+    """弹幕服务器协议, wss或ws, 使用host_list中对应的端口"""
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
                       "Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0",
@@ -74,49 +64,118 @@ class BLiveClient:
             room_id: int = None,
             user_id: int = None,
             session_: aiohttp.ClientSession = None,
-            handler_: Handler = Handler(),
+            handler_: Optional[Handler] = None,
+            protover: Optional[int] = None,
     ):
+        """
+        :param room_id: 直播间ID, 与user_id必填其中之一
+        :param user_id: 主播UID
+        :param session_: 共享的HTTP会话, 不提供则自行创建
+        :param handler_: 消息处理器, 不提供则使用默认处理器
+        :param protover: 协议版本, 2为zlib/3为brotli, 不提供则使用配置项protover
+        """
         if not (room_id or user_id):
             raise KeyError("not found room_id or user_id")
         self._config = ConfigManage.get_config(Config)
+        self.protover = protover or self._config.protover
+        if self.protover not in (ProtoVer.DEFLATE, ProtoVer.BROTLI):
+            raise ValueError(f"unsupported protover: {self.protover}")
         if self._config.use_cookie_login:
             self.headers["Cookie"] = os.getenv("COOKIE")
         self.room_id = room_id
         self.user_id = user_id
-        self._msg_hander: Handler = handler_
+        self._msg_hander: Handler = handler_ or Handler.default()
         self._own_session = False
         if not session_:
             self._own_session = True
-            session_ = aiohttp.ClientSession(headers=self.headers)
+            session_ = self.create_session()
         self._session: Optional[aiohttp.ClientSession] = session_
+        self._api = BiliApi(session_)
         self._ws: Optional[websockets.ClientConnection] = None
-        self._Heartbeat_Task: Optional[asyncio.Task] = None
+        self._heartbeat = HeartbeatScheduler.default(
+            self._config.heartbeat_interval, self._config.heartbeat_slots, self._config.heartbeat_timeout)
+        self.last_heartbeat_reply: float = 0
+        """最近一次收到帧(或建立连接)的time.monotonic()时间, 由接收循环更新, 不受分发积压影响"""
+        self.heartbeat_rtt: Optional[float] = None
+        """最近一次心跳的往返时间(秒)"""
+        self._heartbeat_sent: float = 0
+        self.frames_received: int = 0
+        """接收的WebSocket帧数"""
+        self.bytes_received: int = 0
+        """接收的WebSocket字节数"""
+        self._metrics: Optional[metrics.Metrics] = None
+        self.lag: Optional[LagTracker] = LagTracker(self._config.lag_skew_window, self._config.lag_max_offset) if self._config.lag_tracking else None
+        """各阶段投递延迟统计, 仅在启用lag_tracking时有值"""
         self._Main_Task: Optional[asyncio.Task] = None
+        self._Worker_Tasks: list[asyncio.Task] = []
+        self._queue = FrameQueue(
+            self._config.queue_size,
+            OverflowPolicy(self._config.overflow_policy),
+            name=str(room_id or user_id),
+        )
+        self._json = get_backend(self._config.json_backend)
+        self._history: Optional[HistoryWriter] = None
+        self._recorder: Optional[FrameRecorder] = None
+        self._decompressor = Decompressor(
+            self._config.decompress_inline_threshold,
+            self._config.decompress_workers,
+            self._config.decompress_process_pool,
+        )
+        self._uris: list[str] = []
+        self._auth: bytes = b""
+        self._auth_failed: bool = False
+        self._close_reason: Optional[str] = None
+        self._failures_since_refresh: int = 0
+        self._disconnected_at: Optional[float] = None
+        self._backoff = Backoff(self._config.reconnect_backoff_base, self._config.reconnect_backoff_max)
+        self.reconnect_stats = ReconnectStats()
+        """重连统计信息"""
+        self.current_uri: Optional[str] = None
+        """当前连接的服务器"""
+        self.host_rtt: dict[str, float] = {}
+        """服务器URI -> 探测到的握手耗时(秒), 仅在启用probe_hosts时有值"""
         self.program_status: bool = False
         self.live_status: bool = False
 
-    async def get_uri_port(self) -> Optional[tuple[set[str], bytes]]:
+    _ssl_context: Optional[ssl.SSLContext] = None
+
+    @classmethod
+    def create_session(cls, connector: Optional[aiohttp.BaseConnector] = None) -> aiohttp.ClientSession:
+        """
+        创建带默认请求头的HTTP会话
+        :param connector: 自定义连接器, 用于多个直播间共享连接池
+        :return: aiohttp.ClientSession
+        """
+        return aiohttp.ClientSession(headers=cls.headers, connector=connector)
+
+    @classmethod
+    def _get_ssl_context(cls) -> ssl.SSLContext:
+        """所有直播间共享的SSL上下文, 避免每个连接重复加载证书"""
+        if cls._ssl_context is None:
+            cls._ssl_context = ssl.create_default_context()
+        return cls._ssl_context
+
+    async def get_uri_port(self, fresh: bool = False) -> Optional[tuple[list[str], bytes]]:
         """
         获取直播间流URI,以及编码后的认证令牌
-        :return: tuple(set(直播间wss流URIs), 编码后的认证令牌)
+        :param fresh: 忽略缓存的令牌重新获取
+        :return: tuple(list(直播间wss流URIs, 保持服务器返回的顺序), 编码后的认证令牌)
         :raise KeyError: 未找到该直播间或已被风控
         """
         params = await Signedparams.get_end_result(params={"type": 0, "id": self.room_id, "web_location": "444.8"})
-        await Signedparams.close()
+        body = await self._api.request("danmu_info", params, fresh=fresh)
         try:
-            async with self._session.get("https://api.live.bilibili.com/xlive/web-room/v1/index/getDanmuInfo",
-                                         params=params) as response:
-                response.raise_for_status()
-                data: dict[str, Any] = (await response.json())["data"]
+            data: dict[str, Any] = body["data"]
             auth = {
                 "uid": await self._get_login_mid(),
-                "protover": 3,
+                "protover": self.protover,
                 "platform": "web",
                 "type": 2,
                 "roomid": self.room_id,
                 "key": data["token"]
             }
-            uris = {f"wss://{d['host']}:{d['wss_port']}/sub" for d in data["host_list"]}
+            scheme = self.danmaku_scheme
+            uris = list(dict.fromkeys(f"{scheme}://{d['host']}:{d[f'{scheme}_port']}/sub" for d in data["host_list"]))
         except KeyError:
             logger.error("未找到该直播间或已被风控")
             return None
@@ -124,41 +183,199 @@ class BLiveClient:
             return uris, json.dumps(auth).encode()
 
     async def start(self):
-        """启动WebSocket连接并处理消息循环"""
+        """启动WebSocket连接并处理消息循环, 获取连接地址失败时直接返回, 不创建任何资源"""
         if not self.room_id:
             await self.get_room_id()  # 3546612229998826
         params = await self.get_uri_port()
+        if not params:
+            return
+        self._uris, self._auth = params
+        self._uris = await self._plan_hosts(self._uris)
+        if self._config.save_history_method == 2 and self._history is None:
+            self._history = HistoryWriter(
+                self.room_id,
+                TEMP_PATH / "bililive",
+                segment_size=self._config.history_segment_size,
+                segment_interval=self._config.history_segment_interval,
+                buffer_size=self._config.history_buffer_size,
+                max_buffered=self._config.history_max_buffered,
+                json_backend=self._json,
+            )
+        if self._config.record_frames and self._recorder is None:
+            self._recorder = FrameRecorder(
+                self.room_id,
+                TEMP_PATH / "bililive" / "frames",
+                segment_size=self._config.history_segment_size,
+                segment_interval=self._config.history_segment_interval,
+                buffer_size=self._config.history_buffer_size,
+                max_buffered=self._config.history_max_buffered,
+            )
+        Decompressor.register(self)
+        if self._config.loop_profiler:
+            LoopProfiler.default(
+                self._config.loop_lag_interval,
+                self._config.loop_block_threshold,
+                TEMP_PATH / "profiles",
+                self._config.loop_profile_seconds,
+            ).register(self)
+        if self._config.metrics_enabled:
+            self._metrics = metrics.enable()
+            # 先登记再启动接口, 其他客户端并发注销时不会停用这个注册表
+            self._metrics.register(self)
+            await self._metrics.serve(self._config.metrics_host, self._config.metrics_port)
+        self._Main_Task = asyncio.create_task(self._run_forever())
+        self._Main_Task.add_done_callback(self._on_main_task_done)
+        self.program_status = True
+
+    def _on_main_task_done(self, task: asyncio.Task):
+        """主任务只应在stop时被取消, 因异常退出时记录日志"""
+        if task.cancelled():
+            return
+        if (e := task.exception()) is not None:
+            logger.opt(exception=e).error(f"[{self.room_id}] 直播监听意外退出: {type(e).__name__}: {e}")
+        self.program_status = False
 
-        async def run():
-            try:
-                self.program_status = True
-                async with websockets.connect(params[0].pop()) as self._ws:
-                    await self.on_open(params[1])
-                    logger.info("开启直播监听")
-                    while True:
-                        response = await self._ws.recv()
-                        await asyncio.create_task(self._on_message(response))
-            except asyncio.CancelledError:
-                logger.info("正在关闭直播监听")
-            except websockets.exceptions.ConnectionClosedError as e:
-                logger.error(f"连接意外关闭: {e}")
-            finally:
-                if self._Heartbeat_Task is not None:
-                    self._Heartbeat_Task.cancel()
+    async def _run_forever(self):
+        """维持WebSocket连接, 断开后按指数退避重连, 并依次轮换服务器"""
+        host_index = 0
+        self._failures_since_refresh = 0
+        try:
+            while True:
+                self.current_uri = self._uris[host_index % len(self._uris)]
+                self._auth_failed = False
+                self._close_reason = None
+                try:
+                    await self._run_connection(self.current_uri)
+                    reason = "服务器关闭连接"
+                except ConnectionClosedOK:
+                    reason = "连接已关闭"
+                except (WebSocketException, OSError, asyncio.TimeoutError) as e:
+                    reason = f"{type(e).__name__}: {e}"
+                if self._close_reason:
+                    reason = self._close_reason
+                if self._disconnected_at is None:
+                    self._disconnected_at = time.monotonic()
+                self.reconnect_stats.failed_attempts += 1
+                self.reconnect_stats.last_disconnect_reason = reason
+                self._failures_since_refresh += 1
+                host_index += 1
+
+                # 认证失败或所有服务器都连接失败时才重新获取令牌
+                if self._auth_failed or self._failures_since_refresh > len(self._uris):
                     try:
-                        await asyncio.wait_for(self._Heartbeat_Task, timeout=5.0)
-                    except asyncio.TimeoutError:
-                        logger.warning("心跳任务取消超时")
-                    except asyncio.CancelledError:
-                        pass
-                    self._Heartbeat_Task = None
-                if self._ws:
-                    await self._ws.close()
-                    self._ws = None
+                        params = await self.get_uri_port(fresh=True)
+                        if params:
+                            uris, self._auth = params
+                            self._uris = await self._plan_hosts(uris)
+                    except Exception as e:
+                        # 风控时签名密钥缺失、非JSON响应等错误同样按退避重试, 不能让主任务退出
+                        logger.error(f"[{self.room_id}] 重新获取认证令牌失败: {type(e).__name__}: {e}")
+                        params = None
+                    if params:
+                        host_index = 0
+                        self._failures_since_refresh = 0
+                        self.reconnect_stats.token_refresh_count += 1
+                delay = self._backoff.next_delay()
+                logger.warning(f"[{self.room_id}] 连接断开({reason}), {delay:.1f}秒后重连")
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            logger.info("正在关闭直播监听")
+            raise
 
-        if params:
-            self._Main_Task = asyncio.create_task(run())
-            self.program_status = True
+    async def _plan_hosts(self, uris: list[str]) -> list[str]:
+        """
+        启用probe_hosts时探测服务器延迟, 按握手耗时排序连接顺序
+        :param uris: 弹幕服务器URI列表
+        :return: 排序后的URI列表
+        """
+        if not self._config.probe_hosts:
+            return uris
+        ranker = HostRanker(self._config.probe_ttl, self._config.probe_timeout, self._get_ssl_context())
+        ranked = await ranker.rank(uris)
+        self.host_rtt = dict(ranked)
+        return [uri for uri, _ in ranked]
+
+    @property
+    def current_rtt(self) -> Optional[float]:
+        """当前连接服务器的握手耗时(秒)"""
+        return self.host_rtt.get(self.current_uri)
+
+    async def _run_connection(self, uri: str):
+        """建立一次WebSocket连接并持续接收, 连接关闭后返回"""
+        try:
+            # 数据包已经过brotli/zlib压缩, 关闭permessage-deflate以节省每个连接的压缩上下文内存
+            ssl_context = self._get_ssl_context() if uri.startswith("wss://") else None
+            async with websockets.connect(uri, ssl=ssl_context, compression=None) as self._ws:
+                await self.on_open(self._auth)
+                logger.info("开启直播监听")
+                self._Worker_Tasks = [
+                    asyncio.create_task(self._dispatch_worker())
+                    for _ in range(max(1, self._config.dispatch_workers))
+                ]
+                while True:
+                    frame = await self._ws.recv()
+                    # 在接收端判断存活, 回调积压时心跳时间轮不会把正常的连接判定为失效
+                    self.last_heartbeat_reply = now = time.monotonic()
+                    if self._heartbeat_sent and frame[8:12] == _HEARTBEAT_REPLY_OP:
+                        self._on_heartbeat_reply(now)
+                    self.frames_received += 1
+                    self.bytes_received += len(frame)
+                    if self._recorder is not None:
+                        self._recorder.record(frame)
+                    await self._queue.put(frame, time.time() if self.lag is not None else 0)
+        finally:
+            for task in self._Worker_Tasks:
+                task.cancel()
+            await asyncio.gather(*self._Worker_Tasks, return_exceptions=True)
+            self._Worker_Tasks = []
+            if discarded := self._queue.clear():
+                logger.warning(f"[{self.room_id}] 连接关闭, 丢弃{discarded}帧未处理消息")
+            self._heartbeat.unregister(self)
+            if self._ws:
+                await self._ws.close()
+                self._ws = None
+
+    async def replay(self, source: FrameReplay) -> ReplayStats:
+        """
+        将录制的帧送入与实时连接相同的接收队列和解码分发流程, 全部处理完成后返回
+        :param source: 回放源
+        :return: 回放统计信息
+        """
+        loop = asyncio.get_running_loop()
+        # 与实时连接分开登记, 回放结束时不影响仍在运行的连接
+        owner = (self, "replay")
+        Decompressor.register(owner)
+        workers = [
+            asyncio.create_task(self._dispatch_worker())
+            for _ in range(max(1, self._config.dispatch_workers))
+        ]
+        start = loop.time()
+        try:
+            async for frame in source:
+                await self._queue.put(frame, time.time() if self.lag is not None else 0)
+            await self._queue.join()
+        finally:
+            source.stats.elapsed_seconds = loop.time() - start
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._queue.clear()
+            Decompressor.unregister(owner)
+        logger.info(f"[{self.room_id}] 回放完成, {source.stats.frames}帧, "
+                    f"{source.stats.elapsed_seconds:.2f}秒, {source.stats.frames_per_second:.0f}帧/秒")
+        return source.stats
+
+    def _on_authenticated(self):
+        """认证成功, 重置退避并记录恢复用时"""
+        self._backoff.reset()
+        self._failures_since_refresh = 0
+        if self._disconnected_at is not None:
+            recover = time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            self.reconnect_stats.reconnect_count += 1
+            self.reconnect_stats.last_recover_seconds = recover
+            self.reconnect_stats.total_downtime_seconds += recover
+            logger.info(f"[{self.room_id}] 重连成功({self.current_uri}), 用时{recover:.2f}秒")
 
     async def _send_packet(self, packet_type: int, payload: bytes):
         """
@@ -167,107 +384,132 @@ class BLiveClient:
         :param payload: 数据包
         :return: None
         """
-        header = struct.pack(">IHHII", 16 + len(payload), 16, 1, packet_type, 1)
-        """
-        偏移量	长度	类型	    含义
-        0	    4	uint32	封包总大小(头部大小+正文大小)
-        4	    2	uint16	头部大小(一般为0x0010，16字节)
-        6	    2	uint16	协议版本: 0.普通包正文不使用压缩, 1.心跳及认证包正文不使用压缩, 2.普通包正文使用zlib压缩, 3.普通包正文使用brotli压缩,解压为一个带头部的协议0普通包
-        8	    4	uint32	操作码(封包类型)
-        12	    4	uint32	sequence, 每次发包时向上递增
-        16      -   bytes[] 数据主体
-        """
-
-        await self._ws.send(header + payload)
+        await self._ws.send(pack_packet(packet_type, payload))
 
     async def on_open(self, encode_auth: bytes):
-        """建立连接后发送认证包和心跳包"""
+        """建立连接后发送认证包和心跳包, 之后的心跳由共享时间轮发送"""
         logger.debug("发送认证包")
-        await self._send_packet(7, encode_auth)
+        await self._send_packet(Operation.AUTH, encode_auth)
+        self.last_heartbeat_reply = time.monotonic()
+        await self.send_heartbeat()
+        self._heartbeat.register(self)
+
+    async def send_heartbeat(self):
+        """发送预先编码的心跳包"""
+        if self._ws is not None:
+            self._heartbeat_sent = time.monotonic()
+            await self._ws.send(HEARTBEAT_PACKET)
+
+    def _on_heartbeat_reply(self, received: float):
+        """接收循环收到心跳回应, 记录往返时间"""
+        self.heartbeat_rtt = received - self._heartbeat_sent
+        self._heartbeat_sent = 0
+        if self.lag is not None:
+            self.lag.rtt = self.heartbeat_rtt
+        if self._metrics is not None:
+            self._metrics.heartbeat_rtt_seconds.observe(self.heartbeat_rtt)
+
+    def on_heartbeat_timeout(self):
+        """心跳回应超时, 关闭连接以触发重连"""
+        logger.warning(f"[{self.room_id}] 超过{self._heartbeat.timeout}秒未收到任何数据, 判定连接失效")
+        self._close_reason = "心跳超时"
+        if self._ws is not None:
+            self._ws.transport.abort()
+
+    async def _dispatch_worker(self):
+        """从接收队列取出帧并解码分发"""
+        while True:
+            frame, received = await self._queue.get_timed()
+            try:
+                await self._on_message(frame, received)
+            except AuthError as e:
+                logger.error(f"[{self.room_id}] {e}")
+                self._auth_failed = True
+                self._close_reason = "认证失败"
+                if self._ws is not None:
+                    await self._ws.close()
+            except Exception as e:
+                logger.exception(f"[{self.room_id}] 消息处理失败: {e}")
+            finally:
+                self._queue.task_done()
 
-        async def run():
-            """每隔30秒发送一次心跳包"""
-            while True:
-                logger.debug("发送心跳包")
-                payload = struct.pack(">I", 520)
-                await self._send_packet(2, payload)
-                await asyncio.sleep(30)
+    @property
+    def queue_stats(self) -> QueueStats:
+        """接收队列统计信息"""
+        return self._queue.stats
 
-        self._Heartbeat_Task = asyncio.create_task(run())
+    @property
+    def decompress_stats(self) -> DecompressStats:
+        """解压统计信息"""
+        return self._decompressor.stats
 
-    async def _on_message(self, payload: bytes):
+    async def _on_message(self, payload: bytes, received: float = 0):
         """
         处理接收到的消息
         :param payload: 普通数据包
+        :param received: 接收时间(Unix秒), 启用延迟统计时提供
         :return: None
         """
-        offset = 0
-        body: bytes
-        header = HeaderTuple(*HEADER_STRUCT.unpack_from(payload))
+        # 压缩包解压后在原位置展开, 用迭代器栈代替递归并保持消息顺序
+        stack = [iter_packets(payload)]
         try:
-            match header.operation:
-                case Operation.SEND_MSG_REPLY:
-                    while True:
-                        body = payload[offset + header.raw_header_size: offset + header.pack_len]
-                        await self._parse_message(header, body)
-                        offset += header.pack_len
-                        if offset >= len(payload):
-                            break
-                        header = HeaderTuple(*HEADER_STRUCT.unpack_from(payload, offset))
-                case Operation.HEARTBEAT_REPLY:
-                    message = payload[offset + header.raw_header_size:]
-                    logger.debug(f"心跳回应: {[int.from_bytes(message[i:i + 4]) for i in range(0, len(message), 4)]}")
-                case Operation.AUTH_REPLY:
-                    message = payload[offset + header.raw_header_size:]
-                    decode_body = json.loads(message.decode())
-                    if decode_body['code'] != AuthReplyCode.OK:
-                        logger.error(f"认证失败 | code:{decode_body['code']}")
-                        raise AuthError(f"auth reply error, code={decode_body['code']}, body={decode_body}")
-                    logger.debug(f"认证回应: {decode_body}")
-        except struct.error:
-            logger.error(f'[{self.room_id}] parsing header failed offset={offset} payload={payload}')
-
-    async def _parse_message(self, header: HeaderTuple, payload: bytes):
+            while stack:
+                for operation, ver, body in stack[-1]:
+                    match operation:
+                        case Operation.SEND_MSG_REPLY:
+                            if ver in (ProtoVer.BROTLI, ProtoVer.DEFLATE):
+                                if self._metrics is None:
+                                    data = await self._decompressor.decompress(ver, body)
+                                else:
+                                    start = time.perf_counter()
+                                    data = await self._decompressor.decompress(ver, body)
+                                    self._metrics.decompress_seconds.observe(time.perf_counter() - start)
+                                stack.append(iter_packets(data))
+                                break
+                            if ver == ProtoVer.NORMAL:
+                                await self._parse_message(body, received)
+                        case Operation.HEARTBEAT_REPLY:
+                            logger.debug(f"心跳回应: {[int.from_bytes(body[i:i + 4]) for i in range(0, len(body), 4)]}")
+                        case Operation.AUTH_REPLY:
+                            decode_body = self._json.loads(body)
+                            if decode_body['code'] != AuthReplyCode.OK:
+                                logger.error(f"认证失败 | code:{decode_body['code']}")
+                                raise AuthError(f"auth reply error, code={decode_body['code']}, body={decode_body}")
+                            logger.debug(f"认证回应: {decode_body}")
+                            self._on_authenticated()
+                else:
+                    stack.pop()
+        except (struct.error, FrameError) as e:
+            logger.error(f'[{self.room_id}] parsing header failed: {e} payload={payload}')
+
+    async def _parse_message(self, payload: memoryview, received: float = 0):
+        """
+        解析未压缩的JSON消息并分发
+        :param payload: 数据主体
+        :param received: 所在帧的接收时间(Unix秒), 为0时不统计延迟
+        :return: None
+        """
         decode_body: dict
-        match header.ver:
-            case ProtoVer.BROTLI:
-                await self._on_message(
-                    await asyncio.to_thread(brotli.decompress, payload))
-            case ProtoVer.NORMAL:
-                if len(payload) != 0:
-                    decode_body = json.loads(payload.decode())
-                    await self._msg_hander.handle(self.room_id, decode_body)
-                    if self._config.save_history_method == 2:
-                        await asyncio.create_task(self._write_file(decode_body))
-
-    async def _write_file(self, data: dict) -> bool:
-        if not isinstance(data, dict):
-            raise TypeError("data must be a dict")
-        file_path = TEMP_PATH / "bililive" / f"{self.room_id}.json"
-        data["add_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        try:
-            if file_path.exists():
-                async with aiofiles.open(file_path, 'r+', encoding='utf-8') as file:
-                    content = await file.read()
-                    data = json.loads(content) if content else []
-                    data.append(data)
-                    await file.seek(0)
-                    await file.truncate()
-                    await file.write(json.dumps(data, ensure_ascii=False, indent=4))
+        if len(payload) != 0:
+            if self._history is None:
+                cmd = peek_cmd(payload)
+                if cmd is not None and not self._msg_hander.is_subscribed(cmd, self.room_id):
+                    self._msg_hander.discard(self.room_id, cmd, payload)
+                    return
+            if self._metrics is None:
+                decode_body = self._json.loads(payload)
             else:
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                async with aiofiles.open(file_path, 'w', encoding='utf-8') as file:
-                    await file.write(json.dumps([data], ensure_ascii=False, indent=4))
-            return True
-        except Exception as e:
-            print(f"文件写入错误，日志: {e}")
-            return False
+                start = time.perf_counter()
+                decode_body = self._json.loads(payload)
+                self._metrics.parse_seconds.observe(time.perf_counter() - start)
+            trace = self.lag.trace(received, time.time()) if self.lag is not None and received else None
+            await self._msg_hander.handle(self.room_id, decode_body, trace)
+            if self._history is not None:
+                self._history.append(decode_body)
 
     async def get_room_id(self):
         params = await Signedparams.get_end_result(self.user_id)
-        async with self._session.get("https://api.bilibili.com/x/space/wbi/acc/info", params=params) as response:
-            response.raise_for_status()
-            data: dict = (await response.json())["data"]
+        data: dict = (await self._api.request("acc_info", params))["data"]
         if data["live_room"]["roomStatus"]:
             message = f"""\n
             ===== [{data["name"]}]直播间状态 =====
@@ -284,8 +526,8 @@ class BLiveClient:
             self.room_id = int(data["live_room"]["roomid"])
 
     async def stop_and_close(self):
-        await self._session.close()
         await self.stop()
+        await self.close()
 
     async def stop(self):
         if self._Main_Task is not None:
@@ -296,7 +538,22 @@ class BLiveClient:
                 logger.warning("主任务取消超时")
             except asyncio.CancelledError:
                 pass
+            except Exception:
+                # 异常退出已由_on_main_task_done记录
+                pass
             self._Main_Task = None
+        if self._history is not None:
+            await self._history.close()
+            self._history = None
+        if self._recorder is not None:
+            await self._recorder.close()
+            self._recorder = None
+        if self._metrics is not None:
+            await self._metrics.unregister(self)
+            self._metrics = None
+        if LoopProfiler._default is not None:
+            LoopProfiler._default.unregister(self)
+        Decompressor.unregister(self)
         self.program_status = False
 
     async def close(self):
@@ -305,22 +562,30 @@ class BLiveClient:
             self._session = None
 
     async def live_room_monitor(self):
+        """由所有直播间共享的LiveStatusPoller批量轮询直播状态, 直到任务被取消"""
+        poller = LiveStatusPoller.default(
+            self._session,
+            batch_size=self._config.live_status_batch_size,
+            min_interval=self._config.live_status_min_interval,
+            live_interval=self._config.live_status_live_interval,
+            offline_interval=self._config.live_status_offline_interval,
+            max_interval=self._config.live_status_max_interval,
+        )
+        poller.attach_session(self._session)
+        room_id = self.room_id
+        poller.subscribe(self._on_live_status, room_id)
+        poller.add_room(room_id, self.live_status)
         try:
-            while True:
-                async with self._session.get(GetRoomStatus.format(self.room_id)) as response:
-                    response.raise_for_status()
-                    data = (await response.json())["data"]
-                if data["live_status"] and not self.live_status:
-                    logger.info(f"[{self.room_id}] | 直播开始")
-                    self.live_status = True
-                if not data["live_status"] and self.live_status:
-                    logger.info(f"[{self.room_id}] | 直播结束")
-                    self.live_status = False
-                await asyncio.sleep(5)
+            await asyncio.get_running_loop().create_future()
         except asyncio.CancelledError:
             logger.info("结束直播间状态监测")
-        except Exception as e:
-            logger.error(f"直播间状态监测失败,停止监测: {e}")
+        finally:
+            poller.remove_room(room_id)
+            poller.unsubscribe(self._on_live_status, room_id)
+
+    def _on_live_status(self, event: LiveStatusEvent):
+        self.live_status = event.live
+        logger.info(f"[{self.room_id}] | {'直播开始' if event.live else '直播结束'}")
 
     async def send_msg(self, message: str, reply_mid: int = 0, reply_uname: str = ""):
         """
@@ -330,7 +595,7 @@ class BLiveClient:
         :param reply_uname: 需要@时提供的用户名字
         :return: None
         """
-        data = {
+        form = {
             "roomid": self.room_id,
             "csrf": await self._get_cookie_csrf(),
             "msg": message,
@@ -342,9 +607,7 @@ class BLiveClient:
             "reply_uname": reply_uname,
             "bubble": 0,
         }
-        async with self._session.post("https://api.live.bilibili.com/msg/send", data=data) as response:
-            response.raise_for_status()
-            data: dict = await response.json()
+        data: dict = await self._api.request("send_msg", data=form)
         match data["code"]:
             case 0:
                 logger.success(f"[{self.room_id}] | 成功发送消息: {data['msg'] if data.get('msg') else message}")
@@ -368,9 +631,7 @@ class BLiveClient:
 
     async def _get_login_mid(self) -> int:
         try:
-            async with self._session.get("https://api.bilibili.com/x/space/myinfo") as response:
-                response.raise_for_status()
-                data = await response.json()
+            data = await self._api.request("myinfo")
             return data["data"]["mid"]
         except KeyError:
             logger.warning("获取登录用户UID失败,使用游客登录")
@@ -0,0 +1,105 @@
+"""数据包编解码"""
+import struct
+from typing import NamedTuple, Iterator, Callable, Optional
+
+from .enum import Operation, ProtoVer
+from .exception import FrameError
+
+__all__ = (
+    "HEADER_STRUCT",
+    "HEADER_SIZE",
+    "HeaderTuple",
+    "pack_packet",
+    "iter_packets",
+)
+
+HEADER_STRUCT = struct.Struct('>I2H2I')
+"""
+偏移量	长度	类型	    含义
+0	    4	uint32	封包总大小(头部大小+正文大小)
+4	    2	uint16	头部大小(一般为0x0010，16字节)
+6	    2	uint16	协议版本: 0.普通包正文不使用压缩, 1.心跳及认证包正文不使用压缩, 2.普通包正文使用zlib压缩, 3.普通包正文使用brotli压缩,解压为一个带头部的协议0普通包
+8	    4	uint32	操作码(封包类型)
+12	    4	uint32	sequence, 每次发包时向上递增
+16      -   bytes[] 数据主体
+"""
+HEADER_SIZE = HEADER_STRUCT.size
+
+
+class HeaderTuple(NamedTuple):
+    pack_len: int
+    """整个消息的长度"""
+
+    raw_header_size: int
+    """原始消息头的长度"""
+
+    ver: int
+    """
+    ========协议版本========
+    数据包协议版本        含义
+    0                  数据包有效负载为未压缩的JSON格式数据
+    1                  客户端心跳包，或服务器心跳回应(带有人气值)
+    3                  数据包有效负载为通过br压缩后的JSON格式数据(之前是zlib)
+    """
+
+    operation: int
+    """
+    ==================操作类型==================
+    数据包类型    发送方      名称             含义
+    2           Client     心跳             不发送心跳包，50-60秒后服务器会强制断开连接
+    3           Server     心跳回应          有效负载为直播间人气值
+    5           Server     通知             有效负载为礼物、弹幕、公告等内容数据
+    7           Client     认证(加入房间)     客户端成功建立连接后发送的第一个数据包
+    8           Server     认证成功回应       服务器接受认证包后回应的第一个数据包
+    """
+
+    seq_id: int
+    """序列ID"""
+
+
+def pack_packet(operation: int, payload: bytes, ver: int = ProtoVer.HEARTBEAT, seq_id: int = 1) -> bytes:
+    """
+    封装数据包
+    :param operation: 操作码
+    :param payload: 数据主体
+    :param ver: 协议版本
+    :param seq_id: 序列ID
+    :return: 带头部的数据包
+    """
+    return HEADER_STRUCT.pack(HEADER_SIZE + len(payload), HEADER_SIZE, ver, operation, seq_id) + payload
+
+
+def iter_packets(
+        data: bytes | memoryview,
+        decompress: Optional[Callable[[int, memoryview], bytes]] = None,
+) -> Iterator[tuple[int, int, memoryview]]:
+    """
+    依次取出一帧中的所有数据包, 数据主体为原始帧上的memoryview, 不复制数据.
+    提供decompress时, 压缩的通知包会在原位置解压展开, 只产出未压缩的数据包;
+    否则压缩包原样产出, 由调用方自行解压后再次调用本函数
+    :param data: WebSocket接收到的原始帧或解压后的数据
+    :param decompress: 解压函数, 参数为(协议版本, 压缩数据)
+    :return: 迭代器(操作码, 协议版本, 数据主体)
+    :raise FrameError: 数据包长度不合法
+    :raise struct.error: 数据不足一个头部长度
+    """
+    view = memoryview(data)
+    offset = 0
+    stack: list[tuple[memoryview, int]] = []
+    while True:
+        if offset >= len(view):
+            if not stack:
+                return
+            view, offset = stack.pop()
+            continue
+        pack_len, header_size, ver, operation, _ = HEADER_STRUCT.unpack_from(view, offset)
+        if pack_len < header_size or header_size < HEADER_SIZE or offset + pack_len > len(view):
+            raise FrameError(f"invalid packet, offset={offset} pack_len={pack_len} header_size={header_size}")
+        body = view[offset + header_size: offset + pack_len]
+        offset += pack_len
+        if (decompress is not None and operation == Operation.SEND_MSG_REPLY
+                and ver in (ProtoVer.BROTLI, ProtoVer.DEFLATE)):
+            stack.append((view, offset))
+            view, offset = memoryview(decompress(ver, body)), 0
+            continue
+        yield operation, ver, body
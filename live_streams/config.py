@@ -10,6 +10,86 @@ class Config(BaseModel):
     """是否启用数据分析,未启用消息存储时只能分析单场直播"""
     cookie: str = None
     """COOKIE"""
+    protover: int = 3
+    """认证时协商的协议版本, 2为zlib压缩/3为brotli压缩, zlib解压CPU开销更低但流量更大"""
+    history_segment_size: int = 64 * 1024 * 1024
+    """本地历史记录单个分段文件的最大字节数, 超出后切换新分段"""
+    history_segment_interval: int = 3600
+    """本地历史记录单个分段文件的最长写入时间(秒), 超出后切换新分段"""
+    history_buffer_size: int = 4096
+    """本地历史记录在内存中缓存的最大消息条数, 达到后立即写入磁盘"""
+    history_max_buffered: int = 65536
+    """磁盘写入变慢或卡住时本地历史记录和帧录制在内存中最多缓存的条数, 超出后丢弃最早的数据"""
+    record_frames: bool = False
+    """是否录制WebSocket接收到的原始帧, 录制文件可用BLiveClient.replay回放"""
+    queue_size: int = 1024
+    """每个直播间接收队列的最大帧数"""
+    overflow_policy: str = "block"
+    """接收队列溢出策略, block为阻塞接收/drop_oldest为丢弃最早的帧/drop_by_priority为按cmd优先级丢弃(压缩的批量帧不区分cmd)"""
+    dispatch_workers: int = 1
+    """每个直播间的解码分发任务数, 大于1时不保证消息顺序"""
+    reconnect_backoff_base: float = 1.0
+    """断线重连首次等待时间上限(秒), 之后按指数增长并加入随机抖动"""
+    reconnect_backoff_max: float = 60.0
+    """断线重连等待时间上限(秒)"""
+    heartbeat_interval: float = 30.0
+    """心跳周期(秒), 所有连接共用一个时间轮"""
+    heartbeat_slots: int = 30
+    """心跳时间轮槽数, 心跳均匀分布在各槽中发送"""
+    heartbeat_timeout: float = 45.0
+    """超过该时间(秒)未收到任何帧(包括心跳回应)则判定连接失效并重连"""
+    probe_hosts: bool = False
+    """连接前是否探测所有弹幕服务器的握手耗时, 优先连接最快的服务器"""
+    probe_ttl: float = 300
+    """服务器探测结果的缓存时间(秒), 所有直播间共享"""
+    probe_timeout: float = 3.0
+    """单个服务器探测的超时时间(秒)"""
+    pool_admission_rate: float = 10
+    """RoomPool每秒最多启动的直播间数, 避免批量启动时触发风控"""
+    pool_max_concurrent_starts: int = 20
+    """RoomPool同时处于启动过程中的最大直播间数"""
+    http_connection_limit: int = 100
+    """RoomPool共享HTTP连接池的最大连接数"""
+    http_connection_limit_per_host: int = 30
+    """RoomPool共享HTTP连接池对单个域名的最大连接数"""
+    decompress_inline_threshold: int = 2048
+    """压缩数据小于该字节数时直接在事件循环中解压, 否则交给共享线程池"""
+    decompress_workers: int = 4
+    """所有直播间共享的解压线程池(或进程池)大小"""
+    decompress_process_pool: bool = False
+    """是否使用进程池解压大数据包"""
+    metrics_enabled: bool = False
+    """是否收集运行指标并通过HTTP接口以Prometheus文本格式导出"""
+    metrics_host: str = "127.0.0.1"
+    """指标接口监听地址"""
+    metrics_port: int = 9108
+    """指标接口监听端口, 地址为 http://{metrics_host}:{metrics_port}/metrics"""
+    lag_tracking: bool = False
+    """是否按cmd统计从服务器发出到回调完成的各阶段延迟, 启用指标时一并导出"""
+    lag_skew_window: float = 60
+    """估计服务器时钟偏差的窗口(秒)"""
+    lag_max_offset: float = 3600
+    """接收时间与服务器时间戳相差超过该秒数时视为时间戳无效, 不参与时钟偏差估计和network/total统计"""
+    loop_profiler: bool = False
+    """是否监测事件循环延迟, 并把阻塞事件循环的调用归因到具体的协程和代码位置"""
+    loop_lag_interval: float = 0.1
+    """事件循环延迟的测量间隔(秒)"""
+    loop_block_threshold: float = 0.1
+    """事件循环延迟超过该值(秒)时记录阻塞位置并输出警告"""
+    loop_profile_seconds: float = 10
+    """收到SIGUSR1信号时对事件循环采样的时长(秒), 结果写入临时目录下的profiles"""
+    live_status_batch_size: int = 50
+    """直播状态轮询每个请求包含的最大直播间数"""
+    live_status_min_interval: float = 5
+    """接近以往开播时刻时的直播状态轮询间隔(秒)"""
+    live_status_live_interval: float = 15
+    """直播中的直播状态轮询间隔(秒)"""
+    live_status_offline_interval: float = 30
+    """未开播的直播状态轮询间隔(秒), 未开播每持续一小时翻倍一次"""
+    live_status_max_interval: float = 300
+    """直播状态轮询间隔上限(秒)"""
+    json_backend: str = "stdlib"
+    """消息解码和历史记录编码使用的JSON后端, stdlib/orjson/msgspec/ujson, auto为使用已安装的最快后端"""
 
 
 CMD_TO_INFO = {
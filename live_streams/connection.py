@@ -0,0 +1,51 @@
+"""连接重试"""
+import dataclasses
+import random
+
+__all__ = (
+    "Backoff",
+    "ReconnectStats",
+)
+
+
+class Backoff:
+    """带随机抖动的指数退避"""
+
+    def __init__(self, base: float = 1.0, maximum: float = 60.0):
+        """
+        :param base: 首次重试的等待上限(秒)
+        :param maximum: 等待时间上限(秒)
+        """
+        self.base = base
+        self.maximum = maximum
+        self.attempt: int = 0
+        """连续失败次数"""
+
+    def next_delay(self) -> float:
+        """
+        计算下一次重试前的等待时间, 在[0, min(maximum, base * 2^attempt)]之间均匀随机
+        :return: 等待秒数
+        """
+        # 限制指数, 长时间断线后2^attempt超出浮点数范围
+        delay = random.uniform(0, min(self.maximum, self.base * 2 ** min(self.attempt, 64)))
+        self.attempt += 1
+        return delay
+
+    def reset(self):
+        self.attempt = 0
+
+
+@dataclasses.dataclass
+class ReconnectStats:
+    reconnect_count: int = 0
+    """重连成功次数"""
+    failed_attempts: int = 0
+    """连接失败次数"""
+    token_refresh_count: int = 0
+    """重新获取认证令牌的次数"""
+    last_disconnect_reason: str = ""
+    """最近一次断开的原因"""
+    last_recover_seconds: float = 0
+    """最近一次从断开到重新认证成功的用时(秒)"""
+    total_downtime_seconds: float = 0
+    """累计断开时长(秒)"""
@@ -0,0 +1,119 @@
+"""数据包解压"""
+import asyncio
+import concurrent.futures
+import dataclasses
+import time
+import zlib
+from typing import Optional, Callable, Hashable
+
+import brotli
+
+from .enum import ProtoVer
+
+__all__ = (
+    "Decompressor",
+    "DecompressStats",
+)
+
+_DECOMPRESS_FUNC: dict[int, Callable[[bytes], bytes]] = {
+    ProtoVer.DEFLATE: zlib.decompress,
+    ProtoVer.BROTLI: brotli.decompress,
+}
+"""协议版本 -> 解压函数"""
+
+
+@dataclasses.dataclass
+class DecompressStats:
+    calls: int = 0
+    """解压次数"""
+    inline_calls: int = 0
+    """在事件循环中直接解压的次数"""
+    offloaded_calls: int = 0
+    """交给线程池或进程池解压的次数"""
+    bytes_in: int = 0
+    """压缩数据总字节数"""
+    bytes_out: int = 0
+    """解压后数据总字节数"""
+    seconds: float = 0
+    """解压总耗时(秒), 线程池或进程池解压包含排队等待时间"""
+
+
+class Decompressor:
+    """
+    数据包解压器, 支持zlib(protover=2)和brotli(protover=3), 按压缩数据大小选择解压方式:
+    小于阈值时直接在事件循环中解压, 避免线程切换开销; 否则交给所有直播间共享的有界线程池(或进程池),
+    不占用asyncio默认线程池. 使用者通过register/unregister登记, 所有使用者都注销后关闭共享的执行器
+    """
+
+    _executors: dict[bool, concurrent.futures.Executor] = {}
+    """是否为进程池 -> 共享的执行器"""
+    _owners: set[Hashable] = set()
+
+    def __init__(self, inline_threshold: int = 2048, max_workers: int = 4, use_process_pool: bool = False):
+        """
+        :param inline_threshold: 压缩数据小于该字节数时直接解压
+        :param max_workers: 共享执行器的最大线程数或进程数, 仅在首次创建执行器时生效
+        :param use_process_pool: 是否使用进程池解压大数据包
+        """
+        self.inline_threshold = inline_threshold
+        self.max_workers = max_workers
+        self.use_process_pool = use_process_pool
+        self.stats = DecompressStats()
+
+    async def decompress(self, ver: int, data: bytes | memoryview) -> bytes:
+        """
+        解压数据包
+        :param ver: 协议版本
+        :param data: 压缩数据
+        :return: 解压后的数据
+        :raise KeyError: 不支持的协议版本
+        """
+        func = _DECOMPRESS_FUNC[ver]
+        start = time.perf_counter()
+        if len(data) < self.inline_threshold:
+            result = func(data)
+            self.stats.inline_calls += 1
+        else:
+            if self.use_process_pool:
+                # memoryview无法序列化到子进程
+                data = bytes(data)
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, data)
+            self.stats.offloaded_calls += 1
+        self.stats.seconds += time.perf_counter() - start
+        self.stats.calls += 1
+        self.stats.bytes_in += len(data)
+        self.stats.bytes_out += len(result)
+        return result
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        executor: Optional[concurrent.futures.Executor] = Decompressor._executors.get(self.use_process_pool)
+        if executor is None:
+            if self.use_process_pool:
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="decompress")
+            Decompressor._executors[self.use_process_pool] = executor
+        return executor
+
+    @classmethod
+    def register(cls, owner: Hashable):
+        """
+        登记共享执行器的使用者, 执行器在首次解压大数据包时创建
+        :param owner: 使用者, 通常为BLiveClient
+        :return: None
+        """
+        cls._owners.add(owner)
+
+    @classmethod
+    def unregister(cls, owner: Hashable):
+        cls._owners.discard(owner)
+        if not cls._owners:
+            cls.shutdown()
+
+    @classmethod
+    def shutdown(cls):
+        """关闭共享的执行器"""
+        for executor in cls._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        cls._executors.clear()
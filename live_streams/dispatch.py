@@ -0,0 +1,195 @@
+"""回调分发"""
+import asyncio
+import concurrent.futures
+import dataclasses
+import inspect
+import time
+from typing import Callable, Optional, Any, Iterable, Iterator
+
+from loguru import logger
+
+__all__ = (
+    "Callback",
+    "CallbackList",
+    "CallbackStats",
+)
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="handler")
+    return _executor
+
+
+@dataclasses.dataclass
+class CallbackStats:
+    calls: int = 0
+    """调用次数"""
+    errors: int = 0
+    """抛出异常的次数"""
+    timeouts: int = 0
+    """超时次数"""
+    total_seconds: float = 0
+    """累计耗时(秒)"""
+    max_seconds: float = 0
+    """单次最大耗时(秒)"""
+
+    @property
+    def avg_seconds(self) -> float:
+        """平均耗时(秒)"""
+        return self.total_seconds / self.calls if self.calls else 0
+
+
+class Callback:
+    """
+    注册时预编译的回调函数.
+    同步函数直接在事件循环中调用, 不创建任务; 异步函数可设置超时和并发上限;
+    CPU密集的同步函数可交给线程池执行. 回调抛出的异常只影响自身, 不影响其他回调
+    """
+
+    __slots__ = ("func", "name", "is_async", "timeout", "offload", "stats", "_semaphore")
+
+    def __init__(
+            self,
+            func: Callable[[Any], Any],
+            timeout: Optional[float] = None,
+            concurrency: Optional[int] = None,
+            offload: bool = False,
+    ):
+        """
+        :param func: 回调函数, 参数为消息模型
+        :param timeout: 单次调用超时时间(秒), 同步函数仅在offload时生效
+        :param concurrency: 同时执行的最大调用数
+        :param offload: 同步函数是否交给线程池执行
+        """
+        self.func = func
+        self.name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+        self.is_async = inspect.iscoroutinefunction(func)
+        if offload and self.is_async:
+            raise ValueError("only sync functions can be offloaded")
+        self.timeout = timeout
+        self.offload = offload
+        self.stats = CallbackStats()
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    @property
+    def inline(self) -> bool:
+        """是否在事件循环中直接同步调用"""
+        return not (self.is_async or self.offload)
+
+    def call_sync(self, model):
+        """直接调用同步回调"""
+        start = time.perf_counter()
+        try:
+            self.func(model)
+        except Exception as e:
+            self.stats.errors += 1
+            logger.exception(f"回调{self.name}执行失败: {e}")
+        finally:
+            self._record(time.perf_counter() - start)
+
+    async def call_async(self, model):
+        """调用异步回调或交给线程池执行的同步回调"""
+        if self._semaphore is not None:
+            async with self._semaphore:
+                await self._call_async(model)
+        else:
+            await self._call_async(model)
+
+    async def _call_async(self, model):
+        start = time.perf_counter()
+        try:
+            if self.offload:
+                awaitable = asyncio.get_running_loop().run_in_executor(_get_executor(), self.func, model)
+            else:
+                awaitable = self.func(model)
+            if self.timeout is not None:
+                await asyncio.wait_for(awaitable, self.timeout)
+            else:
+                await awaitable
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            logger.warning(f"回调{self.name}执行超时({self.timeout}秒)")
+        except Exception as e:
+            self.stats.errors += 1
+            logger.exception(f"回调{self.name}执行失败: {e}")
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def _record(self, elapsed: float):
+        self.stats.calls += 1
+        self.stats.total_seconds += elapsed
+        if elapsed > self.stats.max_seconds:
+            self.stats.max_seconds = elapsed
+
+
+class CallbackList:
+    """注册时按同步/异步预先分组的回调函数列表"""
+
+    __slots__ = ("callbacks", "predicates", "filtered", "_inline", "_deferred", "_subsets")
+
+    def __init__(
+            self,
+            callbacks: Iterable[Callback] = (),
+            predicates: Optional[Iterable[Optional[Callable[[dict], bool]]]] = None,
+    ):
+        """
+        :param callbacks: 回调函数
+        :param predicates: 与callbacks一一对应的过滤函数, 对原始消息求值, None表示不过滤
+        """
+        self.callbacks: tuple[Callback, ...] = tuple(callbacks)
+        self.predicates: tuple[Optional[Callable[[dict], bool]], ...] = \
+            tuple(predicates) if predicates is not None else (None,) * len(self.callbacks)
+        self.filtered: bool = any(predicate is not None for predicate in self.predicates)
+        """是否有带过滤条件的回调函数"""
+        self._inline = tuple(callback for callback in self.callbacks if callback.inline)
+        self._deferred = tuple(callback for callback in self.callbacks if not callback.inline)
+        self._subsets: dict[tuple[Callback, ...], CallbackList] = {}
+
+    def __add__(self, other: "CallbackList") -> "CallbackList":
+        return CallbackList(self.callbacks + other.callbacks, self.predicates + other.predicates)
+
+    def __len__(self) -> int:
+        return len(self.callbacks)
+
+    def __iter__(self) -> Iterator[Callback]:
+        return iter(self.callbacks)
+
+    def select(self, message: dict) -> Optional["CallbackList"]:
+        """
+        在构造消息模型之前按过滤条件选出需要调用的回调函数
+        :param message: 解码后的原始消息
+        :return: 需要调用的回调函数, 全部被过滤时返回None
+        """
+        matched = tuple(
+            callback for callback, predicate in zip(self.callbacks, self.predicates)
+            if predicate is None or predicate(message)
+        )
+        if len(matched) == len(self.callbacks):
+            return self
+        if not matched:
+            return None
+        try:
+            return self._subsets[matched]
+        except KeyError:
+            subset = self._subsets[matched] = CallbackList(matched)
+            return subset
+
+    async def dispatch(self, model):
+        """
+        将消息分发给回调函数: 同步回调按顺序直接调用, 只有一个异步回调时直接等待, 多个时并发执行
+        :param model: 消息模型
+        :return: None
+        """
+        for callback in self._inline:
+            callback.call_sync(model)
+        match len(self._deferred):
+            case 0:
+                return
+            case 1:
+                await self._deferred[0].call_async(model)
+            case _:
+                await asyncio.gather(*(callback.call_async(model) for callback in self._deferred))
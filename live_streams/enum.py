@@ -37,3 +37,10 @@ class Operation(enum.IntEnum):
 class AuthReplyCode(enum.IntEnum):
     OK = 0
     TOKEN_ERROR = -101
+
+
+class OverflowPolicy(enum.StrEnum):
+    """消息队列溢出策略"""
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_BY_PRIORITY = "drop_by_priority"
@@ -1,2 +1,6 @@
 class AuthError(Exception):
     """认证失败"""
+
+
+class FrameError(Exception):
+    """数据包格式错误"""
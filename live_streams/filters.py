@@ -0,0 +1,179 @@
+"""回调过滤条件"""
+import abc
+import operator
+from typing import Any, Callable, Iterable
+
+__all__ = (
+    "F",
+    "Condition",
+    "Field",
+    "compile_where",
+)
+
+Predicate = Callable[[dict], bool]
+"""编译后的过滤函数, 参数为解码后未构造模型的原始消息"""
+
+_MISSING = object()
+
+
+class Condition(abc.ABC):
+    """
+    声明式过滤条件, 注册时针对消息类型编译, 在构造消息模型之前对原始消息求值.
+    条件之间可以用 & | ~ 组合
+    """
+
+    @abc.abstractmethod
+    def compile(self, model_type: type) -> Predicate:
+        """
+        编译为针对某个消息类型原始消息的过滤函数
+        :param model_type: 消息类型, 需要在raw_paths中声明字段在原始消息中的位置
+        :return: 过滤函数
+        """
+        raise NotImplementedError("compile")
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return _All((self, other))
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return _Any((self, other))
+
+    def __invert__(self) -> "Condition":
+        return _Not(self)
+
+
+class _All(Condition):
+    def __init__(self, conditions: Iterable[Condition]):
+        self.conditions = tuple(conditions)
+
+    def compile(self, model_type: type) -> Predicate:
+        predicates = tuple(condition.compile(model_type) for condition in self.conditions)
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda message: all(predicate(message) for predicate in predicates)
+
+
+class _Any(Condition):
+    def __init__(self, conditions: Iterable[Condition]):
+        self.conditions = tuple(conditions)
+
+    def compile(self, model_type: type) -> Predicate:
+        predicates = tuple(condition.compile(model_type) for condition in self.conditions)
+        return lambda message: any(predicate(message) for predicate in predicates)
+
+
+class _Not(Condition):
+    def __init__(self, condition: Condition):
+        self.condition = condition
+
+    def compile(self, model_type: type) -> Predicate:
+        predicate = self.condition.compile(model_type)
+        return lambda message: not predicate(message)
+
+
+class _Compare(Condition):
+    def __init__(self, field: str, test: Callable[[Any], bool], description: str):
+        self.field = field
+        self.test = test
+        self.description = description
+
+    def __repr__(self):
+        return f"<Condition {self.field} {self.description}>"
+
+    def compile(self, model_type: type) -> Predicate:
+        raw_paths: dict[str, tuple] = getattr(model_type, "raw_paths", {})
+        if self.field not in raw_paths:
+            raise ValueError(f"{model_type.__name__} does not support filtering on field {self.field!r}")
+        path = raw_paths[self.field]
+        default = getattr(model_type, "raw_defaults", {}).get(self.field, _MISSING)
+        test = self.test
+
+        def predicate(message: dict) -> bool:
+            value = message
+            try:
+                for key in path:
+                    value = value[key]
+            except (KeyError, IndexError, TypeError):
+                if default is _MISSING:
+                    return False
+                value = default
+            try:
+                return bool(test(value))
+            except (TypeError, AttributeError):
+                # 类型不匹配(如None与数字比较、对None调用startswith)视为不满足条件
+                return False
+
+        return predicate
+
+
+class Field:
+    """
+    消息模型字段, 通过F.<字段名>创建, 如:
+    F.msg.startswith("!") & (F.guard_level <= 3)
+    """
+
+    __slots__ = ("name",)
+    __hash__ = None
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _compare(self, op: Callable[[Any, Any], bool], value, symbol: str) -> Condition:
+        return _Compare(self.name, lambda v: op(v, value), f"{symbol} {value!r}")
+
+    def __eq__(self, value) -> Condition:
+        return self._compare(operator.eq, value, "==")
+
+    def __ne__(self, value) -> Condition:
+        return self._compare(operator.ne, value, "!=")
+
+    def __lt__(self, value) -> Condition:
+        return self._compare(operator.lt, value, "<")
+
+    def __le__(self, value) -> Condition:
+        return self._compare(operator.le, value, "<=")
+
+    def __gt__(self, value) -> Condition:
+        return self._compare(operator.gt, value, ">")
+
+    def __ge__(self, value) -> Condition:
+        return self._compare(operator.ge, value, ">=")
+
+    def between(self, low, high) -> Condition:
+        """low <= 字段值 <= high"""
+        return _Compare(self.name, lambda v: low <= v <= high, f"between {low!r} and {high!r}")
+
+    def in_(self, values: Iterable) -> Condition:
+        """字段值属于values"""
+        values = frozenset(values)
+        return _Compare(self.name, values.__contains__, f"in {set(values)!r}")
+
+    def startswith(self, *prefixes: str) -> Condition:
+        """字符串字段以任一前缀开头"""
+        return _Compare(self.name, lambda v: v.startswith(prefixes), f"startswith {prefixes!r}")
+
+    def contains(self, *keywords: str) -> Condition:
+        """字符串字段包含任一关键词"""
+        return _Compare(self.name, lambda v: any(keyword in v for keyword in keywords), f"contains {keywords!r}")
+
+
+class _FieldFactory:
+    def __getattr__(self, name: str) -> Field:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Field(name)
+
+
+F = _FieldFactory()
+"""字段引用, F.uid == 1 等价于 Field("uid") == 1"""
+
+
+def compile_where(where: Condition | Iterable[Condition], model_type: type) -> Predicate:
+    """
+    编译append_func的where参数
+    :param where: 过滤条件, 多个条件之间为"且"的关系
+    :param model_type: 消息类型
+    :return: 过滤函数
+    """
+    if isinstance(where, Condition):
+        return where.compile(model_type)
+    return _All(where).compile(model_type)
@@ -1,11 +1,20 @@
 """消息解析模块"""
-import asyncio
-from typing import Optional, Union
+import functools
+import time
+import types
+from typing import Optional, Union, Iterable, TYPE_CHECKING
 
+from . import metrics as _metrics
+from .dispatch import Callback, CallbackList, CallbackStats
+from .filters import Condition, compile_where
 from .models import *
 
+if TYPE_CHECKING:
+    from .lag import LagTrace
+
 __all__ = (
     "Handler",
+    "peek_cmd",
 )
 
 IGNORED_CMDS = {
@@ -53,6 +62,51 @@ _msg_type = Union[
     type[InteractWordV2Message],
 ]
 logged_unknown_cmds = set()
+_CMD_KEY = b'"cmd"'
+_PEEK_SIZE = 64
+
+
+def peek_cmd(body: bytes | memoryview) -> Optional[str]:
+    """
+    不解码JSON, 直接从原始消息开头取出cmd, 仅当cmd为第一个键时生效
+    :param body: 未解码的JSON消息
+    :return: 去掉":"后缀的cmd, 无法快速取出时返回None
+    """
+    head = bytes(body[:_PEEK_SIZE]).lstrip()
+    if not head.startswith(b"{"):
+        return None
+    head = head[1:].lstrip()
+    if not head.startswith(_CMD_KEY):
+        return None
+    head = head[len(_CMD_KEY):].lstrip()
+    if not head.startswith(b":"):
+        return None
+    head = head[1:].lstrip()
+    if not head.startswith(b'"'):
+        return None
+    end = head.find(b'"', 1)
+    if end == -1:
+        return None
+    cmd = head[1:end]
+    if b"\\" in cmd:
+        return None
+    pos = cmd.find(b":")
+    if pos != -1:
+        cmd = cmd[:pos]
+    return cmd.decode()
+
+
+class _hybridmethod:
+    """在类上调用时作用于默认实例, 在实例上调用时作用于该实例"""
+
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            instance = owner.default()
+        return types.MethodType(self.func, instance)
 
 
 class Handler:
@@ -61,6 +115,12 @@ class Handler:
     请使用append_func装饰器装饰解析函数, 并标注需要注入的消息类型, 如:
     @Handler.append_func(DanmakuMessage)
     async def _(model):
+    同步函数会直接在事件循环中调用, 不创建任务.
+    回调函数注册在Handler实例上, 在类上调用时注册到默认实例(未指定处理器的BLiveClient都使用默认实例);
+    指定room_id时只接收对应直播间的消息, 指定where时只接收满足条件的消息, 如:
+    handler = Handler()
+    @handler.append_func(DanmakuMessage, room_id=21452505, where=F.msg.startswith("!"))
+    async def _(model):
     """
 
     _CMD_MODEL_DICT: dict[str, Optional[_msg_type]] = {
@@ -93,33 +153,174 @@ class Handler:
     for cmd in IGNORED_CMDS:
         _CMD_MODEL_DICT[cmd] = None
     del cmd
+    _default: Optional["Handler"] = None
+
+    def __init__(self):
+        self._registry: dict[tuple[Optional[int], type], CallbackList] = {}
+        """(直播间ID, 消息类型) -> 回调函数, 直播间ID为None表示所有直播间"""
+        self._resolved: dict[tuple[int, type], Optional[CallbackList]] = {}
+        """(直播间ID, 消息类型) -> 合并后的回调函数缓存, 注册时清空"""
+        self._subscribed: dict[Optional[int], set[str]] = {}
+        """直播间ID -> 已注册回调函数的cmd, 不在其中的消息无需解码"""
 
     @classmethod
-    async def handle(cls, room_id: int, message: dict):
+    def default(cls) -> "Handler":
+        """默认处理器实例"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @_hybridmethod
+    async def handle(self, room_id: int, message: dict, trace: Optional["LagTrace"] = None):
+        """
+        将消息转换为模型并分发给回调函数
+        :param room_id: 直播间ID
+        :param message: 解码后的消息
+        :param trace: 启用延迟统计时本地各阶段的时间, 回调完成后记录
+        :return: None
+        """
         cmd = message.get("cmd", "")
         pos = cmd.find(":")
         if pos != -1:
             cmd = cmd[:pos]
 
-        model_type = cls._CMD_MODEL_DICT.get(cmd)
-        if model_type is not None:
-            model = model_type.from_command(message)
-            model.room_id = room_id
-            await asyncio.gather(*(fun(model) for fun in model._func))
+        metrics = _metrics.registry
+        if metrics is not None:
+            metrics.cmd_packets[cmd] += 1
+        model_type = self._CMD_MODEL_DICT.get(cmd)
+        if model_type is not None and (callbacks := self.get_callbacks(room_id, model_type)):
+            if callbacks.filtered:
+                callbacks = callbacks.select(message)
+                if callbacks is None:
+                    return
+            if metrics is None and trace is None:
+                model = model_type.from_command(message)
+                model.room_id = room_id
+                await callbacks.dispatch(model)
+            else:
+                start = time.perf_counter()
+                model = model_type.from_command(message)
+                model.room_id = room_id
+                built = time.perf_counter()
+                if trace is not None:
+                    trace.dispatched = time.time()
+                await callbacks.dispatch(model)
+                if metrics is not None:
+                    metrics.model_build_seconds.observe(built - start)
+                    metrics.dispatch_seconds.observe(time.perf_counter() - built)
+                if trace is not None:
+                    trace.done(cmd, model)
+
+        if cmd not in self._CMD_MODEL_DICT:
+            self._log_unknown(room_id, cmd, message)
+
+    def get_callbacks(self, room_id: int, model_type: type) -> Optional[CallbackList]:
+        """
+        获取直播间某个消息类型的回调函数, 包括所有直播间通用的回调函数
+        :param room_id: 直播间ID
+        :param model_type: 消息类型
+        :return: 回调函数, 没有时返回None
+        """
+        key = (room_id, model_type)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        callbacks = self._registry.get((None, model_type), CallbackList()) + \
+            self._registry.get(key, CallbackList())
+        self._resolved[key] = callbacks = callbacks if len(callbacks) else None
+        return callbacks
 
+    @_hybridmethod
+    def is_subscribed(self, cmd: str, room_id: Optional[int] = None) -> bool:
+        """
+        判断cmd是否有已注册的回调函数
+        :param cmd: 去掉":"后缀的cmd
+        :param room_id: 直播间ID, 为None时只判断所有直播间通用的回调函数
+        :return: bool
+        """
+        if cmd in self._subscribed.get(None, ()):
+            return True
+        return room_id is not None and cmd in self._subscribed.get(room_id, ())
+
+    @classmethod
+    def discard(cls, room_id: int, cmd: str, payload: bytes | memoryview):
+        """
+        丢弃未订阅的未解码消息, 未知cmd仍然记录日志
+        :param room_id: 直播间ID
+        :param cmd: 通过peek_cmd取出的cmd
+        :param payload: 未解码的JSON消息
+        :return: None
+        """
+        if _metrics.registry is not None:
+            _metrics.registry.cmd_packets[cmd] += 1
         if cmd not in cls._CMD_MODEL_DICT:
-            # 只有第一次遇到未知cmd时打日志
-            if cmd not in logged_unknown_cmds:
-                logged_unknown_cmds.add(cmd)
-                print(f"[{room_id}] | 未知CMD:{cmd} | 原始消息:{message}")
-            print(f"未解析CMD:{cmd}")
+            cls._log_unknown(room_id, cmd, payload)
 
     @classmethod
-    def append_func(cls, *msg_types: _msg_type):
+    def _log_unknown(cls, room_id: int, cmd: str, message: dict | bytes | memoryview):
+        # 只有第一次遇到未知cmd时打日志
+        if cmd not in logged_unknown_cmds:
+            logged_unknown_cmds.add(cmd)
+            if not isinstance(message, dict):
+                message = bytes(message).decode(errors="replace")
+            print(f"[{room_id}] | 未知CMD:{cmd} | 原始消息:{message}")
+        print(f"未解析CMD:{cmd}")
+
+    @_hybridmethod
+    def append_func(
+            self,
+            *msg_types: _msg_type,
+            room_id: int | Iterable[int] | None = None,
+            where: Condition | Iterable[Condition] | None = None,
+            timeout: Optional[float] = None,
+            concurrency: Optional[int] = None,
+            offload: bool = False,
+    ):
+        """
+        注册回调函数
+        :param msg_types: 需要注入的消息类型
+        :param room_id: 只接收这些直播间的消息, 不提供则接收所有直播间的消息
+        :param where: 过滤条件, 在构造消息模型之前对原始消息求值, 不满足条件的消息不会构造模型, 如:
+            where=F.msg.startswith("!"), where=F.total_coin >= 1000, where=[F.guard_level.between(1, 3), F.uid != 0]
+        :param timeout: 单次调用超时时间(秒)
+        :param concurrency: 同时执行的最大调用数
+        :param offload: 是否将CPU密集的同步函数交给线程池执行
+        """
+        room_ids = [room_id] if room_id is None or isinstance(room_id, int) else list(room_id)
+
+        # 注册时编译, 字段不支持过滤时立即报错
+        predicates = {msg_type: compile_where(where, msg_type) if where is not None else None for msg_type in msg_types}
+
         def decorator(func):
-            for msg_type in msg_types:
-                if getattr(msg_type, "_func", None) is None:
-                    msg_type._func = []
-                msg_type._func.append(func)
+            callback = Callback(func, timeout, concurrency, offload)
+            cmds = {cmd for cmd, model_type in self._CMD_MODEL_DICT.items() if model_type in msg_types}
+            for rid in room_ids:
+                for msg_type in msg_types:
+                    self._registry[(rid, msg_type)] = self._registry.get((rid, msg_type), CallbackList()) + \
+                        CallbackList((callback,), (predicates[msg_type],))
+                self._subscribed.setdefault(rid, set()).update(cmds)
+            self._resolved.clear()
+            return func
 
         return decorator
+
+    @_hybridmethod
+    def remove_room(self, room_id: int):
+        """
+        移除只接收该直播间消息的回调函数
+        :param room_id: 直播间ID
+        :return: None
+        """
+        for key in [key for key in self._registry if key[0] == room_id]:
+            del self._registry[key]
+        self._subscribed.pop(room_id, None)
+        self._resolved.clear()
+
+    @_hybridmethod
+    def callback_stats(self) -> dict[str, CallbackStats]:
+        """
+        回调函数的调用统计
+        :return: 回调函数名 -> 统计信息
+        """
+        return {callback.name: callback.stats for callbacks in self._registry.values() for callback in callbacks}
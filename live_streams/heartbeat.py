@@ -0,0 +1,117 @@
+"""心跳调度"""
+import asyncio
+import struct
+import time
+from typing import Optional, Protocol
+
+from loguru import logger
+
+from .codec import pack_packet
+from .enum import Operation
+
+__all__ = (
+    "HEARTBEAT_PACKET",
+    "HeartbeatScheduler",
+)
+
+HEARTBEAT_PACKET = pack_packet(Operation.HEARTBEAT, struct.pack(">I", 520))
+"""预先编码的心跳包, 所有连接共用"""
+
+
+class HeartbeatTarget(Protocol):
+    last_heartbeat_reply: float
+    """最近一次收到帧(或建立连接)的time.monotonic()时间"""
+
+    async def send_heartbeat(self):
+        ...
+
+    def on_heartbeat_timeout(self):
+        ...
+
+
+class HeartbeatScheduler:
+    """
+    所有连接共享的心跳时间轮.
+    心跳周期被分为slots个槽, 连接注册时放入当前连接数最少的槽, 由单个任务每 interval/slots 秒推进一格,
+    向该槽内的所有连接发送心跳包, 使心跳均匀分布在整个周期内而不是集中发送.
+    发送前检查最近一次收到帧的时间, 超过timeout未收到任何帧的连接会被通知失效并移出时间轮
+    """
+
+    _default: Optional["HeartbeatScheduler"] = None
+
+    def __init__(self, interval: float = 30.0, slots: int = 30, timeout: float = 45.0):
+        """
+        :param interval: 心跳周期(秒)
+        :param slots: 时间轮槽数
+        :param timeout: 超过该时间(秒)未收到任何帧(包括心跳回应)则判定连接失效
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self._slots: list[set[HeartbeatTarget]] = [set() for _ in range(slots)]
+        self._slot_of: dict[HeartbeatTarget, int] = {}
+        self._cursor: int = 0
+        self._task: Optional[asyncio.Task] = None
+        self._sending: set[asyncio.Task] = set()
+
+    @classmethod
+    def default(cls, interval: float = 30.0, slots: int = 30, timeout: float = 45.0) -> "HeartbeatScheduler":
+        """进程内共享的时间轮, 参数仅在首次调用时生效"""
+        if cls._default is None:
+            cls._default = cls(interval, slots, timeout)
+        return cls._default
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def register(self, target: HeartbeatTarget):
+        """
+        将连接加入时间轮, 调用方应在注册前自行发送首个心跳包
+        :param target: 连接
+        :return: None
+        """
+        if target in self._slot_of:
+            return
+        index = min(range(len(self._slots)), key=lambda i: len(self._slots[i]))
+        self._slots[index].add(target)
+        self._slot_of[target] = index
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, target: HeartbeatTarget):
+        index = self._slot_of.pop(target, None)
+        if index is not None:
+            self._slots[index].discard(target)
+        if not self._slot_of and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        tick = self.interval / len(self._slots)
+        next_tick = time.monotonic() + tick
+        try:
+            while True:
+                await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+                next_tick += tick
+                self._cursor = (self._cursor + 1) % len(self._slots)
+                slot = self._slots[self._cursor]
+                if not slot:
+                    continue
+                now = time.monotonic()
+                targets = []
+                for target in tuple(slot):
+                    if now - target.last_heartbeat_reply > self.timeout:
+                        self.unregister(target)
+                        target.on_heartbeat_timeout()
+                    else:
+                        targets.append(target)
+                if targets:
+                    # 不等待发送完成, 避免个别连接的写缓冲阻塞时间轮
+                    task = asyncio.create_task(self._send(targets))
+                    self._sending.add(task)
+                    task.add_done_callback(self._sending.discard)
+        except asyncio.CancelledError:
+            logger.debug("心跳时间轮停止")
+
+    @staticmethod
+    async def _send(targets: list[HeartbeatTarget]):
+        await asyncio.gather(*(target.send_heartbeat() for target in targets), return_exceptions=True)
@@ -0,0 +1,229 @@
+"""直播消息历史记录"""
+import asyncio
+import collections
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, BinaryIO
+
+from loguru import logger
+
+from .json_backend import JSONBackend, get_backend
+
+__all__ = (
+    "HistoryWriter",
+    "SegmentWriter",
+)
+
+
+class SegmentWriter:
+    """
+    按直播间写入的分段文件写入器.
+    数据写入前先缓存在内存中, 由所有写入器共享的一个后台任务批量刷新到磁盘, 单次写入的开销与文件大小无关.
+    磁盘写入变慢或卡住时缓存最多保留max_buffered条, 超出后丢弃最早的数据, 不阻塞接收.
+    分段文件按大小或时间切换, 文件名为 {room_id}_{分段开始时间}{suffix}
+    """
+
+    suffix: str = ""
+    """分段文件扩展名"""
+    flush_interval: float = 1.0
+    """后台刷新间隔(秒)"""
+    _writers: set["SegmentWriter"] = set()
+    _flusher: Optional[asyncio.Task] = None
+    _wakeup: Optional[asyncio.Event] = None
+
+    def __init__(
+            self,
+            room_id: int,
+            directory: Path,
+            segment_size: int = 64 * 1024 * 1024,
+            segment_interval: float = 3600,
+            buffer_size: int = 4096,
+            max_buffered: int = 65536,
+    ):
+        """
+        :param room_id: 直播间ID
+        :param directory: 分段文件保存目录
+        :param segment_size: 单个分段文件的最大字节数
+        :param segment_interval: 单个分段文件的最长写入时间(秒)
+        :param buffer_size: 内存中缓存的条数达到该值时立即唤醒后台刷新
+        :param max_buffered: 内存中最多缓存的条数, 超出后丢弃最早的数据
+        """
+        self.room_id = room_id
+        self.directory = directory
+        self.segment_size = segment_size
+        self.segment_interval = segment_interval
+        self.buffer_size = buffer_size
+        self.max_buffered = max(max_buffered, buffer_size)
+        self.segment_path: Optional[Path] = None
+        """当前分段文件路径"""
+        self.written_count: int = 0
+        """已写入磁盘的条数"""
+        self.dropped_count: int = 0
+        """缓存已满时丢弃的条数"""
+        self._dropping: int = 0
+        """本次缓存已满以来丢弃的条数, 恢复写入后记录日志并清零"""
+        self._buffer: collections.deque[bytes] = collections.deque(maxlen=self.max_buffered)
+        self._lock = asyncio.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._segment_bytes: int = 0
+        self._segment_started: float = 0
+        SegmentWriter._writers.add(self)
+
+    def _push(self, data: bytes):
+        """追加一条已编码的数据到内存缓存, 缓存已满时丢弃最早的一条"""
+        if len(self._buffer) >= self.max_buffered:
+            if not self._dropping:
+                logger.warning(f"[{self.room_id}] 分段文件写入跟不上, 缓存已满{self.max_buffered}条, 开始丢弃最早的数据")
+            self._dropping += 1
+            self.dropped_count += 1
+        self._buffer.append(data)
+        if SegmentWriter._flusher is None:
+            SegmentWriter._start_flusher()
+        if len(self._buffer) >= self.buffer_size:
+            SegmentWriter._wakeup.set()
+
+    def _encode_batch(self, chunks: collections.deque[bytes]) -> bytes:
+        """将一批缓存的数据拼接为写入文件的字节"""
+        return b"".join(chunks)
+
+    def _segment_header(self) -> bytes:
+        """每个分段文件开头写入的字节"""
+        return b""
+
+    async def flush(self):
+        """将内存缓存写入当前分段文件"""
+        async with self._lock:
+            if not self._buffer:
+                return
+            chunks, self._buffer = self._buffer, collections.deque(maxlen=self.max_buffered)
+            try:
+                await asyncio.to_thread(self._write_chunks, chunks)
+            except OSError as e:
+                logger.error(f"[{self.room_id}] 分段文件写入失败, 丢弃{len(chunks)}条数据: {e}")
+            else:
+                self.written_count += len(chunks)
+            if self._dropping:
+                logger.warning(f"[{self.room_id}] 分段文件写入恢复, 缓存已满期间丢弃{self._dropping}条数据")
+                self._dropping = 0
+
+    async def close(self):
+        """写入剩余数据并关闭分段文件"""
+        SegmentWriter._writers.discard(self)
+        await self.flush()
+        async with self._lock:
+            if self._file is not None:
+                await asyncio.to_thread(self._file.close)
+                self._file = None
+        if not SegmentWriter._writers and SegmentWriter._flusher is not None:
+            SegmentWriter._flusher.cancel()
+            SegmentWriter._flusher = None
+
+    def _write_chunks(self, chunks: collections.deque[bytes]):
+        """在线程中执行, 按需切换分段后写入一批数据"""
+        if (self._file is None or self._segment_bytes >= self.segment_size
+                or time.time() - self._segment_started >= self.segment_interval):
+            self._rotate()
+        data = self._encode_batch(chunks)
+        self._file.write(data)
+        self._file.flush()
+        self._segment_bytes += len(data)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._segment_started = time.time()
+        stem = f"{self.room_id}_{datetime.fromtimestamp(self._segment_started).strftime('%Y%m%d_%H%M%S')}"
+        path = self.directory / f"{stem}{self.suffix}"
+        index = 1
+        while path.exists():
+            path = self.directory / f"{stem}_{index}{self.suffix}"
+            index += 1
+        self._file = open(path, "ab")
+        self._segment_bytes = self._file.write(self._segment_header())
+        self.segment_path = path
+        logger.debug(f"[{self.room_id}] 切换分段文件: {path}")
+
+    @staticmethod
+    def segment_key(path: Path) -> tuple[str, int]:
+        """
+        分段文件的排序键, 同一秒内切换的分段文件名带有序号后缀, 序号按数字而不是字符串排序
+        :param path: 分段文件路径
+        :return: (不含序号的文件名, 序号)
+        """
+        stem, _, index = path.stem.rpartition("_")
+        # {room_id}_{日期}_{时间}_{序号}
+        if stem.count("_") == 2 and index.isdigit():
+            return stem, int(index)
+        return path.stem, 0
+
+    @staticmethod
+    def _start_flusher():
+        SegmentWriter._wakeup = asyncio.Event()
+        SegmentWriter._flusher = asyncio.create_task(SegmentWriter._flush_loop())
+
+    @staticmethod
+    async def _flush_loop():
+        """所有写入器共享的后台刷新任务"""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(SegmentWriter._wakeup.wait(), SegmentWriter.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                SegmentWriter._wakeup.clear()
+                await asyncio.gather(*(writer.flush() for writer in tuple(SegmentWriter._writers)))
+        except asyncio.CancelledError:
+            logger.debug("分段文件刷新任务结束")
+
+
+class HistoryWriter(SegmentWriter):
+    """
+    直播间消息历史记录写入器.
+    消息以换行分隔的JSON(每行一条)追加写入分段文件, 文件名为 {room_id}_{分段开始时间}.jsonl
+    """
+
+    suffix = ".jsonl"
+
+    def __init__(
+            self,
+            room_id: int,
+            directory: Path,
+            segment_size: int = 64 * 1024 * 1024,
+            segment_interval: float = 3600,
+            buffer_size: int = 4096,
+            max_buffered: int = 65536,
+            json_backend: Optional[JSONBackend] = None,
+    ):
+        """
+        :param room_id: 直播间ID
+        :param directory: 分段文件保存目录
+        :param segment_size: 单个分段文件的最大字节数
+        :param segment_interval: 单个分段文件的最长写入时间(秒)
+        :param buffer_size: 内存中缓存的消息条数达到该值时立即唤醒后台刷新
+        :param max_buffered: 内存中最多缓存的消息条数, 超出后丢弃最早的消息
+        :param json_backend: 编码消息使用的JSON后端, 不提供则使用标准库
+        """
+        super().__init__(room_id, directory, segment_size, segment_interval, buffer_size, max_buffered)
+        self._json = json_backend or get_backend()
+        self._last_second: int = 0
+        self._add_time: str = ""
+
+    def append(self, data: dict):
+        """
+        追加一条消息到内存缓存, 由后台任务负责写入磁盘
+        :param data: 解码后的原始消息
+        :return: None
+        """
+        if not isinstance(data, dict):
+            raise TypeError("data must be a dict")
+        now = int(time.time())
+        if now != self._last_second:
+            self._last_second = now
+            self._add_time = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        data["add_time"] = self._add_time
+        self._push(self._json.dumps(data))
+
+    def _encode_batch(self, chunks: collections.deque[bytes]) -> bytes:
+        return b"\n".join(chunks) + b"\n"
@@ -0,0 +1,132 @@
+"""可替换的JSON编解码后端"""
+import abc
+import importlib.util
+import json
+from typing import Any
+
+from loguru import logger
+
+__all__ = (
+    "BACKENDS",
+    "JSONBackend",
+    "get_backend",
+)
+
+
+class JSONBackend(abc.ABC):
+    """
+    JSON编解码后端.
+    loads直接接受未解码的消息(bytes或memoryview), 支持的后端不会复制数据;
+    dumps输出紧凑、不转义非ASCII字符的UTF-8字节
+    """
+
+    name: str = ""
+    module: str = ""
+    """依赖的第三方模块, 为空表示标准库"""
+
+    @classmethod
+    def available(cls) -> bool:
+        return not cls.module or importlib.util.find_spec(cls.module) is not None
+
+    @abc.abstractmethod
+    def loads(self, data: bytes | memoryview) -> Any:
+        raise NotImplementedError("loads")
+
+    @abc.abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError("dumps")
+
+
+class StdlibBackend(JSONBackend):
+    name = "stdlib"
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        # 直播消息总是UTF-8, 直接从缓冲区解码, 省去json.loads的编码检测和bytes复制
+        return self._decoder.decode(str(data, "utf-8"))
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode()
+
+
+class OrjsonBackend(JSONBackend):
+    name = "orjson"
+    module = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._fallback = StdlibBackend()
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self._orjson.dumps(obj)
+        except TypeError:
+            # orjson不支持超过64位的整数和非字符串键
+            return self._fallback.dumps(obj)
+
+
+class MsgspecBackend(JSONBackend):
+    name = "msgspec"
+    module = "msgspec"
+
+    def __init__(self):
+        import msgspec
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+
+class UjsonBackend(JSONBackend):
+    name = "ujson"
+    module = "ujson"
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def loads(self, data: bytes | memoryview) -> Any:
+        return self._ujson.loads(str(data, "utf-8"))
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode()
+
+
+BACKENDS: dict[str, type[JSONBackend]] = {
+    backend.name: backend for backend in (OrjsonBackend, MsgspecBackend, UjsonBackend, StdlibBackend)
+}
+"""后端名 -> 后端, 按auto时的优先顺序排列"""
+
+_instances: dict[str, JSONBackend] = {}
+
+
+def get_backend(name: str = "stdlib") -> JSONBackend:
+    """
+    获取进程内共享的JSON后端
+    :param name: 后端名, auto为使用已安装的最快后端; 指定的后端未安装时使用标准库
+    :return: JSONBackend
+    """
+    if name in _instances:
+        return _instances[name]
+    if name == "auto":
+        backend_type = next(backend for backend in BACKENDS.values() if backend.available())
+    elif name not in BACKENDS:
+        raise ValueError(f"unknown json backend: {name}, available: auto, {', '.join(BACKENDS)}")
+    elif not BACKENDS[name].available():
+        logger.warning(f"JSON后端{name}未安装, 使用标准库json")
+        backend_type = StdlibBackend
+    else:
+        backend_type = BACKENDS[name]
+    _instances[name] = backend = backend_type()
+    return backend
@@ -0,0 +1,133 @@
+"""
+端到端投递延迟统计.
+以服务器时间戳为起点, 将一条消息的延迟拆分为各个阶段:
+服务器发出 -> 收到帧(network) -> 解码完成(queue_decode) -> 开始分发(build) -> 回调完成(handler),
+另有 local(收到帧到回调完成) 和 total(服务器发出到回调完成).
+服务器时钟与本地时钟的偏差用窗口内 (接收时间 - 服务器时间) 的最小值减去半个心跳往返时间估计,
+network 和 total 已扣除该偏差; 偏差由直播间内所有cmd共享, 相差超过max_offset的时间戳视为无效并忽略
+"""
+import time
+from typing import Optional, Any
+
+from .metrics import Histogram
+from .models import DanmakuMessage, GiftMessage, InteractWordV2Message
+
+__all__ = (
+    "LagTrace",
+    "LagTracker",
+    "LAG_STAGES",
+)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""延迟直方图分桶(秒)"""
+LAG_STAGES = ("network", "queue_decode", "build", "handler", "local", "total")
+"""延迟阶段"""
+_EMIT_SCALE: dict[type, float] = {
+    DanmakuMessage: 0.001,
+    GiftMessage: 1,
+    InteractWordV2Message: 1,
+}
+"""带服务器时间戳的消息类型 -> 时间戳换算为秒的倍数"""
+
+
+class LagTrace:
+    """一条消息在本地各阶段的时间(Unix秒), 由客户端创建并随消息传给Handler.handle"""
+
+    __slots__ = ("tracker", "received", "decoded", "dispatched")
+
+    def __init__(self, tracker: "LagTracker", received: float, decoded: float):
+        self.tracker = tracker
+        self.received = received
+        self.decoded = decoded
+        self.dispatched: float = 0
+
+    def done(self, cmd: str, model: Any):
+        """回调完成, 记录各阶段延迟"""
+        self.tracker.record(self, cmd, model, time.time())
+
+
+class LagTracker:
+    """单个直播间按cmd统计的投递延迟"""
+
+    def __init__(self, skew_window: float = 60, max_offset: float = 3600):
+        """
+        :param skew_window: 时钟偏差估计窗口(秒), 取最近一到两个窗口内的最小值
+        :param max_offset: 接收时间与服务器时间戳相差超过该秒数时视为时间戳无效
+        """
+        self.skew_window = skew_window
+        self.max_offset = max_offset
+        self.rejected_count: int = 0
+        """因时间戳无效而未统计network和total的消息数"""
+        self.stages: dict[str, dict[str, Histogram]] = {}
+        """cmd -> 阶段 -> 延迟直方图"""
+        self.rtt: Optional[float] = None
+        """最近一次心跳往返时间, 由客户端更新"""
+        self._window_start: float = 0
+        self._min_offset: Optional[float] = None
+        self._previous_min_offset: Optional[float] = None
+
+    def trace(self, received: float, decoded: float) -> LagTrace:
+        return LagTrace(self, received, decoded)
+
+    @property
+    def clock_skew(self) -> Optional[float]:
+        """估计的本地时钟领先服务器时钟的秒数, 尚无带时间戳的消息时为None"""
+        offsets = [o for o in (self._min_offset, self._previous_min_offset) if o is not None]
+        if not offsets:
+            return None
+        return min(offsets) - (self.rtt or 0) / 2
+
+    def _observe_offset(self, offset: float, now: float):
+        if now - self._window_start >= self.skew_window:
+            self._window_start = now
+            self._previous_min_offset, self._min_offset = self._min_offset, None
+        if self._min_offset is None or offset < self._min_offset:
+            self._min_offset = offset
+
+    def _histograms(self, cmd: str) -> dict[str, Histogram]:
+        try:
+            return self.stages[cmd]
+        except KeyError:
+            self.stages[cmd] = histograms = {stage: Histogram(LAG_BUCKETS) for stage in LAG_STAGES}
+            return histograms
+
+    def record(self, trace: LagTrace, cmd: str, model: Any, done: float):
+        """
+        记录一条消息的各阶段延迟
+        :param trace: 本地各阶段时间
+        :param cmd: 消息cmd
+        :param model: 消息模型, 带服务器时间戳时统计network和total
+        :param done: 回调完成时间
+        """
+        histograms = self._histograms(cmd)
+        histograms["queue_decode"].observe(trace.decoded - trace.received)
+        histograms["build"].observe(trace.dispatched - trace.decoded)
+        histograms["handler"].observe(done - trace.dispatched)
+        histograms["local"].observe(done - trace.received)
+        scale = _EMIT_SCALE.get(type(model))
+        if scale is None:
+            return
+        emitted = model.timestamp
+        if not emitted:
+            return
+        emitted *= scale
+        offset = trace.received - emitted
+        if abs(offset) > self.max_offset:
+            # 错误的时间戳会污染整个直播间共享的时钟偏差
+            self.rejected_count += 1
+            return
+        self._observe_offset(offset, done)
+        skew = self.clock_skew
+        histograms["network"].observe(max(0.0, trace.received - emitted - skew))
+        histograms["total"].observe(max(0.0, done - emitted - skew))
+
+    def summary(self, q: float = 0.99) -> dict[str, dict[str, float]]:
+        """
+        各cmd各阶段延迟的分位数估计
+        :param q: 分位
+        :return: cmd -> 阶段 -> 秒数
+        """
+        return {
+            cmd: {stage: histogram.quantile(q) for stage, histogram in histograms.items() if histogram.count}
+            for cmd, histograms in self.stages.items()
+        }
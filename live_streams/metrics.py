@@ -0,0 +1,237 @@
+"""
+运行指标, 以Prometheus文本格式通过本地HTTP接口导出.
+未启用时registry为None, 热路径上只有一次None判断; 直播间级别的统计(帧数、队列深度、重连等)
+在抓取时从各客户端的统计对象读取, 不占用热路径
+"""
+import bisect
+import collections
+import time
+import weakref
+from typing import Optional, Iterable, TYPE_CHECKING
+
+from aiohttp import web
+from loguru import logger
+
+from utils import BiliApi
+
+if TYPE_CHECKING:
+    from . import BLiveClient
+
+__all__ = (
+    "Histogram",
+    "Metrics",
+    "registry",
+    "enable",
+)
+
+STAGE_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+)
+"""处理阶段耗时的直方图分桶(秒)"""
+RTT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+"""心跳往返时间的直方图分桶(秒)"""
+
+
+class Histogram:
+    """固定分桶的直方图, observe只做一次二分查找和两次累加"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        """各分桶的非累计计数, 最后一个为+Inf"""
+        self.sum: float = 0
+        self.count: int = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        按分桶线性插值估计分位数
+        :param q: 0到1之间的分位
+        :return: 估计值, 落在+Inf分桶时返回最大的有限边界
+        """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}" if labels else ""
+
+
+class Metrics:
+    """指标注册表"""
+
+    def __init__(self):
+        self.decompress_seconds = Histogram(STAGE_BUCKETS)
+        """解压耗时"""
+        self.parse_seconds = Histogram(STAGE_BUCKETS)
+        """JSON解码耗时"""
+        self.model_build_seconds = Histogram(STAGE_BUCKETS)
+        """消息模型构造耗时"""
+        self.dispatch_seconds = Histogram(STAGE_BUCKETS)
+        """回调分发耗时"""
+        self.heartbeat_rtt_seconds = Histogram(RTT_BUCKETS)
+        """心跳往返时间"""
+        self.cmd_packets: collections.Counter[str] = collections.Counter()
+        """cmd -> 收到的数据包数, 包括未订阅而未解码的消息"""
+        self._clients: weakref.WeakSet["BLiveClient"] = weakref.WeakSet()
+        self._runner: Optional[web.AppRunner] = None
+
+    def register(self, client: "BLiveClient"):
+        """导出该客户端的直播间级别指标"""
+        self._clients.add(client)
+
+    async def unregister(self, client: "BLiveClient"):
+        """
+        停止导出该客户端的指标, 所有客户端都注销后停止/metrics接口并停用全局注册表,
+        热路径恢复为一次None判断; 再次enable时使用新的注册表
+        :param client: 客户端
+        :return: None
+        """
+        global registry
+        self._clients.discard(client)
+        if not self._clients:
+            if registry is self:
+                registry = None
+            await self.close()
+
+    def render(self) -> str:
+        """
+        生成Prometheus文本格式的指标
+        :return: str
+        """
+        from .handler import Handler
+        from .profiler import LoopProfiler
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: Iterable[tuple[dict, float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(**labels)} {value}" for labels, value in samples)
+
+        def histogram(name: str, help_text: str, histograms: Iterable[tuple[dict, Histogram]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in histograms:
+                cumulative = 0
+                for bound, count in zip((*h.buckets, "+Inf"), h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(**labels)} {h.sum}")
+                lines.append(f"{name}_count{_labels(**labels)} {h.count}")
+
+        clients = [client for client in self._clients if client.room_id]
+        metric("blive_rooms", "gauge", "Number of connected rooms.", [({}, len(clients))])
+        metric("blive_frames_received_total", "counter", "WebSocket frames received.",
+               (({"room_id": c.room_id}, c.frames_received) for c in clients))
+        metric("blive_bytes_received_total", "counter", "WebSocket bytes received.",
+               (({"room_id": c.room_id}, c.bytes_received) for c in clients))
+        metric("blive_queue_depth", "gauge", "Frames waiting in the receive queue.",
+               (({"room_id": c.room_id}, c.queue_stats.depth) for c in clients))
+        metric("blive_queue_dropped_total", "counter", "Frames dropped by the receive queue overflow policy.",
+               (({"room_id": c.room_id}, c.queue_stats.dropped_count) for c in clients))
+        metric("blive_reconnects_total", "counter", "Successful reconnects.",
+               (({"room_id": c.room_id}, c.reconnect_stats.reconnect_count) for c in clients))
+        metric("blive_heartbeat_last_rtt_seconds", "gauge", "Round trip time of the latest heartbeat.",
+               (({"room_id": c.room_id}, c.heartbeat_rtt) for c in clients if c.heartbeat_rtt is not None))
+        metric("blive_packets_total", "counter", "Message packets received per cmd.",
+               (({"cmd": cmd, "known": str(cmd in Handler._CMD_MODEL_DICT).lower()}, count)
+                for cmd, count in sorted(self.cmd_packets.items())))
+        histogram("blive_stage_seconds", "Time spent in each processing stage.", [
+            ({"stage": "decompress"}, self.decompress_seconds),
+            ({"stage": "parse"}, self.parse_seconds),
+            ({"stage": "model_build"}, self.model_build_seconds),
+            ({"stage": "dispatch"}, self.dispatch_seconds),
+        ])
+        histogram("blive_heartbeat_rtt_seconds", "Heartbeat round trip time.", [({}, self.heartbeat_rtt_seconds)])
+        tracked = [c for c in clients if c.lag is not None]
+        histogram("blive_delivery_lag_seconds", "Delivery lag per stage, from server emit to handler completion.", (
+            ({"room_id": c.room_id, "cmd": cmd, "stage": stage}, h)
+            for c in tracked for cmd, stages in c.lag.stages.items() for stage, h in stages.items() if h.count
+        ))
+        metric("blive_clock_skew_seconds", "gauge", "Estimated local clock lead over the server clock.",
+               (({"room_id": c.room_id}, c.lag.clock_skew) for c in tracked if c.lag.clock_skew is not None))
+        api_stats = sorted(BiliApi.stats.items())
+        metric("blive_api_requests_total", "counter", "REST API requests per endpoint and response status.",
+               (({"endpoint": name, "status": status}, count)
+                for name, stats in api_stats for status, count in sorted(stats.responses.items())))
+        metric("blive_api_cache_hits_total", "counter", "REST API calls served from cache or a shared request.",
+               (({"endpoint": name}, stats.cache_hits) for name, stats in api_stats))
+        metric("blive_api_retries_total", "counter", "REST API retries.",
+               (({"endpoint": name}, stats.retries) for name, stats in api_stats))
+        metric("blive_api_throttled_seconds_total", "counter", "Time spent waiting for REST API rate limits.",
+               (({"endpoint": name}, stats.throttled_seconds) for name, stats in api_stats))
+        metric("blive_api_request_seconds_total", "counter", "Time spent in REST API requests.",
+               (({"endpoint": name}, stats.request_seconds) for name, stats in api_stats))
+        if (profiler := LoopProfiler._default) is not None:
+            histogram("blive_loop_lag_seconds", "Event loop wake-up lag.", [({}, profiler.lag)])
+            metric("blive_loop_blocked_total", "counter", "Event loop blocks per blamed code location.",
+                   (({"site": site}, count) for site, count in profiler.blocked_count.items()))
+            metric("blive_loop_blocked_seconds_total", "counter", "Event loop blocked time per blamed code location.",
+                   (({"site": site}, seconds) for site, seconds in profiler.blocked_seconds.items()))
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        start = time.perf_counter()
+        body = self.render()
+        logger.debug(f"指标生成耗时{(time.perf_counter() - start) * 1000:.1f}ms")
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        """
+        启动/metrics接口, 重复调用时不重复启动
+        :param host: 监听地址
+        :param port: 监听端口
+        :return: None
+        """
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"指标接口已启动: http://{host}:{port}/metrics")
+
+    async def close(self):
+        """停止/metrics接口"""
+        # 先置空, 并发的close不会重复清理
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            await runner.cleanup()
+            logger.info("指标接口已停止")
+
+
+registry: Optional[Metrics] = None
+"""全局指标注册表, 未启用时为None"""
+
+
+def enable() -> Metrics:
+    """
+    启用指标收集
+    :return: 全局指标注册表
+    """
+    global registry
+    if registry is None:
+        registry = Metrics()
+    return registry
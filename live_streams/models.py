@@ -1,10 +1,12 @@
 """消息模板"""
 import abc
-import base64
-import dataclasses
+import functools
 import json
+import operator
+from typing import Any, Callable, ClassVar, Optional
 
 import utils.InteractWordV2 as InteractWordV2
+from .wire import InteractWordV2Decoder
 
 __all__ = (
     "DanmakuMessage",
@@ -12,6 +14,7 @@ __all__ = (
     "GiftMessage",
     "GuardBuyMessage",
     "MessageInterface",
+    "RawField",
     "SuperChatDeleteMessage",
     "SuperChatMessage",
     "LoginNoticeMessage",
@@ -24,202 +27,296 @@ __all__ = (
 )
 
 
+class RawField:
+    """
+    消息模型字段, 访问时才从原始消息中按path读取, 不复制原始消息.
+    原始消息中缺少该字段时返回default; 没有path的字段只能在构造时传入
+    """
+
+    __slots__ = ("path", "default", "name", "_getter")
+
+    def __init__(self, *path: str | int, default: Any = None):
+        """
+        :param path: 字段在原始消息中的位置, 如 "info", 2, 0 表示 raw_msg["info"][2][0]
+        :param default: 原始消息中缺少该字段时的取值
+        """
+        self.path = path
+        self.default = default
+        self.name: Optional[str] = None
+        self._getter = self._compile(path)
+
+    @staticmethod
+    def _compile(path: tuple) -> Callable[[Any], Any]:
+        # 按路径长度展开, 避免每次访问时循环
+        match path:
+            case ():
+                return operator.itemgetter(None)
+            case (a,):
+                return operator.itemgetter(a)
+            case (a, b):
+                return lambda raw: raw[a][b]
+            case (a, b, c):
+                return lambda raw: raw[a][b][c]
+            case (a, b, c, d):
+                return lambda raw: raw[a][b][c][d]
+            case _:
+                return lambda raw: functools.reduce(operator.getitem, path, raw)
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance._values
+        if values is not None and self.name in values:
+            return values[self.name]
+        try:
+            return self._getter(instance._raw)
+        except (KeyError, IndexError, TypeError):
+            return self.default
+
+    def __set__(self, instance, value):
+        if instance._values is None:
+            instance._values = {}
+        instance._values[self.name] = value
+
+
+class PbField(RawField):
+    """
+    INTERACT_WORD_V2消息data.pb中的字段, 首次访问时由模型按需解码
+    """
+
+    __slots__ = ("wire_name",)
+
+    def __init__(self, wire_name: Optional[str] = None, default: Any = None):
+        """
+        :param wire_name: protobuf中的字段名, 默认与模型字段名相同
+        :param default: 没有原始消息时的取值
+        """
+        super().__init__(default=default)
+        self.wire_name = wire_name
+
+    def __set_name__(self, owner, name: str):
+        super().__set_name__(owner, name)
+        if self.wire_name is None:
+            self.wire_name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance._values
+        if values is not None and self.name in values:
+            return values[self.name]
+        return instance._decode_pb(self.name)
+
+
+class cached_field:
+    """只计算一次的派生属性, 结果保存在模型实例上"""
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance._values
+        if values is None:
+            values = instance._values = {}
+        try:
+            return values[self.name]
+        except KeyError:
+            value = values[self.name] = self.func(instance)
+            return value
+
+
 class MessageInterface(abc.ABC):
-    room_id: int = None
+    """
+    消息模型基类.
+    字段用RawField声明, 构造时只保存原始消息的引用, 访问字段时才从原始消息中读取, 构造开销与字段数无关.
+    子类需要声明 __slots__ = ()
+    """
+
+    __slots__ = ("_raw", "_values", "room_id")
+
+    field_names: ClassVar[tuple[str, ...]] = ()
+    """全部字段名"""
+    raw_paths: ClassVar[dict[str, tuple]] = {}
+    """字段名 -> 字段在原始消息中的位置, 用于在构造模型之前按字段过滤消息"""
+    raw_defaults: ClassVar[dict[str, Any]] = {}
+    """原始消息中缺少字段时的取值"""
+
+    def __init__(self, raw_msg: Optional[dict] = None, **fields):
+        """
+        :param raw_msg: 原始消息
+        :param fields: 字段值, 优先于原始消息中的值
+        """
+        self._raw = raw_msg
+        self._values: Optional[dict[str, Any]] = None
+        """构造时传入或赋值的字段和已计算的派生属性"""
+        self.room_id: Optional[int] = None
+        if fields:
+            for name in fields:
+                if name not in self.field_names:
+                    raise TypeError(f"{type(self).__name__} got an unexpected field {name!r}")
+            self._values = fields
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields: dict[str, RawField] = {}
+        for klass in reversed(cls.__mro__):
+            for name, attr in vars(klass).items():
+                if isinstance(attr, RawField):
+                    fields[name] = attr
+        cls.field_names = tuple(fields)
+        cls.raw_paths = {name: field.path for name, field in fields.items() if field.path}
+        cls.raw_defaults = {name: field.default for name, field in fields.items() if field.path}
 
     @classmethod
-    @abc.abstractmethod
     def from_command(cls, raw_msg: dict):
-        raise NotImplementedError("from_command")
+        return cls(raw_msg)
+
+    @property
+    def raw(self) -> Optional[dict]:
+        """原始消息"""
+        return self._raw
+
+    def to_dict(self) -> dict[str, Any]:
+        """读取全部字段"""
+        return {name: getattr(self, name) for name in self.field_names}
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.to_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
 
 
-@dataclasses.dataclass
 class GeneralMessage(MessageInterface):
     """
     通用消息
     """
 
-    raw_message: dict = None
-    """原始消息"""
+    __slots__ = ()
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(raw_message=data)
+    raw_message: dict = RawField("data")
+    """原始消息"""
 
 
-@dataclasses.dataclass
 class LoginNoticeMessage(MessageInterface):
     """
     未登录提示日志
     """
 
-    message: str = None
-    """提示信息"""
+    __slots__ = ()
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(message=data["notice_msg"])
+    message: str = RawField("data", "notice_msg")
+    """提示信息"""
 
 
-@dataclasses.dataclass
 class WatchedChangeMessage(MessageInterface):
     """
     观看人数
     """
 
-    num: int = None
+    __slots__ = ()
+
+    num: int = RawField("data", "num")
     """看过人数"""
-    text_small: str = None
+    text_small: str = RawField("data", "text_small")
     """num的字符串格式"""
-    text_large: str = None
+    text_large: str = RawField("data", "text_large")
     """格式化后中文格式: xxx人看过"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            num=data["num"],
-            text_small=data["text_small"],
-            text_large=data["text_large"],
-        )
-
 
-@dataclasses.dataclass
 class DanmakuMessage(MessageInterface):
     """
     弹幕消息
     """
 
-    mode: int = None
+    __slots__ = ()
+
+    mode: int = RawField("info", 0, 1)
     """弹幕显示模式（滚动、顶部、底部）"""
-    font_size: int = None
+    font_size: int = RawField("info", 0, 2)
     """字体尺寸"""
-    color: int = None
+    color: int = RawField("info", 0, 3)
     """颜色"""
-    timestamp: int = None
+    timestamp: int = RawField("info", 0, 4)
     """时间戳（毫秒）"""
-    rnd: int = None
+    rnd: int = RawField("info", 0, 5)
     """随机数，前端叫作弹幕ID，可能是去重用的"""
-    uid_crc32: str = None
+    uid_crc32: str = RawField("info", 0, 7)
     """用户ID文本的CRC32"""
-    msg_type: int = None
+    msg_type: int = RawField("info", 0, 9)
     """是否礼物弹幕（节奏风暴）"""
-    bubble: int = None
+    bubble: int = RawField("info", 0, 10)
     """右侧评论栏气泡"""
-    dm_type: int = None
+    dm_type: int = RawField("info", 0, 12)
     """弹幕类型，0文本，1表情，2语音"""
-    emoticon_options: dict | str = None
+    emoticon_options: dict | str = RawField("info", 0, 13)
     """表情参数"""
-    voice_config: dict | str = None
+    voice_config: dict | str = RawField("info", 0, 14)
     """语音参数"""
-    mode_info: dict = None
+    mode_info: dict = RawField("info", 0, 15)
     """一些附加参数"""
 
-    msg: str = None
+    msg: str = RawField("info", 1)
     """弹幕内容"""
 
-    uid: int = None
+    uid: int = RawField("info", 2, 0)
     """用户ID"""
-    uname: str = None
+    uname: str = RawField("info", 2, 1)
     """用户名"""
-    admin: int = None
+    admin: int = RawField("info", 2, 2)
     """是否房管"""
-    vip: int = None
+    vip: int = RawField("info", 2, 3)
     """是否月费老爷"""
-    svip: int = None
+    svip: int = RawField("info", 2, 4)
     """是否年费老爷"""
-    urank: int = None
+    urank: int = RawField("info", 2, 5)
     """用户身份，用来判断是否正式会员，猜测非正式会员为5000，正式会员为10000"""
-    mobile_verify: int = None
+    mobile_verify: int = RawField("info", 2, 6)
     """是否绑定手机"""
-    uname_color: str = None
+    uname_color: str = RawField("info", 2, 7)
     """用户名颜色"""
 
-    medal_level: str = None
+    medal_level: str = RawField("info", 3, 0, default=0)
     """勋章等级"""
-    medal_name: str = None
+    medal_name: str = RawField("info", 3, 1, default="")
     """勋章名"""
-    runame: str = None
+    runame: str = RawField("info", 3, 2, default="")
     """勋章房间主播名"""
-    medal_room_id: int = None
+    medal_room_id: int = RawField("info", 3, 3, default=0)
     """勋章房间ID"""
-    mcolor: int = None
+    mcolor: int = RawField("info", 3, 4, default=0)
     """勋章颜色"""
-    special_medal: str = None
+    special_medal: str = RawField("info", 3, 5, default=0)
     """特殊勋章"""
 
-    user_level: int = None
+    user_level: int = RawField("info", 4, 0)
     """用户等级"""
-    ulevel_color: int = None
+    ulevel_color: int = RawField("info", 4, 2)
     """用户等级颜色"""
-    ulevel_rank: str = None
+    ulevel_rank: str = RawField("info", 4, 3)
     """用户等级排名，>50000时为'>50000'"""
 
-    old_title: str = None
+    old_title: str = RawField("info", 5, 0)
     """旧头衔"""
-    title: str = None
+    title: str = RawField("info", 5, 1)
     """头衔"""
 
-    privilege_type: int = None
+    privilege_type: int = RawField("info", 7)
     """舰队类型，0非舰队，1总督，2提督，3舰长"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        info = raw_msg["info"]
-        if len(info[3]) != 0:
-            medal_level = info[3][0]
-            medal_name = info[3][1]
-            runame = info[3][2]
-            room_id = info[3][3]
-            mcolor = info[3][4]
-            special_medal = info[3][5]
-        else:
-            medal_level = 0
-            medal_name = ""
-            runame = ""
-            room_id = 0
-            mcolor = 0
-            special_medal = 0
-
-        return cls(
-            mode=info[0][1],
-            font_size=info[0][2],
-            color=info[0][3],
-            timestamp=info[0][4],
-            rnd=info[0][5],
-            uid_crc32=info[0][7],
-            msg_type=info[0][9],
-            bubble=info[0][10],
-            dm_type=info[0][12],
-            emoticon_options=info[0][13],
-            voice_config=info[0][14],
-            mode_info=info[0][15],
-            msg=info[1],
-            uid=info[2][0],
-            uname=info[2][1],
-            admin=info[2][2],
-            vip=info[2][3],
-            svip=info[2][4],
-            urank=info[2][5],
-            mobile_verify=info[2][6],
-            uname_color=info[2][7],
-            medal_level=medal_level,
-            medal_name=medal_name,
-            runame=runame,
-            medal_room_id=room_id,
-            mcolor=mcolor,
-            special_medal=special_medal,
-            user_level=info[4][0],
-            ulevel_color=info[4][2],
-            ulevel_rank=info[4][3],
-            old_title=info[5][0],
-            title=info[5][1],
-            privilege_type=info[7],
-        )
-
-    @property
+    @cached_field
     def emoticon_options_dict(self) -> dict:
         """
         示例：
@@ -233,7 +330,7 @@ class DanmakuMessage(MessageInterface):
         except (json.JSONDecodeError, TypeError):
             return {}
 
-    @property
+    @cached_field
     def voice_config_dict(self) -> dict:
         """
         示例：
@@ -251,328 +348,246 @@ class DanmakuMessage(MessageInterface):
             return {}
 
 
-@dataclasses.dataclass
 class GiftMessage(MessageInterface):
     """
     礼物消息
     """
 
-    gift_name: str = None
+    __slots__ = ()
+
+    gift_name: str = RawField("data", "giftName")
     """礼物名"""
-    num: int = None
+    num: int = RawField("data", "num")
     """数量"""
-    uname: str = None
+    uname: str = RawField("data", "uname")
     """用户名"""
-    face: str = None
+    face: str = RawField("data", "face")
     """用户头像URL"""
-    guard_level: int = None
+    guard_level: int = RawField("data", "guard_level")
     """舰队等级，0非舰队，1总督，2提督，3舰长"""
-    uid: int = None
+    uid: int = RawField("data", "uid")
     """用户ID"""
-    timestamp: int = None
+    timestamp: int = RawField("data", "timestamp")
     """时间戳"""
-    gift_id: int = None
+    gift_id: int = RawField("data", "giftId")
     """礼物ID"""
-    gift_type: int = None
+    gift_type: int = RawField("data", "giftType")
     """礼物类型（未知）"""
-    action: str = None
+    action: str = RawField("data", "action")
     """目前遇到的有'喂食'、'赠送'"""
-    price: int = None
+    price: int = RawField("data", "price")
     """礼物单价瓜子数"""
-    rnd: str = None
+    rnd: str = RawField("data", "rnd")
     """随机数，可能是去重用的。有时是时间戳+去重ID，有时是UUID"""
-    coin_type: str = None
+    coin_type: str = RawField("data", "coin_type")
     """瓜子类型，'silver'或'gold'，1000金瓜子 = 1元"""
-    total_coin: int = None
+    total_coin: int = RawField("data", "total_coin")
     """总瓜子数"""
-    tid: str = None
+    tid: str = RawField("data", "tid")
     """可能是事务ID，有时和rnd相同"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            gift_name=data["giftName"],
-            num=data["num"],
-            uname=data["uname"],
-            face=data["face"],
-            guard_level=data["guard_level"],
-            uid=data["uid"],
-            timestamp=data["timestamp"],
-            gift_id=data["giftId"],
-            gift_type=data["giftType"],
-            action=data["action"],
-            price=data["price"],
-            rnd=data["rnd"],
-            coin_type=data["coin_type"],
-            total_coin=data["total_coin"],
-            tid=data["tid"],
-        )
-
-
-@dataclasses.dataclass
+
 class GuardBuyMessage(MessageInterface):
     """
     上舰消息
     """
 
-    uid: int = None
+    __slots__ = ()
+
+    uid: int = RawField("data", "uid")
     """用户ID"""
-    username: str = None
+    username: str = RawField("data", "username")
     """用户名"""
-    guard_level: int = None
+    guard_level: int = RawField("data", "guard_level")
     """舰队等级，0非舰队，1总督，2提督，3舰长"""
-    num: int = None
+    num: int = RawField("data", "num")
     """数量"""
-    price: int = None
+    price: int = RawField("data", "price")
     """单价金瓜子数"""
-    gift_id: int = None
+    gift_id: int = RawField("data", "gift_id")
     """礼物ID"""
-    gift_name: str = None
+    gift_name: str = RawField("data", "gift_name")
     """礼物名"""
-    start_time: int = None
+    start_time: int = RawField("data", "start_time")
     """开始时间戳，和结束时间戳相同"""
-    end_time: int = None
+    end_time: int = RawField("data", "end_time")
     """结束时间戳，和开始时间戳相同"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            uid=data["uid"],
-            username=data["username"],
-            guard_level=data["guard_level"],
-            num=data["num"],
-            price=data["price"],
-            gift_id=data["gift_id"],
-            gift_name=data["gift_name"],
-            start_time=data["start_time"],
-            end_time=data["end_time"],
-        )
-
-
-@dataclasses.dataclass
+
 class SuperChatMessage(MessageInterface):
     """
     醒目留言消息
     """
 
-    price: int = None
+    __slots__ = ()
+
+    price: int = RawField("data", "price")
     """价格（人民币）"""
-    message: str = None
+    message: str = RawField("data", "message")
     """消息"""
-    message_trans: str = None
+    message_trans: str = RawField("data", "message_trans")
     """消息日文翻译（目前只出现在SUPER_CHAT_MESSAGE_JPN）"""
-    start_time: int = None
+    start_time: int = RawField("data", "start_time")
     """开始时间戳"""
-    end_time: int = None
+    end_time: int = RawField("data", "end_time")
     """结束时间戳"""
-    time: int = None
+    time: int = RawField("data", "time")
     """剩余时间（约等于 结束时间戳 - 开始时间戳）"""
-    id: int = None
+    id: int = RawField("data", "id")
     """醒目留言ID，删除时用"""
-    gift_id: int = None
+    gift_id: int = RawField("data", "gift", "gift_id")
     """礼物ID"""
-    gift_name: str = None
+    gift_name: str = RawField("data", "gift", "gift_name")
     """礼物名"""
-    uid: int = None
+    uid: int = RawField("data", "uid")
     """用户ID"""
-    uname: str = None
+    uname: str = RawField("data", "user_info", "uname")
     """用户名"""
-    face: str = None
+    face: str = RawField("data", "user_info", "face")
     """用户头像URL"""
-    guard_level: int = None
+    guard_level: int = RawField("data", "user_info", "guard_level")
     """舰队等级，0非舰队，1总督，2提督，3舰长"""
-    user_level: int = None
+    user_level: int = RawField("data", "user_info", "user_level")
     """用户等级"""
-    background_bottom_color: str = None
+    background_bottom_color: str = RawField("data", "background_bottom_color")
     """底部背景色，'#rrggbb'"""
-    background_color: str = None
+    background_color: str = RawField("data", "background_color")
     """背景色，'#rrggbb'"""
-    background_icon: str = None
+    background_icon: str = RawField("data", "background_icon")
     """背景图标"""
-    background_image: str = None
+    background_image: str = RawField("data", "background_image")
     """背景图URL"""
-    background_price_color: str = None
+    background_price_color: str = RawField("data", "background_price_color")
     """背景价格颜色，'#rrggbb'"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            price=data["price"],
-            message=data["message"],
-            message_trans=data["message_trans"],
-            start_time=data["start_time"],
-            end_time=data["end_time"],
-            time=data["time"],
-            id=data["id"],
-            gift_id=data["gift"]["gift_id"],
-            gift_name=data["gift"]["gift_name"],
-            uid=data["uid"],
-            uname=data["user_info"]["uname"],
-            face=data["user_info"]["face"],
-            guard_level=data["user_info"]["guard_level"],
-            user_level=data["user_info"]["user_level"],
-            background_bottom_color=data["background_bottom_color"],
-            background_color=data["background_color"],
-            background_icon=data["background_icon"],
-            background_image=data["background_image"],
-            background_price_color=data["background_price_color"],
-        )
-
-
-@dataclasses.dataclass
+
 class SuperChatDeleteMessage(MessageInterface):
     """
     删除醒目留言消息
     """
 
-    ids: list[int] = None
-    """醒目留言ID数组"""
+    __slots__ = ()
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(ids=data["ids"])
+    ids: list[int] = RawField("data", "ids")
+    """醒目留言ID数组"""
 
 
-@dataclasses.dataclass
 class LikeClickMessage(MessageInterface):
     """
     用户点赞事件
     """
-    uname: str = None
+
+    __slots__ = ()
+    uname: str = RawField("data", "uname")
     """用户名"""
-    uid: int = None
+    uid: int = RawField("data", "uinfo", "uid")
     """用户MID"""
-    face: str = None
+    face: str = RawField("data", "uinfo", "base", "face")
     """用户头像URL"""
-    like_text: str = None
+    like_text: str = RawField("data", "like_text")
     """提示信息"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            uname=data["uname"],
-            uid=data["uinfo"]["uid"],
-            face=data["uinfo"]["base"]["face"],
-            like_text=data["like_text"],
-        )
-
 
-@dataclasses.dataclass
 class LikeUpdateMessage(MessageInterface):
     """
     点赞数量更新
     """
-    click_count: int = None
-    """点赞数"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(click_count=data["click_count"])
+    __slots__ = ()
+    click_count: int = RawField("data", "click_count")
+    """点赞数"""
 
 
-@dataclasses.dataclass
 class UserToastMessage(MessageInterface):
     """
     用户庆祝消息
     用户购买 舰长/提督/总督 后的庆祝消息, 内容包含用户陪伴天数
     """
 
-    anchor_show: bool = None
+    __slots__ = ()
+
+    anchor_show: bool = RawField("data", "anchor_show")
     """是否显示"""
-    color: str = None
+    color: str = RawField("data", "color")
     """颜色"""
-    gift_id: int = None
+    gift_id: int = RawField("data", "gift_id")
     """礼物ID"""
-    guard_level: int = None
+    guard_level: int = RawField("data", "guard_level")
     """大航海等级: 1:总督/2:提督/3:舰长"""
-    num: int = None
+    num: int = RawField("data", "num")
     """上舰个数"""
-    price: int = None
+    price: int = RawField("data", "price")
     """实际金瓜子标价 CNY*1000"""
-    role_name: str = None
+    role_name: str = RawField("data", "role_name")
     """身份名称"""
-    toast_msg: str = None
+    toast_msg: str = RawField("data", "toast_msg")
     """庆祝消息正文"""
-    uid: int = None
+    uid: int = RawField("data", "uid")
     """上舰人MID"""
-    unit: str = None
+    unit: str = RawField("data", "unit")
     """购买身份时间单位"""
-    username: str = None
+    username: str = RawField("data", "username")
     """用户名"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            anchor_show=data["anchor_show"],
-            color=data["color"],
-            gift_id=data["gift_id"],
-            guard_level=data["guard_level"],
-            num=data["num"],
-            price=data["price"],
-            role_name=data["role_name"],
-            toast_msg=data["toast_msg"],
-            uid=data["uid"],
-            unit=data["unit"],
-            username=data["username"],
-        )
-
-
-@dataclasses.dataclass
+
 class InteractWordMessage(MessageInterface):
     """
     入场消息
     """
 
-    uname: str = None
+    __slots__ = ()
+
+    uname: str = RawField("data", "uname")
     """用户名"""
-    uid: int = None
+    uid: int = RawField("data", "uid")
     """用户MID"""
-    face: str = None
+    face: str = RawField("data", "uinfo", "base", "face")
     """用户头像URL"""
-    msg_type: int = None
+    msg_type: int = RawField("data", "msg_type")
     """消息类型:1.为进场/2.为关注/3.为分享"""
 
-    @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        return cls(
-            uname=data["uname"],
-            uid=data["uid"],
-            face=data["uinfo"]["base"]["face"],
-            msg_type=data["msg_type"],
-        )
-
 
-@dataclasses.dataclass
 class InteractWordV2Message(MessageInterface):
     """
     入场消息V2
+    字段在data.pb中, 首次访问时只解码decode_fields中的字段, 不构造完整的protobuf消息;
+    访问不在decode_fields中的字段时单独解码该字段, 需要其他字段时使用proto完整解码
     """
 
-    uname: str = None
+    __slots__ = ()
+
+    decode_fields: ClassVar[tuple[str, ...]] = ("uname", "uid", "msg_type")
+    """首次访问字段时一起解码的字段, 经常使用face时可以加入其中"""
+
+    uname: str = PbField()
     """用户名"""
-    uid: int = None
+    uid: int = PbField()
     """用户MID"""
-    face: str = None
+    face: str = PbField()
     """用户头像URL"""
-    msg_type: int = None
+    msg_type: int = PbField()
     """消息类型:1.为进场/2.为关注/3.为分享"""
+    timestamp: int = PbField()
+    """时间戳（秒）"""
+
+    def _decode_pb(self, name: str):
+        if self._raw is None:
+            return getattr(type(self), name).default
+        decoded = self._decoder(self.decode_fields if name in self.decode_fields else (name,)).decode(
+            self._raw["data"]["pb"])
+        if self._values is None:
+            self._values = decoded
+        else:
+            for field_name, value in decoded.items():
+                self._values.setdefault(field_name, value)
+        return self._values[name]
 
     @classmethod
-    def from_command(cls, raw_msg: dict):
-        data = raw_msg["data"]
-        pb = InteractWordV2.INTERACT_WORD_V2()
-        pb.ParseFromString(base64.b64decode(data["pb"]))
-        return cls(
-            uname=pb.uname,
-            uid=pb.uid,
-            msg_type=pb.msg_type,
-            face='fyex6922'
-        )
+    @functools.cache
+    def _decoder(cls, names: tuple[str, ...]) -> InteractWordV2Decoder:
+        return InteractWordV2Decoder.for_fields(tuple(getattr(cls, name).wire_name for name in names), names)
+
+    @cached_field
+    def proto(self) -> InteractWordV2.INTERACT_WORD_V2:
+        """完整解码的protobuf消息"""
+        return InteractWordV2Decoder.decode_full(self._raw["data"]["pb"])
@@ -0,0 +1,224 @@
+"""消息接收队列"""
+import asyncio
+import dataclasses
+import struct
+from collections import deque
+from typing import Callable
+
+from loguru import logger
+
+from .codec import HEADER_STRUCT
+from .enum import Operation, ProtoVer, OverflowPolicy
+from .handler import peek_cmd
+
+__all__ = (
+    "FrameQueue",
+    "QueueStats",
+    "frame_priority",
+)
+
+PRIORITY_CONTROL = 100
+"""心跳回应、认证回应等非消息帧, 不会被丢弃"""
+PRIORITY_BATCH = 50
+"""
+压缩的批量消息帧, 解压前无法得知包含的cmd, 不按cmd排序.
+protover为2/3时直播间的消息基本都以压缩帧下发, 此时DROP_BY_PRIORITY只能保护控制帧和少量未压缩的消息,
+批量帧之间相当于丢弃新到达的帧
+"""
+PRIORITY_DEFAULT = 10
+"""未列出的cmd"""
+
+CMD_PRIORITY: dict[str, int] = {
+    "SUPER_CHAT_MESSAGE": 90,
+    "SUPER_CHAT_MESSAGE_DELETE": 90,
+    "GUARD_BUY": 90,
+    "USER_TOAST_MSG": 80,
+    "SEND_GIFT": 70,
+    "DANMU_MSG": 60,
+    "INTERACT_WORD": 30,
+    "INTERACT_WORD_V2": 30,
+    "LIKE_INFO_V3_CLICK": 20,
+}
+"""队列溢出时按优先级丢弃, 数值越小越先被丢弃"""
+
+
+def frame_priority(frame: bytes) -> int:
+    """
+    根据帧头和cmd计算帧的优先级
+    :param frame: WebSocket接收到的原始帧
+    :return: 优先级
+    """
+    try:
+        pack_len, header_size, ver, operation, _ = HEADER_STRUCT.unpack_from(frame)
+    except struct.error:
+        return PRIORITY_DEFAULT
+    if operation != Operation.SEND_MSG_REPLY:
+        return PRIORITY_CONTROL
+    if ver != ProtoVer.NORMAL:
+        return PRIORITY_BATCH
+    cmd = peek_cmd(memoryview(frame)[header_size:pack_len])
+    return CMD_PRIORITY.get(cmd, PRIORITY_DEFAULT)
+
+
+@dataclasses.dataclass
+class QueueStats:
+    depth: int = 0
+    """当前队列长度"""
+    max_depth: int = 0
+    """历史最大队列长度"""
+    put_count: int = 0
+    """入队帧数"""
+    get_count: int = 0
+    """出队帧数"""
+    dropped_count: int = 0
+    """因队列溢出丢弃的帧数"""
+    blocked_count: int = 0
+    """因队列已满而等待的入队次数"""
+
+
+class FrameQueue:
+    """
+    WebSocket接收与消息处理之间的有界帧队列.
+    接收端只负责将帧放入队列, 解码和分发由队列后的工作任务完成, 队列已满时按溢出策略处理:
+    BLOCK阻塞接收端, DROP_OLDEST丢弃最早的帧, DROP_BY_PRIORITY丢弃优先级最低的帧中最早的一帧,
+    新帧的优先级不高于队列中最低的优先级时丢弃新帧.
+    每个优先级一个双端队列, 帧带入队序号, 出队时取各队首中序号最小的帧, 入队、出队和丢弃的开销只与优先级的个数有关
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            policy: OverflowPolicy = OverflowPolicy.BLOCK,
+            priority: Callable[[bytes], int] = frame_priority,
+            name: str = "",
+    ):
+        """
+        :param maxsize: 队列最大长度
+        :param policy: 溢出策略
+        :param priority: 计算帧优先级的函数, 仅DROP_BY_PRIORITY策略使用
+        :param name: 日志中显示的队列名称
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._priority = priority
+        self.name = name
+        self._levels: dict[int, deque[tuple[int, bytes, float]]] = {}
+        """优先级 -> (入队序号, 帧, 接收时间)"""
+        self._size: int = 0
+        self._seq: int = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._unfinished: int = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self.stats = QueueStats()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _pop_oldest(self) -> tuple[int, bytes, float]:
+        """取出所有优先级中最早入队的帧"""
+        oldest = min((items for items in self._levels.values() if items), key=lambda items: items[0][0])
+        self._size -= 1
+        return oldest.popleft()
+
+    async def put(self, frame: bytes, received: float = 0):
+        """
+        帧入队, 队列已满时按溢出策略处理
+        :param frame: WebSocket接收到的原始帧
+        :param received: 接收时间, 随帧一起出队, 用于统计延迟
+        :return: None
+        """
+        priority = self._priority(frame) if self.policy is OverflowPolicy.DROP_BY_PRIORITY else 0
+        if self._size >= self.maxsize:
+            match self.policy:
+                case OverflowPolicy.BLOCK:
+                    self.stats.blocked_count += 1
+                    while self._size >= self.maxsize:
+                        self._writable.clear()
+                        await self._writable.wait()
+                case OverflowPolicy.DROP_OLDEST:
+                    self._pop_oldest()
+                    self._dropped()
+                    self._task_done()
+                case OverflowPolicy.DROP_BY_PRIORITY:
+                    lowest = min(level for level, items in self._levels.items() if items)
+                    if lowest >= priority:
+                        self._dropped()
+                        return
+                    self._levels[lowest].popleft()
+                    self._size -= 1
+                    self._dropped()
+                    self._task_done()
+        try:
+            items = self._levels[priority]
+        except KeyError:
+            items = self._levels[priority] = deque()
+        self._seq += 1
+        items.append((self._seq, frame, received))
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self.stats.put_count += 1
+        self.stats.depth = self._size
+        if self.stats.depth > self.stats.max_depth:
+            self.stats.max_depth = self.stats.depth
+        self._readable.set()
+
+    async def get(self) -> bytes:
+        """
+        取出最早入队的帧, 队列为空时等待
+        :return: WebSocket接收到的原始帧
+        """
+        return (await self.get_timed())[0]
+
+    async def get_timed(self) -> tuple[bytes, float]:
+        """
+        取出最早入队的帧及其接收时间, 队列为空时等待
+        :return: (WebSocket接收到的原始帧, 入队时提供的接收时间)
+        """
+        while not self._size:
+            self._readable.clear()
+            await self._readable.wait()
+        _, frame, received = self._pop_oldest()
+        self.stats.get_count += 1
+        self.stats.depth = self._size
+        self._writable.set()
+        return frame, received
+
+    def clear(self) -> int:
+        """
+        清空队列
+        :return: 被清空的帧数
+        """
+        count = self._size
+        for items in self._levels.values():
+            items.clear()
+        self._size = 0
+        self.stats.depth = 0
+        self._writable.set()
+        for _ in range(count):
+            self._task_done()
+        return count
+
+    def task_done(self):
+        """取出的帧处理完成"""
+        self._task_done()
+
+    async def join(self):
+        """等待所有入队的帧都被取出并处理完成"""
+        await self._finished.wait()
+
+    def _task_done(self):
+        if self._unfinished > 0:
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._finished.set()
+
+    def _dropped(self):
+        self.stats.dropped_count += 1
+        if self.stats.dropped_count == 1 or self.stats.dropped_count % 1000 == 0:
+            logger.warning(f"[{self.name}] 消息队列已满, 累计丢弃{self.stats.dropped_count}帧")
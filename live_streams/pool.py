@@ -0,0 +1,157 @@
+"""直播间连接池"""
+import asyncio
+import os
+import time
+from typing import Optional, Iterable, TYPE_CHECKING
+
+import aiohttp
+from loguru import logger
+
+from utils import ConfigManage, Signedparams
+from .config import Config
+from .handler import Handler
+
+if TYPE_CHECKING:
+    from . import BLiveClient
+
+__all__ = (
+    "RoomPool",
+)
+
+
+class RoomPool:
+    """
+    直播间连接池, 在单个进程中管理大量直播间.
+    所有直播间共享一个HTTP会话(连接器、DNS缓存)和SSL上下文, 直播间以限定的速率并发启动,
+    运行中可以随时添加或移除直播间.
+
+    内存预算(每个直播间, CPython 3.12, tracemalloc实测前两项):
+    BLiveClient对象及接收队列、解压器约4KB, 主任务和一个解码任务约4KB,
+    WebSocket连接(已关闭permessage-deflate, 共享SSL上下文)的TLS和读缓冲估计40-60KB,
+    接收队列中积压的帧按实际大小另计, 上限为 queue_size * 单帧大小.
+    5000个直播间预算约350MB, 建议保持dispatch_workers=1并按需调小queue_size
+    """
+
+    def __init__(
+            self,
+            handler: Optional[Handler] = None,
+            admission_rate: Optional[float] = None,
+            max_concurrent_starts: Optional[int] = None,
+            protover: Optional[int] = None,
+    ):
+        """
+        :param handler: 所有直播间共用的消息处理器, 不提供则使用默认处理器
+        :param admission_rate: 每秒最多启动的直播间数, 不提供则使用配置项pool_admission_rate
+        :param max_concurrent_starts: 同时处于启动过程中的最大直播间数, 不提供则使用配置项pool_max_concurrent_starts
+        :param protover: 协议版本, 不提供则使用配置项protover
+        """
+        self._config = ConfigManage.get_config(Config)
+        self._handler = handler
+        self._protover = protover
+        self.admission_rate = admission_rate or self._config.pool_admission_rate
+        self._starting = asyncio.Semaphore(max_concurrent_starts or self._config.pool_max_concurrent_starts)
+        self._admission_lock = asyncio.Lock()
+        self._next_admission: float = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._clients: dict[int, "BLiveClient"] = {}
+
+    @property
+    def rooms(self) -> dict[int, "BLiveClient"]:
+        """直播间ID -> 客户端"""
+        return self._clients
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, room_id: int) -> bool:
+        return room_id in self._clients
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            from . import BLiveClient
+            if self._config.use_cookie_login:
+                BLiveClient.headers["Cookie"] = os.getenv("COOKIE")
+            connector = aiohttp.TCPConnector(
+                limit=self._config.http_connection_limit,
+                limit_per_host=self._config.http_connection_limit_per_host,
+                ttl_dns_cache=300,
+            )
+            self._session = BLiveClient.create_session(connector)
+        return self._session
+
+    async def _admit(self):
+        """按admission_rate限制启动速率"""
+        async with self._admission_lock:
+            now = time.monotonic()
+            wait = self._next_admission - now
+            self._next_admission = max(now, self._next_admission) + 1 / self.admission_rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def add_room(self, room_id: int) -> Optional["BLiveClient"]:
+        """
+        添加并启动直播间
+        :param room_id: 直播间ID
+        :return: 启动成功返回客户端, 失败返回None
+        """
+        from . import BLiveClient
+        if room_id in self._clients:
+            return self._clients[room_id]
+        client = BLiveClient(
+            room_id=room_id, session_=self._get_session(), handler_=self._handler, protover=self._protover)
+        self._clients[room_id] = client
+        async with self._starting:
+            await self._admit()
+            try:
+                await client.start()
+            except Exception as e:
+                logger.error(f"[{room_id}] 直播间启动失败: {e}")
+                self._clients.pop(room_id, None)
+                await client.stop()
+                return None
+        if not client.program_status:
+            self._clients.pop(room_id, None)
+            await client.stop()
+            return None
+        return client
+
+    async def add_rooms(self, room_ids: Iterable[int]) -> list[int]:
+        """
+        并发添加并启动多个直播间
+        :param room_ids: 直播间ID
+        :return: 启动成功的直播间ID
+        """
+        room_ids = list(dict.fromkeys(room_ids))
+        results = await asyncio.gather(*(self.add_room(room_id) for room_id in room_ids))
+        started = [room_id for room_id, client in zip(room_ids, results) if client is not None]
+        logger.info(f"直播间启动完成: {len(started)}/{len(room_ids)}")
+        return started
+
+    async def remove_room(self, room_id: int) -> bool:
+        """
+        停止并移除直播间
+        :param room_id: 直播间ID
+        :return: 直播间是否存在
+        """
+        client = self._clients.pop(room_id, None)
+        if client is None:
+            return False
+        await client.stop_and_close()
+        return True
+
+    async def close(self):
+        """停止所有直播间并关闭共享会话"""
+        await asyncio.gather(*(self.remove_room(room_id) for room_id in list(self._clients)))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await Signedparams.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_type is asyncio.CancelledError:
+            return True
+        return None
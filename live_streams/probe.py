@@ -0,0 +1,90 @@
+"""服务器延迟探测"""
+import asyncio
+import math
+import ssl
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+__all__ = (
+    "HostRanker",
+)
+
+
+class HostRanker:
+    """
+    弹幕服务器延迟探测.
+    并发测量到每个候选服务器的TCP+TLS握手耗时, 按耗时从低到高排序,
+    探测结果按TTL缓存并在所有直播间之间共享, 同一服务器同一时间只会有一个探测在进行
+    """
+
+    _cache: dict[str, tuple[float, float]] = {}
+    """host:port -> (握手耗时, 过期时间), 探测失败的耗时为inf"""
+    _inflight: dict[str, asyncio.Future] = {}
+
+    def __init__(self, ttl: float = 300, timeout: float = 3.0, ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        :param ttl: 探测结果缓存时间(秒)
+        :param timeout: 单次探测超时时间(秒)
+        :param ssl_context: wss服务器握手使用的SSL上下文
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+
+    async def rank(self, uris: list[str]) -> list[tuple[str, float]]:
+        """
+        探测并排序候选服务器
+        :param uris: 弹幕服务器URI列表
+        :return: 按握手耗时从低到高排序的[(URI, 耗时秒数)], 探测失败的服务器保持原顺序排在最后
+        """
+        rtts = await asyncio.gather(*(self.probe(uri) for uri in uris))
+        ranked = sorted(zip(uris, rtts), key=lambda item: item[1])
+        logger.debug(f"服务器延迟: {[(uri, round(rtt * 1000, 1)) for uri, rtt in ranked]}")
+        return ranked
+
+    async def probe(self, uri: str) -> float:
+        """
+        测量到服务器的握手耗时, 优先使用缓存
+        :param uri: 弹幕服务器URI
+        :return: 握手耗时(秒), 失败返回inf
+        """
+        parts = urlsplit(uri)
+        use_tls = parts.scheme == "wss"
+        port = parts.port or (443 if use_tls else 80)
+        key = f"{parts.hostname}:{port}"
+        cached = HostRanker._cache.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        future = HostRanker._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._handshake(parts.hostname, port, use_tls))
+            HostRanker._inflight[key] = future
+            future.add_done_callback(lambda _: HostRanker._inflight.pop(key, None))
+        rtt = await asyncio.shield(future)
+        HostRanker._cache[key] = (rtt, time.monotonic() + self.ttl)
+        return rtt
+
+    async def _handshake(self, host: str, port: int, use_tls: bool) -> float:
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if use_tls else None),
+                self.timeout,
+            )
+        except (OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+            logger.debug(f"服务器探测失败 {host}:{port}: {e}")
+            return math.inf
+        rtt = time.perf_counter() - start
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+        return rtt
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
@@ -0,0 +1,262 @@
+"""
+事件循环延迟与阻塞分析.
+循环内的计时任务每interval秒醒来一次, 实际醒来时间与预期的差值即为事件循环延迟;
+独立的监视线程发现计时任务超过threshold秒未醒来时, 抓取事件循环线程当前的调用栈和正在执行的任务,
+把阻塞归因到具体的协程和代码位置. 另外可以按需对事件循环线程做定时采样, 输出折叠栈格式的性能剖析,
+可直接用于flamegraph.pl或speedscope
+"""
+import asyncio
+import collections
+import dataclasses
+import os
+import signal
+import sys
+import sysconfig
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import Optional, Hashable
+
+from loguru import logger
+
+from .metrics import Histogram
+
+__all__ = (
+    "LoopProfiler",
+    "SlowStep",
+)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""事件循环延迟的直方图分桶(秒)"""
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"],
+                        sysconfig.get_paths()["platlib"]})
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _stack(frame: Optional[FrameType]) -> list[FrameType]:
+    """从最外层到最内层的调用栈"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _blame_site(frames: list[FrameType]) -> str:
+    """最内层的项目代码位置, 全部为标准库或第三方库时取最内层"""
+    for frame in reversed(frames):
+        if not frame.f_code.co_filename.startswith(_LIBRARY_PATHS):
+            return _frame_name(frame)
+    return _frame_name(frames[-1]) if frames else "<unknown>"
+
+
+@dataclasses.dataclass
+class SlowStep:
+    task: str
+    """阻塞时正在执行的任务及其协程"""
+    site: str
+    """阻塞位置(最内层的项目代码)"""
+    stack: list[str]
+    """阻塞时的调用栈, 从外到内"""
+    seconds: float = 0
+    """阻塞时长(秒)"""
+
+
+class LoopProfiler:
+    """
+    事件循环延迟监测与阻塞归因, 所有直播间共用一个实例.
+    开销为每interval秒一次计时任务唤醒和监视线程每threshold/2秒一次检查, 可以在生产环境中常开
+    """
+
+    _default: Optional["LoopProfiler"] = None
+
+    def __init__(
+            self,
+            interval: float = 0.1,
+            threshold: float = 0.1,
+            profile_directory: Optional[Path] = None,
+            profile_seconds: float = 10,
+            history: int = 100,
+    ):
+        """
+        :param interval: 计时任务的唤醒间隔(秒)
+        :param threshold: 事件循环延迟超过该值(秒)时判定为阻塞并归因
+        :param profile_directory: 收到SIGUSR1时写入采样结果的目录, 不提供则不响应信号
+        :param profile_seconds: 收到SIGUSR1时的采样时长(秒)
+        :param history: 保留的最近阻塞记录条数
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.profile_directory = profile_directory
+        self.profile_seconds = profile_seconds
+        self.lag = Histogram(LAG_BUCKETS)
+        """事件循环延迟"""
+        self.max_lag: float = 0
+        """最大事件循环延迟(秒)"""
+        self.slow_steps: collections.deque[SlowStep] = collections.deque(maxlen=history)
+        """最近的阻塞记录"""
+        self.blocked_count: collections.Counter[str] = collections.Counter()
+        """阻塞位置 -> 次数"""
+        self.blocked_seconds: collections.Counter[str] = collections.Counter()
+        """阻塞位置 -> 累计阻塞时长(秒)"""
+        self._owners: set[Hashable] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: int = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_tick: float = 0
+        self._pending: Optional[SlowStep] = None
+        self._dumping: Optional[asyncio.Task] = None
+
+    @classmethod
+    def default(
+            cls,
+            interval: float = 0.1,
+            threshold: float = 0.1,
+            profile_directory: Optional[Path] = None,
+            profile_seconds: float = 10,
+    ) -> "LoopProfiler":
+        """进程内共享的实例, 参数仅在首次调用时生效"""
+        if cls._default is None:
+            cls._default = cls(interval, threshold, profile_directory, profile_seconds)
+        return cls._default
+
+    def register(self, owner: Hashable):
+        """
+        开始监测, 所有使用者都注销后停止
+        :param owner: 使用者, 通常为BLiveClient
+        :return: None
+        """
+        self._owners.add(owner)
+        if self._task is None or self._task.done():
+            self._start()
+
+    def unregister(self, owner: Hashable):
+        self._owners.discard(owner)
+        if not self._owners:
+            self._stop()
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        # 每次启动使用新的事件, 避免上一次的监视线程在停止后重新开始
+        self._stopped = threading.Event()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stopped,), name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        try:
+            self._loop.add_signal_handler(signal.SIGUSR1, self._on_signal)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # Windows或非主线程不支持信号处理
+            pass
+        logger.debug("事件循环监测启动")
+
+    def _stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.remove_signal_handler(signal.SIGUSR1)
+            except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+                pass
+        self._watchdog = None
+
+    async def _tick(self):
+        """计时任务, 记录每次醒来的延迟"""
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._last_tick = now
+                lag = max(0.0, now - expected)
+                self.lag.observe(lag)
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                step, self._pending = self._pending, None
+                if step is not None and lag >= self.threshold:
+                    step.seconds = lag
+                    self.slow_steps.append(step)
+                    self.blocked_count[step.site] += 1
+                    self.blocked_seconds[step.site] += lag
+                    logger.warning(f"事件循环阻塞{lag:.3f}秒 | 任务: {step.task} | 位置: {step.site}")
+        except asyncio.CancelledError:
+            logger.debug("事件循环监测停止")
+
+    def _watch(self, stopped: threading.Event):
+        """监视线程, 计时任务超时未醒来时抓取事件循环线程的调用栈"""
+        while not stopped.wait(self.threshold / 2):
+            if self._pending is not None:
+                continue
+            if time.monotonic() - self._last_tick < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            frames = _stack(frame)
+            del frame
+            task = asyncio.current_task(self._loop)
+            task_name = "<回调>" if task is None else \
+                f"{task.get_name()} {getattr(task.get_coro(), '__qualname__', task.get_coro())}"
+            self._pending = SlowStep(task_name, _blame_site(frames), [_frame_name(f) for f in frames])
+
+    def _sample(self, duration: float, interval: float) -> collections.Counter[str]:
+        """在线程中执行, 定时采样事件循环线程的调用栈"""
+        samples: collections.Counter[str] = collections.Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                samples[";".join(_frame_name(f) for f in _stack(frame))] += 1
+                del frame
+            time.sleep(interval)
+        return samples
+
+    async def profile(self, duration: float = 10, interval: float = 0.005) -> collections.Counter[str]:
+        """
+        对事件循环线程做定时采样, 采样期间事件循环正常运行
+        :param duration: 采样时长(秒)
+        :param interval: 采样间隔(秒)
+        :return: 折叠栈(从外到内以;分隔) -> 采样次数
+        """
+        if not self._loop_thread:
+            self._loop_thread = threading.get_ident()
+        return await asyncio.to_thread(self._sample, duration, interval)
+
+    async def dump_profile(self, path: Path, duration: float = 10, interval: float = 0.005) -> Path:
+        """
+        采样并写入折叠栈格式的文件
+        :param path: 文件路径
+        :param duration: 采样时长(秒)
+        :param interval: 采样间隔(秒)
+        :return: 文件路径
+        """
+        samples = await self.profile(duration, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        await asyncio.to_thread(path.write_text, text, encoding="utf-8")
+        logger.info(f"事件循环采样完成: {path} ({sum(samples.values())}个样本)")
+        return path
+
+    def _on_signal(self):
+        """收到SIGUSR1时采样并写入profile_directory"""
+        if self.profile_directory is None or self._dumping is not None:
+            return
+        path = self.profile_directory / f"loop_{time.strftime('%Y%m%d_%H%M%S')}.folded"
+        self._dumping = asyncio.create_task(self.dump_profile(path, self.profile_seconds))
+        self._dumping.add_done_callback(self._on_dumped)
+
+    def _on_dumped(self, task: asyncio.Task):
+        self._dumping = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"事件循环采样失败: {task.exception()}")
@@ -0,0 +1,183 @@
+"""原始帧录制与回放"""
+import asyncio
+import contextlib
+import dataclasses
+import itertools
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, AsyncIterator, Iterable, Optional
+
+from .history import SegmentWriter
+
+__all__ = (
+    "FrameRecorder",
+    "FrameReplay",
+    "ReplayStats",
+    "read_frames",
+    "recorded_room_id",
+)
+
+FILE_HEADER = struct.Struct(">4sBQ")
+"""文件头: 魔数, 格式版本, 直播间ID"""
+RECORD_HEADER = struct.Struct(">QI")
+"""记录头: 接收时间(Unix纳秒), 帧长度; 之后是帧的原始字节"""
+MAGIC = b"BLVR"
+VERSION = 1
+
+
+class FrameRecorder(SegmentWriter):
+    """
+    原始帧录制器.
+    将WebSocket接收到的原始帧连同接收时间写入紧凑的二进制分段文件, 文件名为 {room_id}_{分段开始时间}.blvr,
+    可以用FrameReplay回放
+    """
+
+    suffix = ".blvr"
+
+    def record(self, frame: bytes, received_ns: int = None):
+        """
+        录制一帧
+        :param frame: WebSocket接收到的原始帧
+        :param received_ns: 接收时间(Unix纳秒), 不提供则为当前时间
+        :return: None
+        """
+        if received_ns is None:
+            received_ns = time.time_ns()
+        self._push(RECORD_HEADER.pack(received_ns, len(frame)) + frame)
+
+    def _segment_header(self) -> bytes:
+        return FILE_HEADER.pack(MAGIC, VERSION, self.room_id)
+
+
+def _segment_files(paths: Path | Iterable[Path]) -> list[Path]:
+    if isinstance(paths, Path):
+        paths = [paths]
+    files = []
+    for path in paths:
+        files.extend(sorted(path.glob(f"*{FrameRecorder.suffix}"), key=FrameRecorder.segment_key) if path.is_dir() else [path])
+    return files
+
+
+def recorded_room_id(paths: Path | Iterable[Path]) -> Optional[int]:
+    """
+    读取录制时的直播间ID
+    :param paths: 分段文件或分段所在目录
+    :return: 第一个分段文件头中的直播间ID, 没有分段时为None
+    """
+    for file in _segment_files(paths):
+        with open(file, "rb") as f:
+            header = f.read(FILE_HEADER.size)
+        if len(header) == FILE_HEADER.size:
+            return FILE_HEADER.unpack(header)[2]
+    return None
+
+
+def read_frames(paths: Path | Iterable[Path]) -> Iterator[tuple[int, bytes]]:
+    """
+    读取录制的帧
+    :param paths: 分段文件或分段所在目录, 目录中的分段按文件名(即开始时间)排序
+    :return: (接收时间(Unix纳秒), 原始帧)迭代器
+    :raise ValueError: 文件格式错误
+    """
+    for file in _segment_files(paths):
+        with open(file, "rb") as f:
+            header = f.read(FILE_HEADER.size)
+            if len(header) < FILE_HEADER.size:
+                continue
+            magic, version, _ = FILE_HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a frame recording: {file}")
+            while record := f.read(RECORD_HEADER.size):
+                if len(record) < RECORD_HEADER.size:
+                    break
+                received_ns, length = RECORD_HEADER.unpack(record)
+                frame = f.read(length)
+                if len(frame) < length:
+                    # 录制中断时最后一条记录可能不完整
+                    break
+                yield received_ns, frame
+
+
+@dataclasses.dataclass
+class ReplayStats:
+    frames: int = 0
+    """回放的帧数"""
+    bytes: int = 0
+    """回放的字节数"""
+    elapsed_seconds: float = 0
+    """从开始回放到全部帧处理完成的用时(秒)"""
+    max_behind_seconds: float = 0
+    """按录制节奏回放时, 入队落后于计划时间的最大秒数, 反映处理能力不足造成的积压"""
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.elapsed_seconds if self.elapsed_seconds else 0
+
+
+class FrameReplay:
+    """
+    录制帧的回放源.
+    按录制时的接收间隔产生帧, speed为回放倍速, 为0时不等待、以最快速度回放.
+    分段文件在线程中按批读取, 产出当前一批帧的同时预读下一批, 读文件不阻塞事件循环
+    """
+
+    def __init__(self, paths: Path | Iterable[Path], speed: float = 1.0, read_batch: int = 256):
+        """
+        :param paths: 分段文件或分段所在目录
+        :param speed: 回放倍速, 1为实时, 0为最快速度
+        :param read_batch: 每次在线程中读取的帧数
+        """
+        if speed < 0:
+            raise ValueError("speed must not be negative")
+        if read_batch <= 0:
+            raise ValueError("read_batch must be positive")
+        self.paths = paths
+        self.speed = speed
+        self.read_batch = read_batch
+        self.stats = ReplayStats()
+
+    async def _read_ahead(self) -> AsyncIterator[tuple[int, bytes]]:
+        """在线程中逐批读取录制的帧, 同一时间只有一个线程访问读取生成器"""
+        frames = read_frames(self.paths)
+        lock = threading.Lock()
+
+        def read() -> list[tuple[int, bytes]]:
+            with lock:
+                return list(itertools.islice(frames, self.read_batch))
+
+        def close():
+            # 等待仍在进行的读取结束后再关闭生成器及其打开的文件
+            with lock:
+                frames.close()
+
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(None, read)
+        try:
+            while batch := await pending:
+                pending = loop.run_in_executor(None, read)
+                for record in batch:
+                    yield record
+        finally:
+            pending.add_done_callback(lambda future: future.cancelled() or future.exception())
+            loop.run_in_executor(None, close)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first_ns = None
+        async with contextlib.aclosing(self._read_ahead()) as records:
+            async for received_ns, frame in records:
+                if self.speed:
+                    if first_ns is None:
+                        first_ns = received_ns
+                    due = start + (received_ns - first_ns) / 1e9 / self.speed
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif -delay > self.stats.max_behind_seconds:
+                        self.stats.max_behind_seconds = -delay
+                self.stats.frames += 1
+                self.stats.bytes += len(frame)
+                yield frame
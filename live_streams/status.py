@@ -0,0 +1,356 @@
+"""
+直播状态批量轮询.
+所有直播间共用一个轮询任务, 到期的直播间合并为多房间请求(按直播间ID用getRoomBaseInfo, 按主播UID用
+get_status_info_by_uids), 轮询间隔按直播间状态调整: 直播中固定间隔, 未开播时随未开播时长逐步放慢,
+接近以往开播的时刻时加快; 开播和下播时通知订阅者
+"""
+import asyncio
+import collections
+import dataclasses
+import heapq
+import inspect
+import time
+from typing import Optional, Callable, Iterable, Any
+
+import aiohttp
+from loguru import logger
+
+from utils import BiliApi
+
+__all__ = (
+    "LiveStatusEvent",
+    "LiveStatusPoller",
+    "RoomStatus",
+)
+
+_DAY = 86400
+
+
+@dataclasses.dataclass
+class LiveStatusEvent:
+    room_id: int
+    uid: int
+    uname: str
+    title: str
+    live: bool
+    """True为开播, False为下播"""
+    detected_at: float
+    """发现状态变化的时间(Unix秒)"""
+
+
+@dataclasses.dataclass
+class RoomStatus:
+    kind: str
+    """room: 按直播间ID轮询, uid: 按主播UID轮询"""
+    key: int
+    """直播间ID或主播UID"""
+    live: bool = False
+    room_id: int = 0
+    uid: int = 0
+    uname: str = ""
+    title: str = ""
+    changed_at: float = dataclasses.field(default_factory=time.monotonic)
+    """最近一次状态变化(或开始轮询)的time.monotonic()时间"""
+    start_times: collections.deque[int] = dataclasses.field(default_factory=lambda: collections.deque(maxlen=7))
+    """最近几次开播时刻(当天的第几秒, 本地时间)"""
+    next_poll: float = 0
+    """下次轮询的time.monotonic()时间"""
+    watchers: int = 0
+    """引用计数, 为0时停止轮询"""
+
+
+Subscriber = Callable[[LiveStatusEvent], Any]
+
+
+class LiveStatusPoller:
+    """批量直播状态轮询器, 通过add_room/add_user添加直播间, subscribe订阅开播和下播事件"""
+
+    _default: Optional["LiveStatusPoller"] = None
+
+    def __init__(
+            self,
+            session: Optional[aiohttp.ClientSession] = None,
+            batch_size: int = 50,
+            min_interval: float = 5,
+            live_interval: float = 15,
+            offline_interval: float = 30,
+            max_interval: float = 300,
+            idle_after: float = 3600,
+            start_window: float = 1800,
+    ):
+        """
+        :param session: 共享的HTTP会话, 由调用方负责关闭; 不提供或已关闭时在轮询期间自行创建
+        :param batch_size: 每个请求包含的最大直播间数
+        :param min_interval: 接近以往开播时刻时的轮询间隔(秒)
+        :param live_interval: 直播中的轮询间隔(秒)
+        :param offline_interval: 刚下播或刚开始轮询时的未开播轮询间隔(秒)
+        :param max_interval: 轮询间隔上限(秒)
+        :param idle_after: 未开播每持续该时长(秒), 未开播轮询间隔翻倍一次
+        :param start_window: 距以往开播时刻在该时长(秒)内时使用min_interval
+        """
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.live_interval = live_interval
+        self.offline_interval = offline_interval
+        self.max_interval = max_interval
+        self.idle_after = idle_after
+        self.start_window = start_window
+        self.requests: int = 0
+        """发出的批量请求数"""
+        self._session = session
+        self._own_session = False
+        self._entries: dict[tuple[str, int], RoomStatus] = {}
+        self._heap: list[tuple[float, tuple[str, int]]] = []
+        self._subscribers: dict[Optional[int], list[Subscriber]] = collections.defaultdict(list)
+        self._callbacks: set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def default(cls, *args, **kwargs) -> "LiveStatusPoller":
+        """进程内共享的轮询器, 参数仅在首次调用时生效"""
+        if cls._default is None:
+            cls._default = cls(*args, **kwargs)
+        return cls._default
+
+    @property
+    def rooms(self) -> dict[tuple[str, int], RoomStatus]:
+        """(类型, 直播间ID或主播UID) -> 状态"""
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def subscribe(self, func: Subscriber, room_id: Optional[int] = None) -> Subscriber:
+        """
+        订阅开播和下播事件.
+        同步函数直接在轮询任务中调用, 协程函数创建任务执行
+        :param func: 回调函数, 参数为LiveStatusEvent
+        :param room_id: 只接收该直播间的事件, 不提供则接收所有直播间的事件
+        :return: func
+        """
+        self._subscribers[room_id].append(func)
+        return func
+
+    def unsubscribe(self, func: Subscriber, room_id: Optional[int] = None):
+        subscribers = self._subscribers.get(room_id)
+        if subscribers and func in subscribers:
+            subscribers.remove(func)
+            if not subscribers:
+                del self._subscribers[room_id]
+
+    def add_room(self, room_id: int, live: bool = False, start_times: Iterable[int] = ()) -> RoomStatus:
+        """
+        按直播间ID轮询, 重复添加时增加引用计数
+        :param room_id: 直播间ID
+        :param live: 已知的初始状态, 与首次轮询结果不同时发出事件
+        :param start_times: 预期的开播时刻(当天的第几秒, 本地时间), 之后按实际开播时刻更新
+        :return: 直播间状态
+        """
+        return self._add("room", room_id, live, start_times)
+
+    def add_user(self, uid: int, live: bool = False, start_times: Iterable[int] = ()) -> RoomStatus:
+        """
+        按主播UID轮询, 参数同add_room
+        :param uid: 主播UID
+        """
+        return self._add("uid", uid, live, start_times)
+
+    def remove_room(self, room_id: int):
+        self._remove("room", room_id)
+
+    def remove_user(self, uid: int):
+        self._remove("uid", uid)
+
+    def _add(self, kind: str, key: int, live: bool, start_times: Iterable[int]) -> RoomStatus:
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            entry = self._entries[(kind, key)] = RoomStatus(kind, key, live)
+            if kind == "room":
+                entry.room_id = key
+            else:
+                entry.uid = key
+            self._schedule(entry, time.monotonic())
+        entry.start_times.extend(start_times)
+        entry.watchers += 1
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        else:
+            self._wakeup.set()
+        return entry
+
+    def _remove(self, kind: str, key: int):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return
+        entry.watchers -= 1
+        if entry.watchers <= 0:
+            del self._entries[(kind, key)]
+            # 堆中的过期条目在出堆时丢弃
+            if not self._entries and self._wakeup is not None:
+                self._wakeup.set()
+
+    def _schedule(self, entry: RoomStatus, when: float):
+        entry.next_poll = when
+        heapq.heappush(self._heap, (when, (entry.kind, entry.key)))
+
+    def _near_start(self, entry: RoomStatus) -> bool:
+        if not entry.start_times:
+            return False
+        local = time.localtime()
+        now = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec
+        for start in entry.start_times:
+            diff = abs(now - start) % _DAY
+            if min(diff, _DAY - diff) <= self.start_window:
+                return True
+        return False
+
+    def interval(self, entry: RoomStatus, now: float) -> float:
+        """
+        下一次轮询前的间隔
+        :param entry: 直播间状态
+        :param now: time.monotonic()
+        :return: 秒数
+        """
+        if entry.live:
+            return self.live_interval
+        if self._near_start(entry):
+            return self.min_interval
+        doublings = min(16, int((now - entry.changed_at) // self.idle_after))
+        return min(self.max_interval, self.offline_interval * 2 ** doublings)
+
+    def _pop_due(self, now: float) -> list[RoomStatus]:
+        """取出到期的直播间, 最后一批未满时提前带上min_interval内即将到期的直播间"""
+        due: list[RoomStatus] = []
+        while self._heap:
+            when, key = self._heap[0]
+            if when > now and (len(due) % self.batch_size == 0 or when > now + self.min_interval):
+                break
+            heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.next_poll == when:
+                due.append(entry)
+        return due
+
+    def attach_session(self, session: aiohttp.ClientSession):
+        """
+        提供调用方共享的HTTP会话(如RoomPool或BLiveClient的会话), 仅在当前没有可用的共享会话时生效
+        :param session: HTTP会话, 由调用方负责关闭
+        :return: None
+        """
+        if self._session is None or self._session.closed:
+            self._session = session
+            self._own_session = False
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """共享会话已被调用方关闭时, 自行创建会话直到轮询停止"""
+        if self._session is None or self._session.closed:
+            from . import BLiveClient
+            self._session = BLiveClient.create_session()
+            self._own_session = True
+        return self._session
+
+    async def _run(self):
+        try:
+            while self._entries:
+                due = self._pop_due(time.monotonic())
+                if due:
+                    batches: dict[str, list[RoomStatus]] = collections.defaultdict(list)
+                    for entry in due:
+                        batches[entry.kind].append(entry)
+                    api = BiliApi(self._get_session())
+                    await asyncio.gather(*(
+                        self._poll(api, kind, entries[i:i + self.batch_size])
+                        for kind, entries in batches.items() for i in range(0, len(entries), self.batch_size)
+                    ))
+                    continue
+                self._wakeup.clear()
+                delay = self._heap[0][0] - time.monotonic() if self._heap else self.max_interval
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, delay))
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            logger.debug("直播状态轮询停止")
+        finally:
+            self._heap.clear()
+            # 关闭会话期间新添加的直播间由新的轮询任务处理
+            if self._task is asyncio.current_task():
+                self._task = None
+            if self._own_session:
+                session, self._session, self._own_session = self._session, None, False
+                await session.close()
+
+    async def _request(self, api: BiliApi, kind: str, entries: list[RoomStatus]) -> dict[int, dict]:
+        """
+        批量查询直播状态
+        :return: 直播间ID或主播UID -> 状态信息
+        """
+        self.requests += 1
+        if kind == "room":
+            params = [("req_biz", "web_room_componet"), *(("room_ids", e.key) for e in entries)]
+            data = (await api.request("room_base_info", params))["data"]
+            return {int(k): v for k, v in (data.get("by_room_ids") or {}).items()}
+        params = [("uids[]", e.key) for e in entries]
+        data = (await api.request("status_by_uids", params))["data"]
+        # 没有结果时data为空列表
+        return {int(k): v for k, v in (data or {}).items()}
+
+    async def _poll(self, api: BiliApi, kind: str, entries: list[RoomStatus]):
+        try:
+            results = await self._request(api, kind, entries)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, KeyError, TypeError, ValueError,
+                AttributeError) as e:
+            logger.error(f"直播状态查询失败({len(entries)}个直播间): {type(e).__name__}: {e}")
+            results = {}
+        now = time.monotonic()
+        for entry in entries:
+            if self._entries.get((entry.kind, entry.key)) is not entry:
+                continue
+            if (info := results.get(entry.key)) is not None:
+                self._update(entry, info, now)
+            self._schedule(entry, now + self.interval(entry, now))
+
+    def _update(self, entry: RoomStatus, info: dict, now: float):
+        entry.room_id = int(info.get("room_id") or entry.room_id)
+        entry.uid = int(info.get("uid") or entry.uid)
+        entry.uname = info.get("uname") or entry.uname
+        entry.title = info.get("title") or entry.title
+        live = info.get("live_status") == 1
+        if live == entry.live:
+            return
+        entry.live = live
+        entry.changed_at = now
+        if live:
+            local = time.localtime()
+            entry.start_times.append(local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec)
+        self._emit(entry, LiveStatusEvent(entry.room_id, entry.uid, entry.uname, entry.title, live, time.time()))
+
+    def _emit(self, entry: RoomStatus, event: LiveStatusEvent):
+        funcs = [*self._subscribers.get(None, ()), *self._subscribers.get(event.room_id, ())]
+        # 按短号添加的直播间, 事件中为真实直播间ID
+        if entry.kind == "room" and entry.key != event.room_id:
+            funcs.extend(self._subscribers.get(entry.key, ()))
+        for func in funcs:
+            try:
+                result = func(event)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._callbacks.add(task)
+                    task.add_done_callback(self._on_callback_done)
+            except Exception as e:
+                logger.exception(f"直播状态回调失败: {e}")
+
+    def _on_callback_done(self, task: asyncio.Task):
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(f"直播状态回调失败: {task.exception()}")
+
+    async def close(self):
+        """停止轮询"""
+        self._entries.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
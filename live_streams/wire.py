@@ -0,0 +1,195 @@
+"""INTERACT_WORD_V2 protobuf选择性解码"""
+import binascii
+import functools
+import operator
+from typing import Iterable, Optional
+
+import utils.InteractWordV2 as InteractWordV2
+
+__all__ = (
+    "FIELD_PATHS",
+    "InteractWordV2Decoder",
+)
+
+FIELD_PATHS: dict[str, tuple[int, ...]] = {
+    "uid": (1,),
+    "uname": (2,),
+    "msg_type": (5,),
+    "roomid": (6,),
+    "timestamp": (7,),
+    "timestamp_millisecond": (8,),
+    "face": (22, 2, 2),
+}
+"""
+字段名 -> 字段编号路径, 如face为user_info(22).base(2).face(2).
+生成的INTERACT_WORD_V2把timestamp_millisecond声明为uint32, 完整解码时会被截断, 这里按varint读取完整的值;
+该字段的取值并不是毫秒时间戳(示例消息中为2027年), 发出时间以timestamp(秒)为准
+"""
+
+_DEFAULTS = {
+    "uname": "",
+    "face": "",
+}
+"""protobuf3不传输默认值, 未出现的字段取默认值, 数字字段默认为0"""
+
+_ATTR_PATHS = {
+    "face": "user_info.base.face",
+}
+"""嵌套字段在完整解码的消息中的属性路径"""
+_TRUNCATED = {"timestamp_millisecond"}
+"""完整解码时会被截断, 需要扫描读取的字段"""
+
+_PREFIX_CHARS = 64
+"""先解码的base64长度, 64个字符对应48字节, 足够覆盖uid、uname、msg_type"""
+_HEAD_MAX_FIELD = 8
+"""编号不超过该值的顶层字段位于消息开头, 由扫描解码; 其余字段位于消息末尾的子消息中, 由protobuf完整解码"""
+
+
+class _Truncated(Exception):
+    """只解码了前缀, 字段超出了已解码的范围"""
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _scan(buf: bytes, plan: dict[int, str], out: dict, wanted: int) -> int:
+    """
+    扫描protobuf消息的顶层字段, 只解码plan中的字段, 其余字段按wire type跳过
+    :param buf: 消息
+    :param plan: 字段编号 -> 键名
+    :param out: 解码结果
+    :param wanted: 需要的字段数, 全部取到后提前结束
+    :return: 取到的字段数
+    """
+    pos = 0
+    end = len(buf)
+    found = 0
+    while pos < end and found < wanted:
+        key = buf[pos]
+        if key < 0x80:
+            pos += 1
+        else:
+            key, pos = _read_varint(buf, pos)
+        match key & 7:
+            case 0:
+                value = buf[pos]
+                if value < 0x80:
+                    pos += 1
+                else:
+                    value, pos = _read_varint(buf, pos)
+                if (name := plan.get(key >> 3)) is not None:
+                    out[name] = value
+                    found += 1
+            case 2:
+                length = buf[pos]
+                if length < 0x80:
+                    pos += 1
+                else:
+                    length, pos = _read_varint(buf, pos)
+                if (name := plan.get(key >> 3)) is not None:
+                    if pos + length > end:
+                        raise _Truncated
+                    out[name] = buf[pos:pos + length].decode()
+                    found += 1
+                pos += length
+            case 1:
+                pos += 8
+            case 5:
+                pos += 4
+            case _:
+                raise ValueError(f"unsupported wire type {key & 7}")
+    if pos > end:
+        raise _Truncated
+    return found
+
+
+class InteractWordV2Decoder:
+    """
+    INTERACT_WORD_V2选择性解码器.
+    位于消息开头的字段(uid、uname、msg_type、时间戳等)只对base64的前缀解码并扫描, 不构造protobuf消息,
+    超出前缀时再解码全部; 位于末尾子消息中的字段(face)使用protobuf完整解码,
+    纯Python逐字节扫描整条消息反而比protobuf的C实现慢
+    """
+
+    def __init__(self, fields: Iterable[str] = ("uid", "uname", "msg_type"), names: Optional[Iterable[str]] = None):
+        """
+        :param fields: 需要解码的字段, 可选FIELD_PATHS中的字段
+        :param names: 与fields一一对应的解码结果中的键名, 默认与字段名相同
+        """
+        self.fields = tuple(fields)
+        self.names = tuple(names) if names is not None else self.fields
+        unknown = set(self.fields) - FIELD_PATHS.keys()
+        if unknown:
+            raise ValueError(f"unsupported INTERACT_WORD_V2 fields: {sorted(unknown)}")
+        pairs = tuple(zip(self.fields, self.names))
+        head = {
+            FIELD_PATHS[field][0]: name for field, name in pairs
+            if len(FIELD_PATHS[field]) == 1 and FIELD_PATHS[field][0] <= _HEAD_MAX_FIELD
+        }
+        self._full = len(head) < len(pairs)
+        if self._full:
+            # 需要末尾的字段时完整解码一次, 开头的字段也从解码后的消息中读取, 只有会被截断的字段仍需扫描
+            self._getters = tuple(
+                (name, operator.attrgetter(_ATTR_PATHS.get(field, field))) for field, name in pairs
+                if field not in _TRUNCATED
+            )
+            self._plan = {FIELD_PATHS[field][0]: name for field, name in pairs if field in _TRUNCATED}
+        else:
+            self._getters = ()
+            self._plan = head
+        self._wanted = len(self._plan)
+        self._defaults = {name: _DEFAULTS.get(field, 0) for field, name in zip(self.fields, self.names)}
+
+    @classmethod
+    @functools.cache
+    def for_fields(cls, fields: tuple[str, ...], names: Optional[tuple[str, ...]] = None) -> "InteractWordV2Decoder":
+        """按字段组合共享的解码器"""
+        return cls(fields, names)
+
+    def decode(self, pb: str | bytes) -> dict:
+        """
+        解码需要的字段
+        :param pb: 消息中data.pb的base64字符串
+        :return: 键名 -> 值, 消息中不存在的字段取默认值
+        """
+        out = self._defaults.copy()
+        if self._full:
+            data = binascii.a2b_base64(pb)
+            message = InteractWordV2.INTERACT_WORD_V2()
+            message.ParseFromString(data)
+            for name, getter in self._getters:
+                out[name] = getter(message)
+            if self._plan:
+                _scan(data, self._plan, out, self._wanted)
+            return out
+        found = 0
+        if len(pb) > _PREFIX_CHARS:
+            try:
+                found = _scan(binascii.a2b_base64(pb[:_PREFIX_CHARS]), self._plan, out, self._wanted)
+            except (_Truncated, IndexError):
+                pass
+        if found < self._wanted:
+            _scan(binascii.a2b_base64(pb), self._plan, out, self._wanted)
+        return out
+
+    @staticmethod
+    def decode_full(pb: str | bytes, message: Optional[InteractWordV2.INTERACT_WORD_V2] = None):
+        """
+        使用protobuf完整解码
+        :param pb: data.pb的base64字符串
+        :param message: 复用的消息对象, 连续解码多条消息时可以避免重复创建
+        :return: INTERACT_WORD_V2消息
+        """
+        if message is None:
+            message = InteractWordV2.INTERACT_WORD_V2()
+        message.ParseFromString(binascii.a2b_base64(pb))
+        return message
@@ -12,7 +12,7 @@ from live_streams import *
 from utils import convert_str_to_list
 
 MUSIC_KEYWORDS = {"点歌", "来一首", "来首", "放首", "点一首"}
-room_task: dict[int, BLiveClient]
+room_pool: RoomPool
 count: dict[str, int] = {
     "WatchNum": 0,
     "InteractWord": 0,
@@ -82,15 +82,16 @@ async def _(model: models.InteractWordMessage | models.InteractWordV2Message):
 
 
 async def main():
-    global room_task
+    global room_pool
     room_ids = convert_str_to_list(os.getenv("LIVE_ROOM_ID"))
-    room_task = {room_id: BLiveClient(room_id=room_id) for room_id in room_ids}
+    room_pool = RoomPool()
     try:
-        for client in room_task.values():
-            await client.start()
+        await room_pool.add_rooms(room_ids)
         await asyncio.Event().wait()
     except asyncio.CancelledError:
         logger.info("正在关闭程序")
+    finally:
+        await room_pool.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,11 @@
+"""
+pytest配置.
+用法: 在仓库根目录运行 python -m pytest tests
+utils.tools在导入时读取LOG_PATH、DATA_PATH、TEMP_PATH、RESOURCE_PATH, 未设置时使用临时目录
+"""
+import os
+import tempfile
+
+_temp = tempfile.mkdtemp(prefix="blive-tests-")
+for _name in ("LOG_PATH", "DATA_PATH", "TEMP_PATH", "RESOURCE_PATH"):
+    os.environ.setdefault(_name, _temp)
@@ -1,18 +1,32 @@
+"""
+开播/下播邮件提醒, 按环境变量LIVE_ROOM_MID中的主播UID批量轮询直播状态.
+用法: 在仓库根目录运行 python -m tests.live_rooms (也可以直接运行 python tests/live_rooms.py);
+LOG_PATH、DATA_PATH、TEMP_PATH、RESOURCE_PATH 未设置时使用 TEMP_PATH 或当前目录
+"""
 import ast
 import asyncio
 import os
 import smtplib
 import ssl
+import sys
 from email.message import EmailMessage
 from pathlib import Path
-from typing import Any
 
 import aiohttp
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 
 load_dotenv()
-scheduler = AsyncIOScheduler()
+
+temp_path_str = os.getenv("TEMP_PATH", None)
+TEMP_PATH = Path(temp_path_str) if temp_path_str else Path.cwd()
+# utils.tools在导入时读取这些路径
+for name in ("LOG_PATH", "DATA_PATH", "TEMP_PATH", "RESOURCE_PATH"):
+    os.environ.setdefault(name, str(TEMP_PATH))
+if not __package__:
+    # 直接以脚本运行时, 把仓库根目录加入模块搜索路径
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from live_streams.status import LiveStatusEvent, LiveStatusPoller
 
 
 def convert_str_to_list(str_list) -> list[int] | None:
@@ -25,15 +39,9 @@ def convert_str_to_list(str_list) -> list[int] | None:
         return None
 
 
-temp_path_str = os.getenv("TEMP_PATH", None)
-TEMP_PATH = Path(temp_path_str) if temp_path_str else Path.cwd()
-
-status_url = 'https://api.live.bilibili.com/room/v1/Room/getRoomInfoOld?mid={}'
-user_card = 'https://api.bilibili.com/x/web-interface/card?mid={}'
 uid = convert_str_to_list(os.getenv('LIVE_ROOM_MID'))
 if not uid:
     raise RuntimeError('没有指定UID')
-status_urls = {status_url.format(x) for x in uid}
 
 headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
@@ -68,40 +76,30 @@ def qqyx(subject: str, message: str) -> None:
         print(f"发送邮件时发生未知错误：{e}")
 
 
-async def fetch(session, url) -> dict[str, Any]:
-    async with session.get(url) as response:
-        return await response.json()
-
-
-@scheduler.scheduled_job('interval', seconds=6, misfire_grace_time=10, max_instances=2)
-async def get_live_status():
-    print("-" * 20)
-    try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            results = await asyncio.gather(*(fetch(session, url) for url in status_urls), return_exceptions=True)
-            for mid, info in zip(uid, results):
-                if isinstance(info, dict):
-                    path = TEMP_PATH / str(mid)
-                    user_name = (await fetch(session, user_card.format(mid)))["data"]["card"]["name"]
-                    print(f"[{user_name}]{'已开播' if path.exists() else '未开播'}")
-                    if info['data']['liveStatus'] and not path.exists():
-                        qqyx("开播提醒", f"[{user_name}]已开播")
-                        path.touch()
-                    if not info['data']['liveStatus'] and path.exists():
-                        qqyx('下播提醒', f'[{user_name}]已下播')
-                        path.unlink(missing_ok=True)
-                else:
-                    print(f"[{mid}]获取状态出错 e:{info}")
-    except asyncio.CancelledError:
-        pass
+async def on_live_status(event: LiveStatusEvent):
+    path = TEMP_PATH / str(event.uid)
+    print(f"[{event.uname}]{'已开播' if event.live else '已下播'}")
+    if event.live:
+        await asyncio.to_thread(qqyx, "开播提醒", f"[{event.uname}]已开播")
+        path.touch()
+    else:
+        await asyncio.to_thread(qqyx, '下播提醒', f'[{event.uname}]已下播')
+        path.unlink(missing_ok=True)
 
 
 async def main():
-    try:
-        scheduler.start()
-        await asyncio.Event().wait()
-    except asyncio.CancelledError:
-        pass
+    async with aiohttp.ClientSession(headers=headers) as session:
+        poller = LiveStatusPoller(session)
+        poller.subscribe(on_live_status)
+        for mid in uid:
+            # 标记文件记录上次运行时的开播状态, 状态未变化时不重复提醒
+            poller.add_user(mid, live=(TEMP_PATH / str(mid)).exists())
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await poller.close()
 
 
 if __name__ == '__main__':
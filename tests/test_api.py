@@ -0,0 +1,239 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from typing import Optional
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict
+from yarl import URL
+
+from utils import api
+from utils.api import BiliApi, Endpoint, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, status: int, body, headers: Optional[dict] = None):
+        self.status = status
+        self._body = body
+        self.headers = CIMultiDict(headers or {})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+    async def json(self, content_type=None):
+        return self._body
+
+    async def text(self):
+        return self._body if isinstance(self._body, str) else json.dumps(self._body)
+
+
+class EmptyCookieJar:
+    def filter_cookies(self, url: URL) -> SimpleCookie:
+        return SimpleCookie()
+
+
+class FakeSession:
+    """按顺序返回预设的响应, 记录每次请求"""
+
+    def __init__(self, *responses, cookie: str = "", delay: float = 0):
+        self.responses = list(responses)
+        self.headers = CIMultiDict({"Cookie": cookie} if cookie else {})
+        self.cookie_jar = EmptyCookieJar()
+        self.delay = delay
+        self.calls: list[tuple[str, str, object]] = []
+
+    def request(self, method: str, url: str, params=None, data=None):
+        self.calls.append((method, url, params))
+        session = self
+
+        class Context:
+            async def __aenter__(self):
+                if session.delay:
+                    await asyncio.sleep(session.delay)
+                response = session.responses.pop(0) if len(session.responses) > 1 else session.responses[0]
+                if isinstance(response, Exception):
+                    raise response
+                if not isinstance(response, FakeResponse):
+                    response = FakeResponse(200, response)
+                return response
+
+            async def __aexit__(self, *exc):
+                return None
+
+        return Context()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(BiliApi, "stats", {})
+    monkeypatch.setattr(BiliApi, "_buckets", {})
+    monkeypatch.setattr(BiliApi, "_cache", {})
+    monkeypatch.setattr(BiliApi, "_inflight", {})
+    monkeypatch.setattr(BiliApi, "backoff_base", 0.01)
+    monkeypatch.setattr(api.random, "uniform", lambda low, high: high)
+    endpoints = dict(BiliApi.endpoints)
+    endpoints["cached"] = Endpoint("{api_url}/cached", rate=1000, burst=1000, ttl=60)
+    endpoints["private"] = Endpoint("{api_url}/private", rate=1000, burst=1000, ttl=60, per_cookie=True)
+    endpoints["plain"] = Endpoint("{api_url}/plain", rate=1000, burst=1000)
+    endpoints["post"] = Endpoint("{api_url}/post", method="POST", rate=1000, burst=1000, idempotent=False)
+    monkeypatch.setattr(BiliApi, "endpoints", endpoints)
+
+
+def test_token_bucket(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(api.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=2)
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1.0]
+    now[0] += 2
+    assert bucket.reserve() == 0
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3.5)
+
+
+def test_concurrent_identical_gets_collapse():
+    session = FakeSession({"code": 0, "data": 1}, delay=0.02)
+
+    async def main():
+        client = BiliApi(session)
+        results = await asyncio.gather(*(client.request("cached", {"a": 1}) for _ in range(10)))
+        assert all(result == {"code": 0, "data": 1} for result in results)
+        # 之后命中缓存
+        await client.request("cached", {"a": 1})
+
+    asyncio.run(main())
+    assert len(session.calls) == 1
+    assert BiliApi.stats["cached"].cache_hits == 10
+
+
+def test_cache_key_ignores_signature_and_param_order():
+    session = FakeSession({"code": 0})
+
+    async def main():
+        client = BiliApi(session)
+        await client.request("cached", {"a": 1, "b": 2, "wts": 1, "w_rid": "x"})
+        await client.request("cached", [("b", 2), ("a", "1"), ("wts", 2), ("w_rid", "y")])
+        await client.request("cached", {"a": 2, "b": 2})
+        await client.request("cached", {"a": 1, "b": 2}, fresh=True)
+
+    asyncio.run(main())
+    assert len(session.calls) == 3
+
+
+def test_uncacheable_codes_are_not_cached():
+    session = FakeSession({"code": -404}, {"code": 0})
+
+    async def main():
+        client = BiliApi(session)
+        assert (await client.request("cached"))["code"] == -404
+        assert (await client.request("cached"))["code"] == 0
+        assert (await client.request("cached"))["code"] == 0
+
+    asyncio.run(main())
+    assert len(session.calls) == 2
+
+
+def test_per_cookie_cache_keys():
+    alice = FakeSession({"code": 0, "data": "alice"}, cookie="SESSDATA=alice")
+    bob = FakeSession({"code": 0, "data": "bob"}, cookie="SESSDATA=bob")
+
+    async def main():
+        assert (await BiliApi(alice).request("private"))["data"] == "alice"
+        assert (await BiliApi(bob).request("private"))["data"] == "bob"
+        assert (await BiliApi(alice).request("private"))["data"] == "alice"
+        # 不依赖登录状态的接口跨会话共享
+        await BiliApi(alice).request("cached")
+        await BiliApi(bob).request("cached")
+
+    asyncio.run(main())
+    assert len(alice.calls) == 2
+    assert len(bob.calls) == 1
+
+
+def test_per_cookie_includes_cookie_jar():
+    first, second = FakeSession({"code": 0, "data": 1}), FakeSession({"code": 0, "data": 2})
+
+    async def main():
+        for session, value in ((first, "a"), (second, "b")):
+            session.cookie_jar = aiohttp.CookieJar()
+            session.cookie_jar.update_cookies({"SESSDATA": value}, URL(BiliApi.api_url))
+        assert (await BiliApi(first).request("private"))["data"] == 1
+        assert (await BiliApi(second).request("private"))["data"] == 2
+
+    asyncio.run(main())
+
+
+def test_retry_on_reject_status_then_success():
+    session = FakeSession(FakeResponse(412, None), FakeResponse(200, {"code": -412}), {"code": 0})
+
+    async def main():
+        return await BiliApi(session).request("plain")
+
+    assert asyncio.run(main()) == {"code": 0}
+    stats = BiliApi.stats["plain"]
+    assert (stats.requests, stats.retries) == (3, 2)
+    assert stats.responses == {"412": 1, "200": 2}
+
+
+def test_retries_exhausted_raise(monkeypatch):
+    monkeypatch.setattr(BiliApi, "max_retries", 2)
+    session = FakeSession(FakeResponse(503, None))
+
+    async def main():
+        await BiliApi(session).request("plain")
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(main())
+    assert len(session.calls) == 3
+
+
+def test_non_idempotent_not_retried_on_connection_error():
+    session = FakeSession(aiohttp.ClientConnectionError("reset"), {"code": 0})
+
+    async def main():
+        await BiliApi(session).request("post", data={"msg": "hi"})
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(main())
+    assert len(session.calls) == 1
+
+
+def test_idempotent_retried_on_connection_error():
+    session = FakeSession(aiohttp.ClientConnectionError("reset"), {"code": 0})
+
+    async def main():
+        return await BiliApi(session).request("plain")
+
+    assert asyncio.run(main()) == {"code": 0}
+    assert len(session.calls) == 2
+
+
+def test_failed_request_is_not_cached_and_shared_failure_propagates():
+    session = FakeSession(aiohttp.ClientConnectionError("reset"), delay=0.01)
+
+    async def main():
+        client = BiliApi(session)
+        results = await asyncio.gather(*(client.request("cached") for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, aiohttp.ClientConnectionError) for result in results)
+        assert not BiliApi._cache and not BiliApi._inflight
+
+    asyncio.run(main())
+    # 合并的请求只发送一次, 按max_retries重试
+    assert len(session.calls) == BiliApi.max_retries + 1
+
+
+def test_path_parameters_and_text():
+    session = FakeSession(FakeResponse(200, "<html></html>"))
+
+    async def main():
+        return await BiliApi(session).request("space_dynamic", path={"mid": 42})
+
+    assert asyncio.run(main()) == "<html></html>"
+    assert session.calls[0][1] == f"{BiliApi.space_url}/42/dynamic"
@@ -0,0 +1,92 @@
+import json
+import struct
+import zlib
+
+import brotli
+import pytest
+
+from live_streams.codec import HEADER_SIZE, iter_packets, pack_packet
+from live_streams.enum import Operation, ProtoVer
+from live_streams.exception import FrameError
+
+_COMPRESS = {ProtoVer.DEFLATE: zlib.compress, ProtoVer.BROTLI: brotli.compress}
+_DECOMPRESS = {ProtoVer.DEFLATE: zlib.decompress, ProtoVer.BROTLI: brotli.decompress}
+
+
+def message(cmd: str, i: int) -> bytes:
+    return pack_packet(Operation.SEND_MSG_REPLY, json.dumps({"cmd": cmd, "i": i}).encode(), ProtoVer.NORMAL)
+
+
+def compressed(ver: int, *packets: bytes) -> bytes:
+    return pack_packet(Operation.SEND_MSG_REPLY, _COMPRESS[ver](b"".join(packets)), ver)
+
+
+def decompress(ver: int, body: memoryview) -> bytes:
+    return _DECOMPRESS[ver](body)
+
+
+def bodies(data: bytes, **kwargs) -> list[tuple[int, int, dict]]:
+    return [(operation, ver, json.loads(bytes(body))) for operation, ver, body in iter_packets(data, **kwargs)]
+
+
+def test_pack_roundtrip():
+    frame = pack_packet(Operation.HEARTBEAT_REPLY, struct.pack(">I", 42), seq_id=7)
+    assert len(frame) == HEADER_SIZE + 4
+    [(operation, ver, body)] = iter_packets(frame)
+    assert (operation, ver, bytes(body)) == (Operation.HEARTBEAT_REPLY, ProtoVer.HEARTBEAT, struct.pack(">I", 42))
+
+
+def test_bodies_are_views_of_the_frame():
+    frame = message("DANMU_MSG", 0)
+    [(_, _, body)] = iter_packets(frame)
+    assert isinstance(body, memoryview)
+    assert body.obj is frame
+
+
+@pytest.mark.parametrize("ver", [ProtoVer.DEFLATE, ProtoVer.BROTLI])
+def test_compressed_without_decompress_is_yielded_as_is(ver):
+    frame = compressed(ver, message("A", 0), message("B", 1))
+    [(operation, packet_ver, body)] = iter_packets(frame)
+    assert (operation, packet_ver) == (Operation.SEND_MSG_REPLY, ver)
+    assert bodies(_DECOMPRESS[ver](body)) == [
+        (Operation.SEND_MSG_REPLY, ProtoVer.NORMAL, {"cmd": "A", "i": 0}),
+        (Operation.SEND_MSG_REPLY, ProtoVer.NORMAL, {"cmd": "B", "i": 1}),
+    ]
+
+
+def test_nested_brotli_and_zlib_expand_in_order():
+    # brotli包内嵌套zlib包, 前后各有未压缩的包
+    inner = compressed(ProtoVer.DEFLATE, message("C", 2), message("D", 3))
+    outer = compressed(ProtoVer.BROTLI, message("B", 1), inner, message("E", 4))
+    frame = message("A", 0) + outer + message("F", 5)
+    result = bodies(frame, decompress=decompress)
+    assert [body["cmd"] for _, _, body in result] == ["A", "B", "C", "D", "E", "F"]
+    assert {ver for _, ver, _ in result} == {ProtoVer.NORMAL}
+
+
+def test_only_notifications_are_decompressed():
+    # 非通知包即使协议版本为压缩也原样产出
+    frame = pack_packet(Operation.AUTH_REPLY, b'{"code":0}', ProtoVer.BROTLI)
+    [(operation, ver, body)] = iter_packets(frame, decompress=decompress)
+    assert (operation, ver, bytes(body)) == (Operation.AUTH_REPLY, ProtoVer.BROTLI, b'{"code":0}')
+
+
+def test_empty_frame():
+    assert list(iter_packets(b"")) == []
+
+
+@pytest.mark.parametrize("header", [
+    (HEADER_SIZE - 1, HEADER_SIZE),  # 封包长度小于头部长度
+    (HEADER_SIZE, HEADER_SIZE - 1),  # 头部长度小于16
+    (HEADER_SIZE + 100, HEADER_SIZE),  # 封包长度超出帧
+])
+def test_invalid_length_raises(header):
+    pack_len, header_size = header
+    frame = struct.pack(">I2H2I", pack_len, header_size, ProtoVer.NORMAL, Operation.SEND_MSG_REPLY, 1) + b"{}"
+    with pytest.raises(FrameError):
+        list(iter_packets(frame))
+
+
+def test_truncated_header_raises():
+    with pytest.raises(struct.error):
+        list(iter_packets(message("A", 0)[:HEADER_SIZE - 1]))
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from live_streams.connection import Backoff
+
+
+@pytest.fixture
+def upper_bound(monkeypatch):
+    """random.uniform总是取上限, 得到确定的退避序列"""
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+
+
+def test_exponential_sequence_is_capped(upper_bound):
+    backoff = Backoff(base=1.0, maximum=10.0)
+    assert [backoff.next_delay() for _ in range(6)] == [1, 2, 4, 8, 10, 10]
+    assert backoff.attempt == 6
+
+
+def test_reset_restarts_sequence(upper_bound):
+    backoff = Backoff(base=0.5, maximum=60.0)
+    assert [backoff.next_delay() for _ in range(3)] == [0.5, 1, 2]
+    backoff.reset()
+    assert backoff.attempt == 0
+    assert backoff.next_delay() == 0.5
+
+
+def test_delay_is_jittered_within_bounds():
+    random.seed(0)
+    backoff = Backoff(base=1.0, maximum=8.0)
+    for attempt in range(20):
+        delay = backoff.next_delay()
+        assert 0 <= delay <= min(8.0, 2 ** attempt)
+
+
+def test_long_outage_does_not_overflow(upper_bound):
+    backoff = Backoff(base=1.0, maximum=60.0)
+    backoff.attempt = 2000
+    assert backoff.next_delay() == 60.0
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import zlib
+
+import brotli
+import pytest
+
+from live_streams.decompress import Decompressor
+from live_streams.enum import ProtoVer
+
+
+@pytest.fixture(autouse=True)
+def clean_executors():
+    yield
+    Decompressor._owners.clear()
+    Decompressor.shutdown()
+
+
+@pytest.mark.parametrize("ver, compress", [(ProtoVer.DEFLATE, zlib.compress), (ProtoVer.BROTLI, brotli.compress)])
+def test_inline_and_offloaded(ver, compress):
+    small, large = b'{"cmd":"DANMU_MSG"}', os.urandom(8192)
+
+    async def main():
+        decompressor = Decompressor(inline_threshold=256)
+        assert await decompressor.decompress(ver, memoryview(compress(small))) == small
+        assert await decompressor.decompress(ver, memoryview(compress(large))) == large
+        assert (decompressor.stats.inline_calls, decompressor.stats.offloaded_calls) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_executor_shuts_down_with_last_owner():
+    data = zlib.compress(os.urandom(4096))
+
+    async def main():
+        first, second = object(), object()
+        Decompressor.register(first)
+        Decompressor.register(second)
+        await Decompressor(inline_threshold=0).decompress(ProtoVer.DEFLATE, data)
+        executor = Decompressor._executors[False]
+        Decompressor.unregister(first)
+        assert Decompressor._executors == {False: executor}
+        Decompressor.unregister(second)
+        assert not Decompressor._executors
+        # 再次使用时重新创建
+        await Decompressor(inline_threshold=0).decompress(ProtoVer.DEFLATE, data)
+        assert Decompressor._executors[False] is not executor
+
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from live_streams.filters import F, compile_where
+from live_streams.handler import Handler
+from live_streams.models import DanmakuMessage, GiftMessage, InteractWordV2Message
+
+
+def danmaku(msg: str, uid: int = 1, medal: list = (), guard: int = 0) -> dict:
+    return {
+        "cmd": "DANMU_MSG:4:0:2:2:2:0",
+        "info": [
+            [0, 1, 25, 16777215, 0, 0, 0, "", 0, 0, 0, "", 0, "{}", "{}", {}],
+            msg,
+            [uid, f"user{uid}", 0, 0, 0, 10000, 1, ""],
+            list(medal),
+            [10, 0, 0, ">50000"],
+            ["", ""],
+            0,
+            guard,
+        ],
+    }
+
+
+def gift(num: int, coin: str = "gold", name: str = "辣条") -> dict:
+    return {"cmd": "SEND_GIFT", "data": {"giftName": name, "num": num, "uid": 2, "coin_type": coin}}
+
+
+@pytest.mark.parametrize("where, message, expected", [
+    (F.msg == "hi", danmaku("hi"), True),
+    (F.msg != "hi", danmaku("hi"), False),
+    (F.msg.startswith("!", "/"), danmaku("/roll"), True),
+    (F.msg.contains("抽奖", "红包"), danmaku("有红包吗"), True),
+    (F.msg.contains("抽奖"), danmaku("hi"), False),
+    (F.uid.in_([1, 2]), danmaku("hi", uid=2), True),
+    (F.uid.in_([1, 2]), danmaku("hi", uid=3), False),
+    (F.privilege_type.between(1, 3), danmaku("hi", guard=3), True),
+    (F.privilege_type.between(1, 3), danmaku("hi", guard=0), False),
+    (F.uid > 1, danmaku("hi", uid=2), True),
+    (F.uid >= 2, danmaku("hi", uid=1), False),
+    (F.uid < 2, danmaku("hi", uid=1), True),
+    (F.uid <= 0, danmaku("hi", uid=1), False),
+])
+def test_compare(where, message, expected):
+    assert compile_where(where, DanmakuMessage)(message) is expected
+
+
+def test_combinators():
+    command = F.msg.startswith("!")
+    vip = F.privilege_type.between(1, 3)
+    assert compile_where(command & vip, DanmakuMessage)(danmaku("!a", guard=1))
+    assert not compile_where(command & vip, DanmakuMessage)(danmaku("!a"))
+    assert compile_where(command | vip, DanmakuMessage)(danmaku("a", guard=1))
+    assert not compile_where(command | vip, DanmakuMessage)(danmaku("a"))
+    assert compile_where(~command, DanmakuMessage)(danmaku("a"))
+
+
+def test_list_is_and():
+    predicate = compile_where([F.num >= 10, F.coin_type == "gold"], GiftMessage)
+    assert predicate(gift(10))
+    assert not predicate(gift(9))
+    assert not predicate(gift(10, "silver"))
+
+
+def test_missing_field_uses_raw_default():
+    # 没有粉丝勋章时info[3]为空列表, 按RawField的default取值
+    assert compile_where(F.medal_level == 0, DanmakuMessage)(danmaku("hi"))
+    assert compile_where(F.medal_level == 21, DanmakuMessage)(danmaku("hi", medal=[21, "牌子"]))
+    assert not compile_where(F.medal_level == 0, DanmakuMessage)(danmaku("hi", medal=[21, "牌子"]))
+
+
+def test_missing_field_without_default_fails():
+    assert not compile_where(F.num >= 1, GiftMessage)({"cmd": "SEND_GIFT", "data": {}})
+
+
+def test_type_mismatch_fails():
+    assert not compile_where(F.msg > 1, DanmakuMessage)(danmaku("hi"))
+    assert not compile_where(F.msg.startswith("!"), DanmakuMessage)(danmaku(None))
+
+
+@pytest.mark.parametrize("model_type, where", [
+    (DanmakuMessage, F.not_a_field == 1),
+    (DanmakuMessage, F.emoticon_options_dict == {}),
+    (InteractWordV2Message, F.uid == 1),
+])
+def test_unsupported_field_raises_at_compile(model_type, where):
+    with pytest.raises(ValueError):
+        compile_where(where, model_type)
+
+
+def test_append_func_compiles_at_registration():
+    with pytest.raises(ValueError):
+        Handler().append_func(InteractWordV2Message, where=F.uid == 1)
+
+
+def test_handler_dispatches_only_matching_callbacks():
+    handler = Handler()
+    received: dict[str, list[str]] = {"all": [], "commands": [], "vip": []}
+
+    @handler.append_func(DanmakuMessage)
+    def _(model):
+        received["all"].append(model.msg)
+
+    @handler.append_func(DanmakuMessage, where=F.msg.startswith("!"))
+    def _(model):
+        received["commands"].append(model.msg)
+
+    @handler.append_func(DanmakuMessage, where=[F.msg.startswith("!"), F.privilege_type.between(1, 3)])
+    def _(model):
+        received["vip"].append(model.msg)
+
+    async def main():
+        for message in (danmaku("a"), danmaku("!b"), danmaku("!c", guard=3)):
+            await handler.handle(1, message)
+
+    asyncio.run(main())
+    assert received == {"all": ["a", "!b", "!c"], "commands": ["!b", "!c"], "vip": ["!c"]}
+
+
+def test_handler_skips_model_build_when_nothing_matches(monkeypatch):
+    handler = Handler()
+    built = []
+
+    def from_command(raw_msg):
+        built.append(raw_msg)
+        return DanmakuMessage(raw_msg)
+
+    monkeypatch.setattr(DanmakuMessage, "from_command", from_command)
+    handler.append_func(DanmakuMessage, where=F.msg.startswith("!"))(lambda model: None)
+
+    async def main():
+        await handler.handle(1, danmaku("a"))
+        await handler.handle(1, danmaku("!b"))
+
+    asyncio.run(main())
+    assert [message["info"][1] for message in built] == ["!b"]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from live_streams.handler import Handler
+from live_streams.models import DanmakuMessage, GiftMessage
+
+
+def danmaku(msg: str) -> dict:
+    return {"cmd": "DANMU_MSG", "info": [[0] * 16, msg, [1, "user", 0, 0, 0, 10000, 1, ""], [], [10, 0, 0, 0]]}
+
+
+def handle(handler: Handler, *messages: tuple[int, dict]):
+    async def main():
+        for room_id, message in messages:
+            await handler.handle(room_id, message)
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def default_handler(monkeypatch):
+    """每个用例使用新的默认实例"""
+    monkeypatch.setattr(Handler, "_default", None)
+    return Handler.default()
+
+
+def test_room_scoped_and_global_callbacks():
+    handler = Handler()
+    received = []
+    handler.append_func(DanmakuMessage)(lambda model: received.append(("all", model.room_id, model.msg)))
+    handler.append_func(DanmakuMessage, room_id=1)(lambda model: received.append(("room1", model.room_id, model.msg)))
+    handle(handler, (1, danmaku("a")), (2, danmaku("b")))
+    assert received == [("all", 1, "a"), ("room1", 1, "a"), ("all", 2, "b")]
+
+
+def test_room_id_iterable():
+    handler = Handler()
+    received = []
+    handler.append_func(DanmakuMessage, room_id=[1, 2])(lambda model: received.append(model.room_id))
+    handle(handler, (1, danmaku("a")), (2, danmaku("b")), (3, danmaku("c")))
+    assert received == [1, 2]
+
+
+def test_is_subscribed():
+    handler = Handler()
+    handler.append_func(GiftMessage)(lambda model: None)
+    handler.append_func(DanmakuMessage, room_id=1)(lambda model: None)
+    assert handler.is_subscribed("SEND_GIFT")
+    assert handler.is_subscribed("SEND_GIFT", 2)
+    assert handler.is_subscribed("DANMU_MSG", 1)
+    assert not handler.is_subscribed("DANMU_MSG", 2)
+    assert not handler.is_subscribed("DANMU_MSG")
+    assert not handler.is_subscribed("GUARD_BUY", 1)
+
+
+def test_registration_invalidates_resolved_callbacks():
+    handler = Handler()
+    received = []
+    handler.append_func(DanmakuMessage)(lambda model: received.append("all"))
+    handle(handler, (1, danmaku("a")))
+    handler.append_func(DanmakuMessage, room_id=1)(lambda model: received.append("room1"))
+    handle(handler, (1, danmaku("b")))
+    assert received == ["all", "all", "room1"]
+
+
+def test_remove_room():
+    handler = Handler()
+    received = []
+    handler.append_func(DanmakuMessage)(lambda model: received.append("all"))
+    handler.append_func(DanmakuMessage, GiftMessage, room_id=1)(lambda model: received.append("room1"))
+    handle(handler, (1, danmaku("a")))
+    handler.remove_room(1)
+    handle(handler, (1, danmaku("b")))
+    assert received == ["all", "room1", "all"]
+    # 所有直播间通用的回调函数不受影响
+    assert handler.is_subscribed("DANMU_MSG", 1)
+    assert not handler.is_subscribed("SEND_GIFT", 1)
+    assert handler.get_callbacks(1, GiftMessage) is None
+
+
+def test_instances_are_isolated(default_handler):
+    first, second = Handler(), Handler()
+    received = []
+    first.append_func(DanmakuMessage)(lambda model: received.append("first"))
+    handle(second, (1, danmaku("a")))
+    handle(default_handler, (1, danmaku("a")))
+    assert received == []
+    assert not second.is_subscribed("DANMU_MSG")
+
+
+def test_class_calls_use_default_instance(default_handler):
+    received = []
+    Handler.append_func(DanmakuMessage, room_id=1)(lambda model: received.append(model.msg))
+    assert default_handler.is_subscribed("DANMU_MSG", 1)
+    handle(default_handler, (1, danmaku("a")))
+    Handler.remove_room(1)
+    assert not default_handler.is_subscribed("DANMU_MSG", 1)
+    assert received == ["a"]
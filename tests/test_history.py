@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from live_streams.history import HistoryWriter, SegmentWriter
+
+
+def read_history(directory: Path) -> list[dict]:
+    messages = []
+    for file in sorted(directory.glob("*.jsonl"), key=HistoryWriter.segment_key):
+        with open(file, "rb") as f:
+            messages.extend(json.loads(line) for line in f)
+    return messages
+
+
+@pytest.fixture(autouse=True)
+def no_writers_left():
+    yield
+    assert not SegmentWriter._writers
+    assert SegmentWriter._flusher is None
+
+
+def test_close_flushes_buffer(tmp_path):
+    async def main():
+        writer = HistoryWriter(1, tmp_path, buffer_size=1000)
+        for i in range(10):
+            writer.append({"cmd": "DANMU_MSG", "i": i})
+        assert writer.written_count == 0
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    messages = read_history(tmp_path)
+    assert [message["i"] for message in messages] == list(range(10))
+    assert all("add_time" in message for message in messages)
+    assert writer.written_count == 10
+    assert writer.segment_path.name.startswith("1_") and writer.segment_path.suffix == ".jsonl"
+
+
+def test_background_flush(tmp_path):
+    async def main():
+        writer = HistoryWriter(1, tmp_path, buffer_size=5)
+        for i in range(5):
+            writer.append({"i": i})
+        # 达到buffer_size时唤醒后台刷新
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if writer.written_count == 5:
+                break
+        assert writer.written_count == 5
+        await writer.close()
+
+    asyncio.run(main())
+
+
+def test_rotation_by_size(tmp_path):
+    async def main():
+        writer = HistoryWriter(1, tmp_path, segment_size=200)
+        for i in range(50):
+            writer.append({"i": i, "text": "x" * 20})
+            if i % 5 == 4:
+                await writer.flush()
+        await writer.close()
+
+    asyncio.run(main())
+    segments = sorted(tmp_path.glob("*.jsonl"), key=HistoryWriter.segment_key)
+    assert len(segments) == 10
+    assert [message["i"] for message in read_history(tmp_path)] == list(range(50))
+
+
+def test_rotation_by_interval(tmp_path, monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr("live_streams.history.time.time", lambda: now[0])
+
+    async def main():
+        writer = SegmentWriter(1, tmp_path, segment_interval=60)
+        writer._push(b"a")
+        await writer.flush()
+        first = writer.segment_path
+        now[0] += 30
+        writer._push(b"b")
+        await writer.flush()
+        assert writer.segment_path == first
+        now[0] += 31
+        writer._push(b"c")
+        await writer.flush()
+        assert writer.segment_path != first
+        await writer.close()
+
+    asyncio.run(main())
+    assert sorted(path.read_bytes() for path in tmp_path.iterdir()) == [b"ab", b"c"]
+
+
+def test_segment_key_orders_same_second_suffixes():
+    names = ["1_20250101_000000_10.jsonl", "1_20250101_000000_2.jsonl", "1_20250101_000000.jsonl",
+             "1_20250101_000001.jsonl", "1_20250101_000000_1.jsonl"]
+    assert sorted(names, key=lambda name: HistoryWriter.segment_key(Path(name))) == [
+        "1_20250101_000000.jsonl", "1_20250101_000000_1.jsonl", "1_20250101_000000_2.jsonl",
+        "1_20250101_000000_10.jsonl", "1_20250101_000001.jsonl"]
+
+
+def test_buffer_cap_drops_oldest(tmp_path):
+    gate = threading.Event()
+
+    async def main():
+        writer = SegmentWriter(1, tmp_path, buffer_size=10, max_buffered=100)
+        write_chunks = writer._write_chunks
+
+        def stalled(chunks):
+            gate.wait(5)
+            write_chunks(chunks)
+
+        writer._write_chunks = stalled
+        for i in range(20):
+            writer._push(b"%d\n" % i)
+        flushing = asyncio.create_task(writer.flush())
+        await asyncio.sleep(0.05)
+        # 写入卡住期间缓存最多保留max_buffered条
+        for i in range(20, 1000):
+            writer._push(b"%d\n" % i)
+        assert len(writer._buffer) == 100
+        assert writer.dropped_count == 880
+        gate.set()
+        await flushing
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    [segment] = tmp_path.iterdir()
+    values = [int(line) for line in segment.read_bytes().split()]
+    assert values == list(range(20)) + list(range(900, 1000))
+    assert writer.written_count == 120
+
+
+def test_write_error_drops_batch(tmp_path):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_text("")
+
+    async def main():
+        writer = SegmentWriter(1, blocker / "segments")
+        writer._push(b"a")
+        await writer.flush()
+        assert writer.written_count == 0
+        assert not writer._buffer
+        await writer.close()
+
+    asyncio.run(main())
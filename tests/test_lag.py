@@ -0,0 +1,59 @@
+import copy
+
+from benchmarks.samples import SAMPLE_MESSAGES
+from live_streams.lag import LagTracker
+from live_streams.models import DanmakuMessage, InteractWordV2Message
+
+INTERACT_WORD_V2_EMITTED = 1751955738
+"""示例INTERACT_WORD_V2消息data.pb中timestamp(字段7)的值, 2025-07-08"""
+
+
+def record(tracker: LagTracker, cmd: str, model, received: float, local: float = 0.01):
+    trace = tracker.trace(received, received + local / 2)
+    trace.dispatched = received + local / 2
+    tracker.record(trace, cmd, model, received + local)
+
+
+def danmaku(emitted_ms: int) -> DanmakuMessage:
+    message = copy.deepcopy(SAMPLE_MESSAGES["DANMU_MSG"])
+    message["info"][0][4] = emitted_ms
+    return DanmakuMessage.from_command(message)
+
+
+def test_interact_word_v2_timestamp_is_seconds():
+    model = InteractWordV2Message.from_command(SAMPLE_MESSAGES["INTERACT_WORD_V2"])
+    assert model.timestamp == INTERACT_WORD_V2_EMITTED
+
+
+def test_sample_interact_word_v2_through_record():
+    tracker = LagTracker()
+    model = InteractWordV2Message.from_command(SAMPLE_MESSAGES["INTERACT_WORD_V2"])
+    record(tracker, "INTERACT_WORD_V2", model, INTERACT_WORD_V2_EMITTED + 0.2)
+    histograms = tracker.stages["INTERACT_WORD_V2"]
+    assert histograms["network"].count == 1
+    assert histograms["total"].count == 1
+    assert tracker.rejected_count == 0
+    assert abs(tracker.clock_skew - 0.2) < 1e-6
+
+
+def test_entry_events_do_not_skew_other_cmds():
+    tracker = LagTracker()
+    now = INTERACT_WORD_V2_EMITTED + 0.2
+    record(tracker, "DANMU_MSG", danmaku(int((now - 0.1) * 1000)), now)
+    skew = tracker.clock_skew
+    record(tracker, "INTERACT_WORD_V2", InteractWordV2Message.from_command(SAMPLE_MESSAGES["INTERACT_WORD_V2"]), now)
+    assert abs(tracker.clock_skew - skew) < 0.2
+
+
+def test_implausible_timestamp_is_rejected():
+    tracker = LagTracker(max_offset=3600)
+    now = INTERACT_WORD_V2_EMITTED + 0.2
+    record(tracker, "DANMU_MSG", danmaku(int((now - 0.1) * 1000)), now)
+    skew = tracker.clock_skew
+    # 毫秒时间戳按秒解读之类的错误值, 相差远超max_offset
+    record(tracker, "DANMU_MSG", danmaku(1801973811854), now)
+    assert tracker.rejected_count == 1
+    assert tracker.clock_skew == skew
+    histograms = tracker.stages["DANMU_MSG"]
+    assert histograms["network"].count == 1
+    assert histograms["local"].count == 2
@@ -0,0 +1,71 @@
+import asyncio
+import socket
+
+import pytest
+
+from live_streams import metrics
+from live_streams.handler import Handler
+from live_streams.metrics import Histogram
+
+
+class Client:
+    room_id = 0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(autouse=True)
+def disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", None)
+
+
+def test_histogram_quantile():
+    histogram = Histogram((1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    assert histogram.quantile(1) == 4
+
+
+def test_enable_unregister_disables():
+    async def main():
+        port = free_port()
+        registry = metrics.enable()
+        assert metrics.enable() is registry
+        first, second = Client(), Client()
+        for client in (first, second):
+            registry.register(client)
+            await registry.serve("127.0.0.1", port)
+        await Handler().handle(1, {"cmd": "SOME_UNKNOWN_CMD"})
+        assert registry.cmd_packets["SOME_UNKNOWN_CMD"] == 1
+
+        await registry.unregister(first)
+        assert metrics.registry is registry
+        await registry.unregister(second)
+        assert metrics.registry is None
+        assert registry._runner is None
+        # 停用后热路径不再计数
+        await Handler().handle(1, {"cmd": "SOME_UNKNOWN_CMD"})
+        assert registry.cmd_packets["SOME_UNKNOWN_CMD"] == 1
+
+        again = metrics.enable()
+        assert again is not registry
+        assert not again.cmd_packets
+
+    asyncio.run(main())
+
+
+def test_render_prometheus_text():
+    registry = metrics.enable()
+    registry.cmd_packets["DANMU_MSG"] += 3
+    registry.parse_seconds.observe(0.001)
+    text = registry.render()
+    assert 'blive_packets_total{cmd="DANMU_MSG",known="true"} 3' in text
+    assert 'blive_stage_seconds_count{stage="parse"} 1' in text
+    assert text.endswith("\n")
@@ -0,0 +1,32 @@
+import pytest
+
+from live_streams.handler import peek_cmd
+
+
+@pytest.mark.parametrize("body, cmd", [
+    (b'{"cmd":"DANMU_MSG","info":[]}', "DANMU_MSG"),
+    (b'{"cmd":"DANMU_MSG:4:0:2:2:2:0","info":[]}', "DANMU_MSG"),
+    (b' \n{ "cmd" : "SEND_GIFT", "data": {}}', "SEND_GIFT"),
+    (b'{"cmd":""}', ""),
+    (memoryview(b'{"cmd":"INTERACT_WORD_V2","data":{}}'), "INTERACT_WORD_V2"),
+])
+def test_peek(body, cmd):
+    assert peek_cmd(body) == cmd
+
+
+@pytest.mark.parametrize("body", [
+    b'{"data":{},"cmd":"DANMU_MSG"}',  # cmd不是第一个键
+    b'["cmd","DANMU_MSG"]',
+    b'{"cmd":1}',
+    b'{"cmd":"DANMU\\u005fMSG"}',  # 含转义字符
+    b'{"cmd":"' + b"A" * 100 + b'"}',  # 超出预读长度
+    b'{"cmd"',
+    b"",
+])
+def test_fallback_to_none(body):
+    assert peek_cmd(body) is None
+
+
+def test_only_reads_the_head():
+    body = memoryview(b'{"cmd":"LIKE_INFO_V3_CLICK","data":' + b"x" * 10000)
+    assert peek_cmd(body) == "LIKE_INFO_V3_CLICK"
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+
+from live_streams.codec import pack_packet
+from live_streams.enum import Operation, OverflowPolicy, ProtoVer
+from live_streams.pipeline import (
+    CMD_PRIORITY,
+    PRIORITY_BATCH,
+    PRIORITY_CONTROL,
+    PRIORITY_DEFAULT,
+    FrameQueue,
+    frame_priority,
+)
+
+
+def message(cmd: str) -> bytes:
+    return pack_packet(Operation.SEND_MSG_REPLY, json.dumps({"cmd": cmd}).encode(), ProtoVer.NORMAL)
+
+
+def queued(queue: FrameQueue) -> list[bytes]:
+    """队列中的帧, 按入队顺序"""
+    return [frame for _, frame, _ in sorted(item for items in queue._levels.values() for item in items)]
+
+
+def test_frame_priority():
+    assert frame_priority(message("SUPER_CHAT_MESSAGE")) == CMD_PRIORITY["SUPER_CHAT_MESSAGE"]
+    assert frame_priority(message("DANMU_MSG:4:0:2:2:2:0")) == CMD_PRIORITY["DANMU_MSG"]
+    assert frame_priority(message("UNKNOWN")) == PRIORITY_DEFAULT
+    assert frame_priority(pack_packet(Operation.SEND_MSG_REPLY, b"\x00", ProtoVer.BROTLI)) == PRIORITY_BATCH
+    assert frame_priority(pack_packet(Operation.HEARTBEAT_REPLY, b"\x00\x00\x00\x01")) == PRIORITY_CONTROL
+    assert frame_priority(b"\x00") == PRIORITY_DEFAULT
+
+
+def test_invalid_maxsize():
+    with pytest.raises(ValueError):
+        FrameQueue(0)
+
+
+def test_fifo_and_received_time():
+    async def main():
+        queue = FrameQueue(4)
+        await queue.put(b"a", 1.0)
+        await queue.put(b"b", 2.0)
+        assert await queue.get_timed() == (b"a", 1.0)
+        assert await queue.get() == b"b"
+        assert (queue.stats.put_count, queue.stats.get_count, queue.stats.max_depth) == (2, 2, 2)
+
+    asyncio.run(main())
+
+
+def test_block_waits_for_get():
+    async def main():
+        queue = FrameQueue(2, OverflowPolicy.BLOCK)
+        await queue.put(b"a")
+        await queue.put(b"b")
+        put = asyncio.create_task(queue.put(b"c"))
+        await asyncio.sleep(0)
+        assert not put.done()
+        assert queue.stats.blocked_count == 1
+        assert await queue.get() == b"a"
+        await asyncio.wait_for(put, 1)
+        assert queued(queue) == [b"b", b"c"]
+        assert queue.stats.dropped_count == 0
+
+    asyncio.run(main())
+
+
+def test_drop_oldest():
+    async def main():
+        queue = FrameQueue(2, OverflowPolicy.DROP_OLDEST)
+        for frame in (b"a", b"b", b"c", b"d"):
+            await queue.put(frame)
+        assert queued(queue) == [b"c", b"d"]
+        assert queue.stats.dropped_count == 2
+        assert queue.stats.depth == 2
+
+    asyncio.run(main())
+
+
+def test_drop_by_priority():
+    async def main():
+        queue = FrameQueue(3, OverflowPolicy.DROP_BY_PRIORITY)
+        like, danmaku, gift = message("LIKE_INFO_V3_CLICK"), message("DANMU_MSG"), message("SEND_GIFT")
+        super_chat, interact = message("SUPER_CHAT_MESSAGE"), message("INTERACT_WORD")
+        for frame in (danmaku, like, gift):
+            await queue.put(frame)
+        # 丢弃队列中优先级最低的点赞
+        await queue.put(super_chat)
+        assert queued(queue) == [danmaku, gift, super_chat]
+        # 新帧优先级不高于队列中最低的帧时丢弃新帧
+        await queue.put(interact)
+        await queue.put(message("DANMU_MSG"))
+        assert queued(queue) == [danmaku, gift, super_chat]
+        assert queue.stats.dropped_count == 3
+
+    asyncio.run(main())
+
+
+def test_join_counts_dropped_frames_as_done():
+    async def main():
+        queue = FrameQueue(1, OverflowPolicy.DROP_OLDEST)
+        await queue.put(b"a")
+        await queue.put(b"b")
+        await queue.get()
+        queue.task_done()
+        await asyncio.wait_for(queue.join(), 1)
+
+    asyncio.run(main())
+
+
+def test_clear():
+    async def main():
+        queue = FrameQueue(4)
+        await queue.put(b"a")
+        await queue.put(b"b")
+        assert queue.clear() == 2
+        assert len(queue) == 0
+        await asyncio.wait_for(queue.join(), 1)
+
+    asyncio.run(main())
+
+
+def test_drop_by_priority_keeps_arrival_order():
+    async def main():
+        queue = FrameQueue(4, OverflowPolicy.DROP_BY_PRIORITY)
+        frames = [message(cmd) for cmd in ("DANMU_MSG", "SUPER_CHAT_MESSAGE", "LIKE_INFO_V3_CLICK", "SEND_GIFT")]
+        for frame in frames:
+            await queue.put(frame)
+        assert [await queue.get() for _ in range(4)] == frames
+
+    asyncio.run(main())
+
+
+def test_compressed_batches_drop_the_newest():
+    async def main():
+        queue = FrameQueue(2, OverflowPolicy.DROP_BY_PRIORITY)
+        batches = [pack_packet(Operation.SEND_MSG_REPLY, bytes([i]), ProtoVer.BROTLI) for i in range(3)]
+        for frame in batches:
+            await queue.put(frame)
+        assert queued(queue) == batches[:2]
+        # 控制帧优先级更高, 挤掉最早的批量帧
+        heartbeat = pack_packet(Operation.HEARTBEAT_REPLY, b"\x00\x00\x00\x01")
+        await queue.put(heartbeat)
+        assert queued(queue) == [batches[1], heartbeat]
+
+    asyncio.run(main())
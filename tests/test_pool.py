@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from live_streams import BLiveClient
+from live_streams.config import Config
+from live_streams.history import SegmentWriter
+from live_streams.pool import RoomPool
+from live_streams.profiler import LoopProfiler
+from utils import ConfigManage
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path):
+    config = Config(save_history_method=2, record_frames=True, loop_profiler=True, pool_admission_rate=1000)
+    monkeypatch.setattr(ConfigManage, "get_config", classmethod(lambda cls, config_type, names=None: config))
+    monkeypatch.setattr("live_streams.TEMP_PATH", tmp_path)
+    return config
+
+
+def test_failed_start_leaves_nothing_registered(config, monkeypatch):
+    async def get_uri_port(self, fresh=False):
+        return None
+
+    monkeypatch.setattr(BLiveClient, "get_uri_port", get_uri_port)
+
+    async def main():
+        pool = RoomPool()
+        assert await pool.add_room(1) is None
+        assert 1 not in pool
+        assert not SegmentWriter._writers
+        assert LoopProfiler._default is None or not LoopProfiler._default._owners
+        await pool.close()
+
+    asyncio.run(main())
+
+
+def test_start_error_after_address_stops_client(config, monkeypatch):
+    async def get_uri_port(self, fresh=False):
+        return ["wss://example.invalid/sub"], b"{}"
+
+    async def plan_hosts(self, uris):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(BLiveClient, "get_uri_port", get_uri_port)
+    monkeypatch.setattr(BLiveClient, "_plan_hosts", plan_hosts)
+
+    async def main():
+        pool = RoomPool()
+        assert await pool.add_room(1) is None
+        assert not SegmentWriter._writers
+        await pool.close()
+
+    asyncio.run(main())
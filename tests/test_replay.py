@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from live_streams.replay import FrameRecorder, FrameReplay, read_frames, recorded_room_id
+
+
+def record(directory, frames: list[bytes], start_ns: int = 1_700_000_000_000_000_000, step_ns: int = 1_000_000,
+           flush_every: int = 0, **kwargs) -> None:
+    async def main():
+        recorder = FrameRecorder(7, directory, **kwargs)
+        for i, frame in enumerate(frames, 1):
+            recorder.record(frame, start_ns + i * step_ns)
+            if flush_every and i % flush_every == 0:
+                await recorder.flush()
+        await recorder.close()
+
+    asyncio.run(main())
+
+
+def replay(source: FrameReplay, limit: int = None) -> list[bytes]:
+    async def main():
+        frames = []
+        async for frame in source:
+            frames.append(frame)
+            if limit is not None and len(frames) >= limit:
+                break
+        return frames
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def frames() -> list[bytes]:
+    return [os.urandom(1 + i % 200) for i in range(1000)]
+
+
+def test_round_trip(tmp_path, frames):
+    record(tmp_path, frames)
+    source = FrameReplay(tmp_path, speed=0, read_batch=64)
+    assert replay(source) == frames
+    assert source.stats.frames == len(frames)
+    assert source.stats.bytes == sum(map(len, frames))
+    assert recorded_room_id(tmp_path) == 7
+
+
+def test_round_trip_across_segments(tmp_path, frames):
+    record(tmp_path, frames, flush_every=50, segment_size=4096)
+    assert len(list(tmp_path.glob("*.blvr"))) > 1
+    assert replay(FrameReplay(tmp_path, speed=0)) == frames
+
+
+def test_truncated_last_record_is_skipped(tmp_path, frames):
+    record(tmp_path, frames[:10])
+    [segment] = tmp_path.glob("*.blvr")
+    with open(segment, "r+b") as f:
+        f.truncate(segment.stat().st_size - 1)
+    assert [frame for _, frame in read_frames(segment)] == frames[:9]
+
+
+def test_stop_early_closes_files(tmp_path, frames):
+    record(tmp_path, frames)
+    assert replay(FrameReplay(tmp_path, speed=0, read_batch=16), limit=20) == frames[:20]
+
+
+def test_paced_replay(tmp_path):
+    # 录制间隔10ms, 2倍速回放约45ms
+    record(tmp_path, [b"x"] * 10, step_ns=10_000_000)
+    start = time.perf_counter()
+    assert len(replay(FrameReplay(tmp_path, speed=2))) == 10
+    assert time.perf_counter() - start >= 0.04
+
+
+def test_invalid_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        FrameReplay(tmp_path, speed=-1)
+    with pytest.raises(ValueError):
+        FrameReplay(tmp_path, read_batch=0)
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from live_streams import status
+from live_streams.status import LiveStatusPoller, RoomStatus
+
+
+class FakeSession:
+    closed = False
+
+
+class FakeApi:
+    """记录批量请求, 按请求中的ID返回预设状态"""
+    calls: list[tuple[str, list[int]]] = []
+    live: set[int] = set()
+
+    def __init__(self, session):
+        self.session = session
+
+    async def request(self, name: str, params):
+        if name == "room_base_info":
+            ids = [int(v) for k, v in params if k == "room_ids"]
+            self.calls.append((name, ids))
+            return {"code": 0, "data": {"by_room_ids": {
+                str(i): {"room_id": i, "uid": i + 1000, "live_status": int(i in self.live)} for i in ids
+            }}}
+        ids = [int(v) for k, v in params if k == "uids[]"]
+        self.calls.append((name, ids))
+        return {"code": 0, "data": {
+            str(i): {"room_id": i + 1000, "uid": i, "live_status": int(i in self.live)} for i in ids
+        }}
+
+
+@pytest.fixture(autouse=True)
+def fake_api(monkeypatch):
+    monkeypatch.setattr(status, "BiliApi", FakeApi)
+    monkeypatch.setattr(FakeApi, "calls", [])
+    monkeypatch.setattr(FakeApi, "live", set())
+    return FakeApi
+
+
+def test_due_rooms_are_batched_per_kind(fake_api):
+    fake_api.live = {3, 102}
+    events = []
+
+    async def main():
+        poller = LiveStatusPoller(FakeSession(), batch_size=2)
+        poller.subscribe(events.append)
+        for room_id in range(1, 6):
+            poller.add_room(room_id)
+        for uid in range(101, 104):
+            poller.add_user(uid)
+        await asyncio.sleep(0.05)
+        await poller.close()
+        return poller
+
+    poller = asyncio.run(main())
+    rooms = [ids for name, ids in fake_api.calls if name == "room_base_info"]
+    uids = [ids for name, ids in fake_api.calls if name == "status_by_uids"]
+    assert sorted(map(sorted, rooms)) == [[1, 2], [3, 4], [5]]
+    assert sorted(map(sorted, uids)) == [[101, 102], [103]]
+    assert poller.requests == 5
+    assert sorted((e.room_id, e.live) for e in events) == [(3, True), (1102, True)]
+
+
+def test_pop_due_in_next_poll_order():
+    poller = LiveStatusPoller(batch_size=10, min_interval=5)
+    entries = [RoomStatus("room", key) for key in range(5)]
+    for entry in entries:
+        poller._entries[(entry.kind, entry.key)] = entry
+    for entry, when in zip(entries, (30, 10, 20, 100, 12)):
+        poller._schedule(entry, when)
+
+    assert poller._pop_due(5) == []
+    # 到期的直播间按时间排序, 未满一批时带上min_interval内即将到期的直播间
+    assert [e.key for e in poller._pop_due(20)] == [1, 4, 2]
+    # 没有到期的直播间时不提前轮询
+    assert poller._pop_due(26) == []
+    assert [e.key for e in poller._pop_due(30)] == [0]
+    assert [e.key for e in poller._pop_due(1000)] == [3]
+    assert not poller._heap
+
+
+def test_pop_due_fills_batch_and_skips_stale_entries():
+    poller = LiveStatusPoller(batch_size=2, min_interval=5)
+    entries = [RoomStatus("room", key) for key in range(4)]
+    for entry in entries:
+        poller._entries[(entry.kind, entry.key)] = entry
+        poller._schedule(entry, 10 + entry.key)
+    # 重新排期后旧的堆条目失效, 移除的直播间不再出堆
+    poller._schedule(entries[0], 50)
+    del poller._entries[("room", 1)]
+
+    # 2已到期, 批未满时提前带上3, 满批后不再提前
+    assert [e.key for e in poller._pop_due(12)] == [2, 3]
+    assert poller._heap == [(50, ("room", 0))]
+
+
+def test_interval_follows_status():
+    poller = LiveStatusPoller(live_interval=15, offline_interval=30, max_interval=300, idle_after=3600)
+    entry = RoomStatus("room", 1, changed_at=0)
+    assert poller.interval(entry, 10) == 30
+    assert poller.interval(entry, 3600 * 2 + 1) == 120
+    assert poller.interval(entry, 3600 * 10) == 300
+    entry.live = True
+    assert poller.interval(entry, 3600 * 10) == 15
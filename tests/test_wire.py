@@ -0,0 +1,106 @@
+import base64
+import operator
+
+import pytest
+
+import utils.InteractWordV2 as InteractWordV2
+from benchmarks.samples import SAMPLE_MESSAGES
+from live_streams.wire import _PREFIX_CHARS, FIELD_PATHS, InteractWordV2Decoder
+
+SAMPLE_PB = SAMPLE_MESSAGES["INTERACT_WORD_V2"]["data"]["pb"]
+_ATTRS = {"face": "user_info.base.face"}
+_UINT32_TRUNCATED = {"timestamp_millisecond"}
+"""生成的消息类型声明为uint32, 完整解码会截断, 不与decode_full比较"""
+
+FIELD_SETS = [
+    ("uid", "uname", "msg_type"),
+    ("uname",),
+    ("msg_type", "timestamp"),
+    ("roomid", "timestamp", "uid"),
+    ("face",),
+    ("uid", "face", "timestamp"),
+]
+
+
+def expected(pb: str, fields: tuple[str, ...]) -> dict:
+    message = InteractWordV2Decoder.decode_full(pb)
+    return {field: operator.attrgetter(_ATTRS.get(field, field))(message) for field in fields}
+
+
+def encode(message: InteractWordV2.INTERACT_WORD_V2, prefix: bytes = b"") -> str:
+    return base64.b64encode(prefix + message.SerializeToString()).decode()
+
+
+def check(pb: str):
+    for fields in FIELD_SETS:
+        decoded = InteractWordV2Decoder(fields).decode(pb)
+        compared = tuple(field for field in fields if field not in _UINT32_TRUNCATED)
+        assert {field: decoded[field] for field in compared} == expected(pb, compared), fields
+
+
+def test_sample_matches_decode_full():
+    check(SAMPLE_PB)
+
+
+def test_sample_values():
+    decoded = InteractWordV2Decoder(tuple(FIELD_PATHS)).decode(SAMPLE_PB)
+    assert decoded["uname"] == "千千家の空七"
+    assert decoded["timestamp"] == 1751955738
+    # 按varint读取完整的值, 不截断为uint32
+    assert decoded["timestamp_millisecond"] == 1801973811854
+    assert decoded["face"].startswith("https://")
+
+
+def test_custom_names():
+    decoded = InteractWordV2Decoder(("uid", "face"), ("user_id", "avatar")).decode(SAMPLE_PB)
+    assert set(decoded) == {"user_id", "avatar"}
+    assert decoded["user_id"] == expected(SAMPLE_PB, ("uid",))["uid"]
+
+
+def test_unknown_field_name():
+    with pytest.raises(ValueError):
+        InteractWordV2Decoder(("uid", "string1"))
+
+
+@pytest.mark.parametrize("length", [1, 40, 47, 48, 49, 200])
+def test_uname_crossing_prefix(length):
+    message = InteractWordV2.INTERACT_WORD_V2(uid=123456789, uname="名" * length, msg_type=2, timestamp=1751955738)
+    pb = encode(message)
+    check(pb)
+    assert InteractWordV2Decoder(("uname", "msg_type")).decode(pb) == {"uname": "名" * length, "msg_type": 2}
+    if length >= 40:
+        assert len(pb) > _PREFIX_CHARS
+
+
+def test_absent_default_fields():
+    # protobuf3不传输默认值
+    pb = encode(InteractWordV2.INTERACT_WORD_V2(msg_type=1))
+    check(pb)
+    assert InteractWordV2Decoder(("uid", "uname", "msg_type", "face")).decode(pb) == {
+        "uid": 0, "uname": "", "msg_type": 1, "face": ""}
+    assert InteractWordV2Decoder(("uid", "uname")).decode("") == {"uid": 0, "uname": ""}
+
+
+def test_long_length_delimited_field_before_requested():
+    # string1(字段4)位于msg_type(字段5)之前, 长度超过前缀
+    message = InteractWordV2.INTERACT_WORD_V2(uid=1, uname="a", string1="x" * 300, msg_type=3, roomid=7)
+    pb = encode(message)
+    check(pb)
+    assert InteractWordV2Decoder(("msg_type", "roomid")).decode(pb) == {"msg_type": 3, "roomid": 7}
+
+
+def test_unknown_fields_before_requested():
+    # 未知字段: 3(length-delimited)、10(fixed64)、11(fixed32)、14(varint), 按wire type跳过
+    unknown = (b"\x1a\x05hello"
+               + b"\x51" + b"\xff" * 8
+               + b"\x5d" + b"\xee" * 4
+               + b"\x70\xac\x02")
+    message = InteractWordV2.INTERACT_WORD_V2(uid=42, uname="b", msg_type=2, timestamp=1751955738)
+    pb = encode(message, prefix=unknown)
+    check(pb)
+    assert InteractWordV2Decoder(("uid", "uname", "msg_type")).decode(pb) == {"uid": 42, "uname": "b", "msg_type": 2}
+
+
+def test_multibyte_varints():
+    message = InteractWordV2.INTERACT_WORD_V2(uid=2 ** 32 - 1, msg_type=300, timestamp=2 ** 31)
+    check(encode(message))
@@ -1,5 +1,6 @@
 """工具和路径类"""
 from . import InteractWordV2 as InteractWordV2
+from .api import BiliApi
 from .tools import (
     LOG_PATH,
     TEMP_PATH,
@@ -17,6 +18,7 @@ __all__ = (
     "DATA_PATH",
     "RESOURCE_PATH",
     "Signedparams",
+    "BiliApi",
     "InteractWordV2",
     "convert_str_to_list",
 )
@@ -0,0 +1,301 @@
+"""
+B站REST接口的统一调用层.
+每个接口有独立的令牌桶限速, 进程内所有调用方共享; 412/429/5xx及风控返回码按指数退避重试,
+被风控时同时暂停该接口的令牌桶, 避免其他调用方继续触发风控; 幂等接口的响应按TTL缓存,
+并发的相同请求只发送一次, 依赖登录状态的接口按请求携带的Cookie分别缓存
+"""
+import asyncio
+import collections
+import dataclasses
+import random
+import time
+from typing import Optional, Any, Union
+
+import aiohttp
+import yarl
+from loguru import logger
+
+__all__ = (
+    "ApiStats",
+    "BiliApi",
+    "Endpoint",
+    "TokenBucket",
+)
+
+RETRY_STATUS = frozenset({412, 429, 500, 502, 503, 504})
+"""需要重试的HTTP状态码"""
+REJECT_STATUS = frozenset({412, 429})
+"""请求被拒绝(未被处理)的HTTP状态码, 非幂等接口也可以重试"""
+RETRY_CODES = frozenset({-412, -509, -799})
+"""需要重试的风控返回码"""
+_UNSIGNED_PARAMS = frozenset({"wts", "w_rid"})
+"""每次签名都会变化的参数, 不参与缓存键"""
+
+Params = Union[dict[str, Any], list[tuple[str, Any]]]
+"""查询参数, 同名参数重复出现时使用列表"""
+
+
+@dataclasses.dataclass(frozen=True)
+class Endpoint:
+    url: str
+    """地址模板, 可使用{api_url}、{live_api_url}、{space_url}及请求时提供的路径参数"""
+    method: str = "GET"
+    rate: float = 5
+    """每秒请求数"""
+    burst: int = 10
+    """突发请求数"""
+    ttl: float = 0
+    """响应缓存时长(秒), 为0时不缓存"""
+    cache_codes: tuple[int, ...] = (0,)
+    """可缓存的返回码"""
+    idempotent: bool = True
+    """是否幂等, 非幂等接口只在请求被拒绝时重试"""
+    text: bool = False
+    """返回文本而不是JSON"""
+    per_cookie: bool = False
+    """响应依赖登录状态, 缓存和合并请求按请求携带的Cookie区分, 不同账号的会话不会共享响应"""
+
+
+@dataclasses.dataclass
+class ApiStats:
+    requests: int = 0
+    """发出的HTTP请求数, 包括重试"""
+    cache_hits: int = 0
+    """命中缓存或合并到进行中请求的次数"""
+    retries: int = 0
+    """重试次数"""
+    throttled_seconds: float = 0
+    """因限速等待的累计时长(秒)"""
+    request_seconds: float = 0
+    """HTTP请求的累计耗时(秒)"""
+    responses: collections.Counter[str] = dataclasses.field(default_factory=collections.Counter)
+    """HTTP状态码或异常类型 -> 次数"""
+
+
+class TokenBucket:
+    """预约式令牌桶, 令牌可以为负, 调用方按预约顺序等待, 不需要锁"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        :param rate: 每秒补充的令牌数
+        :param burst: 令牌上限
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens: float = burst
+        self._updated: float = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        取一个令牌
+        :return: 取得令牌前需要等待的秒数
+        """
+        self._refill()
+        self._tokens -= 1
+        return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def pause(self, seconds: float):
+        """暂停发放令牌, 之后的请求在seconds秒后按速率恢复"""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+def _cache_key(values: Optional[Params]) -> tuple:
+    if not values:
+        return ()
+    items = values.items() if isinstance(values, dict) else values
+    return tuple(sorted((k, str(v)) for k, v in items if k not in _UNSIGNED_PARAMS))
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class BiliApi:
+    """
+    REST接口客户端, 会话由调用方提供; 限速、缓存和统计为类属性, 所有实例共享.
+    缓存的响应对象由所有调用方共享, 不要修改
+    """
+    api_url: str = "https://api.bilibili.com"
+    """主站API地址, 压测时可指向本地模拟服务器"""
+    live_api_url: str = "https://api.live.bilibili.com"
+    """直播API地址"""
+    space_url: str = "https://space.bilibili.com"
+    """个人空间地址"""
+    endpoints: dict[str, Endpoint] = {
+        "nav": Endpoint("{api_url}/x/web-interface/nav", rate=1, burst=3),
+        "space_dynamic": Endpoint("{space_url}/{mid}/dynamic", rate=1, burst=3, text=True),
+        "myinfo": Endpoint("{api_url}/x/space/myinfo", rate=2, burst=5, ttl=600, cache_codes=(0, -101),
+                           per_cookie=True),
+        "acc_info": Endpoint("{api_url}/x/space/wbi/acc/info", rate=2, burst=10, ttl=3600),
+        "danmu_info": Endpoint("{live_api_url}/xlive/web-room/v1/index/getDanmuInfo", rate=5, burst=20, ttl=60,
+                               per_cookie=True),
+        "room_base_info": Endpoint("{live_api_url}/xlive/web-room/v1/index/getRoomBaseInfo", rate=5, burst=10),
+        "status_by_uids": Endpoint("{live_api_url}/room/v1/Room/get_status_info_by_uids", rate=5, burst=10),
+        "send_msg": Endpoint("{live_api_url}/msg/send", method="POST", rate=1, burst=1, idempotent=False),
+    }
+    """接口名 -> 接口配置, 修改限速需在首次请求前完成"""
+    max_retries: int = 3
+    """最大重试次数"""
+    backoff_base: float = 1.0
+    """首次重试的等待上限(秒)"""
+    backoff_max: float = 30.0
+    """重试等待时间上限(秒)"""
+    max_cache_entries: int = 10000
+    """缓存条目数超过该值时清理过期条目"""
+    stats: dict[str, ApiStats] = {}
+    """接口名 -> 统计信息"""
+    _buckets: dict[str, TokenBucket] = {}
+    _cache: dict[tuple, tuple[float, Any]] = {}
+    _inflight: dict[tuple, asyncio.Task] = {}
+
+    def __init__(self, session: aiohttp.ClientSession):
+        """
+        :param session: HTTP会话, 由调用方负责关闭
+        """
+        self.session = session
+
+    @classmethod
+    def _stats(cls, name: str) -> ApiStats:
+        try:
+            return cls.stats[name]
+        except KeyError:
+            cls.stats[name] = stats = ApiStats()
+            return stats
+
+    @classmethod
+    def _bucket(cls, name: str) -> TokenBucket:
+        try:
+            return cls._buckets[name]
+        except KeyError:
+            endpoint = cls.endpoints[name]
+            cls._buckets[name] = bucket = TokenBucket(endpoint.rate, endpoint.burst)
+            return bucket
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    def _url(self, endpoint: Endpoint, path: Optional[dict[str, Any]]) -> str:
+        return endpoint.url.format(api_url=self.api_url, live_api_url=self.live_api_url,
+                                   space_url=self.space_url, **(path or {}))
+
+    def _cookie(self, url: str) -> str:
+        """请求url时会话携带的Cookie, 包括默认请求头和cookie_jar中的Cookie"""
+        jar = self.session.cookie_jar.filter_cookies(yarl.URL(url)).output(attrs=[], header="", sep=";").strip()
+        return f"{self.session.headers.get('Cookie', '')}|{jar}"
+
+    async def request(
+            self,
+            name: str,
+            params: Optional[Params] = None,
+            data: Optional[dict[str, Any]] = None,
+            *,
+            path: Optional[dict[str, Any]] = None,
+            fresh: bool = False,
+    ) -> Any:
+        """
+        调用接口
+        :param name: 接口名, 见endpoints
+        :param params: 查询参数, 已签名的参数中wts和w_rid不参与缓存键
+        :param data: 表单数据
+        :param path: 地址模板中的路径参数
+        :param fresh: 忽略缓存重新请求, 结果仍会写入缓存
+        :return: 解码后的JSON, text接口为str
+        :raise aiohttp.ClientResponseError: 重试后仍返回错误状态码
+        """
+        endpoint = self.endpoints[name]
+        if not endpoint.ttl:
+            return await self._send(name, endpoint, params, data, path)
+        key = (name, _cache_key(params), _cache_key(path))
+        if endpoint.per_cookie:
+            key += (self._cookie(self._url(endpoint, path)),)
+        if not fresh:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._stats(name).cache_hits += 1
+                return cached[1]
+            if (task := self._inflight.get(key)) is not None:
+                self._stats(name).cache_hits += 1
+                return await asyncio.shield(task)
+        task = asyncio.create_task(self._send(name, endpoint, params, data, path))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._settle(key, endpoint, t))
+        return await asyncio.shield(task)
+
+    def _settle(self, key: tuple, endpoint: Endpoint, task: asyncio.Task):
+        """请求完成, 移出进行中的请求并缓存可缓存的响应"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 调用方都已取消时也要取出异常, 避免未处理异常的警告
+        if task.cancelled() or task.exception() is not None:
+            return
+        body = task.result()
+        code = body.get("code", 0) if isinstance(body, dict) else 0
+        if code not in endpoint.cache_codes:
+            return
+        now = time.monotonic()
+        if len(self._cache) >= self.max_cache_entries:
+            for expired in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[expired]
+        self._cache[key] = (now + endpoint.ttl, body)
+
+    async def _send(
+            self,
+            name: str,
+            endpoint: Endpoint,
+            params: Optional[Params],
+            data: Optional[dict[str, Any]],
+            path: Optional[dict[str, Any]],
+    ) -> Any:
+        """限速发送请求, 按需重试"""
+        stats = self._stats(name)
+        bucket = self._bucket(name)
+        url = self._url(endpoint, path)
+        attempt = 0
+        while True:
+            if (wait := bucket.reserve()) > 0:
+                stats.throttled_seconds += wait
+                await asyncio.sleep(wait)
+            stats.requests += 1
+            can_retry = attempt < self.max_retries
+            start = time.monotonic()
+            try:
+                async with self.session.request(endpoint.method, url, params=params, data=data) as response:
+                    stats.responses[str(response.status)] += 1
+                    if response.status in RETRY_STATUS and can_retry and \
+                            (endpoint.idempotent or response.status in REJECT_STATUS):
+                        reason, rejected, delay = f"HTTP {response.status}", \
+                            response.status in REJECT_STATUS, _retry_after(response)
+                    else:
+                        response.raise_for_status()
+                        body = await (response.text() if endpoint.text else response.json(content_type=None))
+                        code = body.get("code", 0) if isinstance(body, dict) else 0
+                        if code not in RETRY_CODES or not can_retry:
+                            return body
+                        reason, rejected, delay = f"code {code}", True, None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                stats.responses[type(e).__name__] += 1
+                if not (endpoint.idempotent and can_retry):
+                    raise
+                reason, rejected, delay = f"{type(e).__name__}: {e}", False, None
+            finally:
+                stats.request_seconds += time.monotonic() - start
+            if delay is None:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            attempt += 1
+            stats.retries += 1
+            logger.warning(f"[{name}] 请求失败({reason}), {delay:.1f}秒后第{attempt}次重试")
+            if rejected:
+                # 被风控时暂停整个接口, 重试和其他调用方一起在令牌桶中排队
+                bucket.pause(delay)
+            else:
+                await asyncio.sleep(delay)
@@ -9,7 +9,6 @@ import time
 import tomllib
 import urllib.parse
 from ast import literal_eval
-from functools import reduce
 from hashlib import md5
 from pathlib import Path
 from typing import Optional, Any, TypeVar, Union
@@ -18,6 +17,8 @@ import aiohttp
 from loguru import logger
 from pydantic import BaseModel, TypeAdapter
 
+from .api import BiliApi
+
 C = TypeVar("C", bound=BaseModel)
 T = TypeVar("T")
 
@@ -54,7 +55,9 @@ class SignedKeyData:
 
 class Signedparams:
     """
-    签名类, 调用get_end_result函数即可, 利用序列化库pickle缓存img_key和sub_key和access_id,避免反复获取影响性能
+    签名类, 调用get_end_result函数即可.
+    img_key、sub_key和access_id保存在内存中, 过期时由所有调用方共享一次刷新(single-flight),
+    仅在数据变化时用pickle写入缓存文件, 进程启动后只读取一次; 所有请求共用一个长期存在的HTTP会话
     """
     Data: SignedKeyData = SignedKeyData()
     flushed_time: int = 2 * 86000
@@ -71,6 +74,10 @@ class Signedparams:
         "Origin": "http://www.bilibili.com",
     }
     _session: Optional[aiohttp.ClientSession] = None
+    _lock: Optional[asyncio.Lock] = None
+    _loaded: bool = False
+    _mixin_key: tuple[str, str] = ("", "")
+    """(img_key+sub_key, 打乱后的mixin_key)缓存"""
 
     @classmethod
     async def get_end_result(
@@ -85,7 +92,7 @@ class Signedparams:
         获取最后的结果
         :param mid: 用户UID, params和mid必填其中之一
         :param params: 自定义参数, 不输入则使用默认自带参数
-        :param compulsion: 是否强制刷新数据库缓存
+        :param compulsion: 是否强制刷新缓存
         :param use_webid: 是否使用w_webid,能不用就不用,如果过不了鉴权就可以启用
         :param use_cookie: 是否使用Cookie获取WBI,为True从系统环境变量获取COOKIE
         :return: 加密完成后的dict[params]
@@ -102,68 +109,105 @@ class Signedparams:
             "mid": mid,
             "web_location": "444.8"
         }
-        cls._read_data()
-        if not cls._session:
-            cls._session = aiohttp.ClientSession(headers=cls.headers)
+        if not cls._loaded:
+            await cls._load()
         if use_webid:
             default_params["w_webid"] = await cls._access_id(mid, compulsion)
         params = params or default_params
         logger.debug(f"签名参数: {params}")
         keys = await cls._getWbiKeys(compulsion)
-        await asyncio.to_thread(cls._save_data)
         return await cls._encWbi(params, *keys)
 
+    @classmethod
+    def _get_session(cls) -> aiohttp.ClientSession:
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(headers=cls.headers)
+        return cls._session
+
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        return cls._lock
+
+    @classmethod
+    async def _load(cls):
+        """首次调用时读取缓存文件"""
+        async with cls._get_lock():
+            if not cls._loaded:
+                await asyncio.to_thread(cls._read_data)
+                cls._loaded = True
+
+    @classmethod
+    def _wbi_expired(cls) -> bool:
+        return time.time() - (cls.Data.WbiKeys_update_timestamp + cls.flushed_time) >= 0
+
     @classmethod
     async def _getWbiKeys(cls, compulsion: bool) -> tuple[str, str]:
         """
-        获取最新的 img_key 和 sub_key
+        获取最新的 img_key 和 sub_key, 过期或强制刷新时所有并发调用只请求一次
         :return: img_key, sub_key
         """
-        if (time.time() - (cls.Data.WbiKeys_update_timestamp + cls.flushed_time)) >= 0 or compulsion:
-            async with cls._session.get('https://api.bilibili.com/x/web-interface/nav') as response:
-                response.raise_for_status()
-                nav_data = await response.json()
-            img_key = nav_data["data"]["wbi_img"]["img_url"].rsplit("/", 1)[1].split(".")[0]
-            sub_key = nav_data["data"]["wbi_img"]["sub_url"].rsplit("/", 1)[1].split(".")[0]
-            cls.Data.img_key = img_key
-            cls.Data.sub_key = sub_key
-            cls.Data.WbiKeys_update_timestamp = time.time()
-            cls.Data.WbiKeys_update_count += 1
-        else:
-            cls.Data.WbiKeys_get_count += 1
+        requested = time.time()
+        if cls._wbi_expired() or compulsion:
+            async with cls._get_lock():
+                # 等待锁期间其他调用已经刷新过时直接使用
+                if cls._wbi_expired() or (compulsion and cls.Data.WbiKeys_update_timestamp < requested):
+                    nav_data = await BiliApi(cls._get_session()).request("nav")
+                    img_key = nav_data["data"]["wbi_img"]["img_url"].rsplit("/", 1)[1].split(".")[0]
+                    sub_key = nav_data["data"]["wbi_img"]["sub_url"].rsplit("/", 1)[1].split(".")[0]
+                    cls.Data.img_key = img_key
+                    cls.Data.sub_key = sub_key
+                    cls.Data.WbiKeys_update_timestamp = time.time()
+                    cls.Data.WbiKeys_update_count += 1
+                    await asyncio.to_thread(cls._save_data)
+                    return img_key, sub_key
+        cls.Data.WbiKeys_get_count += 1
         return cls.Data.img_key, cls.Data.sub_key
 
     @classmethod
     async def _access_id(cls, mid: int, compulsion: bool) -> str:
         """
-        获取access_id
+        获取access_id, 过期或强制刷新时所有并发调用只请求一次
         :return: access_id: str
         """
-        if (time.time() - (cls.Data.WbiKeys_update_timestamp + cls.flushed_time)) >= 0 or compulsion:
-            try:
-                async with cls._session.get(f'https://space.bilibili.com/{mid}/dynamic') as response:
-                    response.raise_for_status()
-                    text = re.search(r"<script id=\"__RENDER_DATA__\" type=\"application/json\">(.*?)</script>",
-                                     await response.text(), re.S).group(1)
-            except AttributeError:
-                logger.error("没有找到属性")
-                return ""
-            accessid = json.loads(urllib.parse.unquote(text))["access_id"]
-            cls.Data.access_id = accessid
-            cls.Data.access_id_update_timestamp = time.time()
-            cls.Data.access_id_update_count += 1
-        else:
-            cls.Data.access_id_get_count += 1
+        requested = time.time()
+
+        def expired() -> bool:
+            return time.time() - (cls.Data.access_id_update_timestamp + cls.flushed_time) >= 0
+
+        if expired() or compulsion:
+            async with cls._get_lock():
+                if expired() or (compulsion and cls.Data.access_id_update_timestamp < requested):
+                    try:
+                        page = await BiliApi(cls._get_session()).request("space_dynamic", path={"mid": mid})
+                        text = re.search(
+                            r"<script id=\"__RENDER_DATA__\" type=\"application/json\">(.*?)</script>",
+                            page, re.S).group(1)
+                    except AttributeError:
+                        logger.error("没有找到属性")
+                        return ""
+                    accessid = json.loads(urllib.parse.unquote(text))["access_id"]
+                    cls.Data.access_id = accessid
+                    cls.Data.access_id_update_timestamp = time.time()
+                    cls.Data.access_id_update_count += 1
+                    await asyncio.to_thread(cls._save_data)
+                    return accessid
+        cls.Data.access_id_get_count += 1
         return cls.Data.access_id
 
     @classmethod
     async def _getMixinKey(cls, orig: str) -> str:
         """
-        对 imgKey 和 subKey 进行字符顺序打乱编码
+        对 imgKey 和 subKey 进行字符顺序打乱编码, 结果按输入缓存
         :param orig: img_key+sub_key
         :return: 打乱后的字符
         """
-        return reduce(lambda s, i: s + orig[i], cls.mixinKeyEncTab, "")[:32]
+        cached_orig, mixin_key = cls._mixin_key
+        if cached_orig != orig:
+            mixin_key = "".join(orig[i] for i in cls.mixinKeyEncTab)[:32]
+            cls._mixin_key = (orig, mixin_key)
+        return mixin_key
 
     @classmethod
     async def _encWbi(cls, params: dict, img_key: str, sub_key: str) -> dict:
@@ -189,9 +233,10 @@ class Signedparams:
 
     @classmethod
     async def close(cls):
+        """关闭共享的HTTP会话, 之后的请求会重新创建"""
         if cls._session:
             await cls._session.close()
-            cls.session = None
+            cls._session = None
 
     @classmethod
     def _save_data(cls):
@@ -254,7 +299,7 @@ class ConfigManage:
     @classmethod
     def get_config(cls, config: type[C], names: Optional[list[str]] = None) -> C:
         """从全局配置获取当前插件需要的配置项"""
-        _config = cls().configs
+        _config = (cls._instance or cls()).configs
         if names:
             for name in names:
                 _config = _config[name]
@@ -263,7 +308,7 @@ class ConfigManage:
     @classmethod
     def get_all_config(cls) -> dict[str, Any]:
         """获取包含所有配置的字典"""
-        return cls().configs
+        return (cls._instance or cls()).configs
 
 
 def convert_str_to_list(str_list: str) -> list[int] | None: